@@ -0,0 +1,6 @@
+"""Benchmark suite for the rpi-season-screen scene controllers.
+
+Run it with `python -m benchmarks.run --help`.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
@@ -0,0 +1,367 @@
+""" Benchmark runner for the scene controllers.
+
+Every scene runs in its own freshly spawned process against the in-memory `StubSenseHat`,
+so that startup time and peak memory are not influenced by previously benchmarked scenes.
+
+Measured per scene:
+
+* `fps` - Simulated frames (scene loop iterations) per wall clock second, uncapped.
+* `realtime_factor` - Simulated seconds per wall clock second.
+* `frame_us` - Percentiles of the time a single frame took, in microseconds.
+* `write_calls_per_frame` / `pixel_writes_per_frame` - Device traffic per frame.
+* `cold_start_ms` - From creating the controller (including imports) to the first device write.
+* `peak_rss_kb` - Peak resident set size of the benchmark process.
+* `allocations_per_frame` - Memory blocks allocated by a frame that are still in use at its end,
+  averaged over extra frames run with `tracemalloc`. Blocks released again within the frame and
+  objects taken from CPython's free lists are not counted.
+* `retained_blocks_per_frame` - Growth of the allocated memory blocks per frame over those extra
+  frames. Scenes that reuse their objects stay close to 0, so that memory stays flat in long runs.
+* `gc_collections` - Garbage collector runs (all generations) during the measured frames.
+* `seek_ms` - For seekable scenes (videos), the time from seeking to the first frame after it.
+
+Usage:
+
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --compare baseline.json
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import contextlib
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+
+from benchmarks.scenes import ASSETS, SCENES, SimulatedTime, create_display, patch_clock
+from benchmarks.stub_sense import install_stub_sense_hat
+
+# Maximum number of frames to wait for the first device write
+MAX_STARTUP_FRAMES = 100_000
+# Real seconds between two checks whether a scene finished loading
+LOADING_WAIT = 0.001
+# Positions (share of the content length) seekable scenes are sought to after the measured frames
+SEEK_POINTS = (0.75, 0.25, 0.5, 0.9, 0.1)
+# Frames run with tracemalloc after the measured frames, tracing slows the scene loop down
+ALLOCATION_FRAMES = 2000
+
+PERCENTILES = (50, 90, 99)
+
+# Metric name -> True if a higher value is better
+METRICS: Dict[str, bool] = {
+    "fps": True,
+    "realtime_factor": True,
+    "frame_us.p50": False,
+    "frame_us.p90": False,
+    "frame_us.p99": False,
+    "write_calls_per_frame": False,
+    "pixel_writes_per_frame": False,
+    "cold_start_ms": False,
+    "peak_rss_kb": False,
+    "allocations_per_frame": False,
+    "retained_blocks_per_frame": False,
+    "gc_collections": False,
+    "seek_ms.p50": False,
+}
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure_scene(
+    name: str, asset: str, frames: int, step: float, seed: int, wall: Optional[Tuple[int, int]]
+) -> Dict[str, Any]:
+    """Run a single scene and return its metrics. Meant to be run in a fresh process.
+
+    # Arguments
+
+    * `name` - Name of the scene in `SCENES`
+    * `asset` - Path to the scene's asset or None
+    * `frames` - Number of measured frames
+    * `step` - Simulated seconds between two frames
+    * `seed` - Seed for the random module
+    * `wall` - Number of (columns, rows) of a tiled wall, or None for a single display
+    """
+    install_stub_sense_hat()
+    random.seed(seed)
+    start = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        display, stubs = create_display(wall)
+        controller = SCENES[name](display, asset)
+        clock = SimulatedTime(time.time())
+        patch_clock(clock)
+        controller.init_scene(clear=False)
+        startup_frames = 0
+        while all(stub.first_write_time is None for stub in stubs) \
+                and startup_frames < MAX_STARTUP_FRAMES:
+            controller.tick()
+            clock.advance(step)
+            startup_frames += 1
+        first_writes = [stub.first_write_time for stub in stubs if stub.first_write_time]
+        cold_start = (min(first_writes) if first_writes else time.perf_counter()) - start
+        # Measure the scene loop only after assets loaded in the background are complete
+        while controller.loading:
+            time.sleep(LOADING_WAIT)
+
+        for stub in stubs:
+            stub.write_calls = 0
+            stub.pixel_writes = 0
+        durations: List[float] = []
+        gc.collect()
+        collections = _gc_collections()
+        simulated_start = clock.now
+        loop_start = time.perf_counter()
+        for _ in range(frames):
+            frame_start = time.perf_counter()
+            controller.tick()
+            durations.append(time.perf_counter() - frame_start)
+            clock.advance(step)
+        elapsed = time.perf_counter() - loop_start
+        simulated = clock.now - simulated_start
+        collections = _gc_collections() - collections
+        write_calls = sum(stub.write_calls for stub in stubs)
+        pixel_writes = sum(stub.pixel_writes for stub in stubs)
+        allocations, retained = _measure_allocations(controller, clock, step)
+        seek_times = _measure_seeks(controller, clock, step)
+
+    durations.sort()
+    seek_times.sort()
+    results = {
+        "frames": frames,
+        "fps": frames / elapsed,
+        "realtime_factor": simulated / elapsed,
+        "frame_us": {
+            **{f"p{p}": _percentile(durations, p) * 1e6 for p in PERCENTILES},
+            "max": durations[-1] * 1e6,
+        },
+        "write_calls_per_frame": write_calls / frames,
+        "pixel_writes_per_frame": pixel_writes / frames,
+        "cold_start_ms": cold_start * 1e3,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "allocations_per_frame": allocations,
+        "retained_blocks_per_frame": retained,
+        "gc_collections": collections,
+    }
+    if seek_times:
+        results["seek_ms"] = {
+            "p50": _percentile(seek_times, 50) * 1e3,
+            "max": seek_times[-1] * 1e3,
+        }
+    return results
+
+
+def _gc_collections() -> int:
+    """Number of garbage collector runs so far, over all generations"""
+    return sum(generation["collections"] for generation in gc.get_stats())
+
+
+def _measure_allocations(controller, clock: SimulatedTime, step: float) -> Tuple[float, float]:
+    """Memory blocks allocated per frame and memory blocks kept per frame, on average.
+
+    The traces are cleared before every frame, so that the snapshot after it only holds the blocks
+    the frame allocated.
+    """
+    gc.collect()
+    start = sys.getallocatedblocks()
+    tracemalloc.start()
+    allocations = 0
+    for _ in range(ALLOCATION_FRAMES):
+        tracemalloc.clear_traces()
+        controller.tick()
+        allocations += len(tracemalloc.take_snapshot().traces)
+        clock.advance(step)
+    tracemalloc.stop()
+    gc.collect()
+    end = sys.getallocatedblocks()
+    return allocations / ALLOCATION_FRAMES, (end - start) / ALLOCATION_FRAMES
+
+
+def _measure_seeks(controller, clock: SimulatedTime, step: float) -> List[float]:
+    """Wall clock seconds from seeking to the first frame after it, for controllers that can seek"""
+    if not hasattr(controller, "seek"):
+        return []
+    duration = controller.video_length / controller.fps
+    seek_times = []
+    for point in SEEK_POINTS:
+        start = time.perf_counter()
+        controller.seek(point * duration)
+        frames = 0
+        while controller.seeking and frames < MAX_STARTUP_FRAMES:
+            controller.tick()
+            clock.advance(step)
+            frames += 1
+        seek_times.append(time.perf_counter() - start)
+    return seek_times
+
+
+def _scene_worker(queue, *args):
+    try:
+        queue.put(("ok", measure_scene(*args)))
+    except Exception as error:  # reported to the parent process instead
+        queue.put(("error", f"{type(error).__name__}: {error}"))
+
+
+def run_scene(
+    name: str, asset: str, frames: int, step: float, seed: int, wall: Optional[Tuple[int, int]]
+) -> Dict[str, Any]:
+    """Run `measure_scene` in a freshly spawned process"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(
+        target=_scene_worker, args=(queue, name, asset, frames, step, seed, wall)
+    )
+    process.start()
+    status, result = queue.get()
+    process.join()
+    if status != "ok":
+        return {"error": result}
+    return result
+
+
+def _flatten(metrics: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[Tuple[str, str, float, float, float]]:
+    """Compare results against a baseline.
+
+    # Arguments
+
+    * `results` - Results as returned by `run_benchmarks`
+    * `baseline` - Previously stored results
+    * `tolerance` - Relative change that is still accepted, e.g. 0.1 for 10%
+
+    # Returns
+
+    `List[Tuple[str, str, float, float, float]]` - Regressions as (scene, metric, baseline value,
+    current value, relative change).
+    """
+    regressions = []
+    for scene, metrics in results["scenes"].items():
+        base_metrics = baseline.get("scenes", {}).get(scene)
+        if not base_metrics or "error" in metrics or "error" in base_metrics:
+            continue
+        current, base = _flatten(metrics), _flatten(base_metrics)
+        for metric, higher_is_better in METRICS.items():
+            if metric not in current or not base.get(metric):
+                continue
+            change = (current[metric] - base[metric]) / base[metric]
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append((scene, metric, base[metric], current[metric], change))
+    return regressions
+
+
+def run_benchmarks(
+    scenes: List[str], frames: int, step: float, seed: int, wall: Optional[Tuple[int, int]] = None
+) -> Dict[str, Any]:
+    """Run all given scenes and collect their results"""
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "frames": frames,
+            "step": step,
+            "seed": seed,
+            "wall": list(wall) if wall else None,
+        },
+        "scenes": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="rpi-season-screen-bench-") as directory:
+        for name in scenes:
+            print(f"Benchmarking {name} ...", file=sys.stderr)
+            try:
+                asset = ASSETS[name](directory) if name in ASSETS else None
+            except ImportError as error:
+                results["scenes"][name] = {"error": f"Missing dependency: {error}"}
+                continue
+            results["scenes"][name] = run_scene(name, asset, frames, step, seed, wall)
+    return results
+
+
+def _print_summary(results: Dict[str, Any]):
+    print(f"{'scene':<12}{'fps':>12}{'p50 us':>10}{'p99 us':>10}"
+          f"{'px/frame':>10}{'start ms':>10}{'rss kB':>10}{'allocs':>10}{'gc':>6}",
+          file=sys.stderr)
+    for scene, metrics in results["scenes"].items():
+        if "error" in metrics:
+            print(f"{scene:<12}  ERROR: {metrics['error']}", file=sys.stderr)
+            continue
+        print(f"{scene:<12}{metrics['fps']:>12.0f}{metrics['frame_us']['p50']:>10.1f}"
+              f"{metrics['frame_us']['p99']:>10.1f}{metrics['pixel_writes_per_frame']:>10.2f}"
+              f"{metrics['cold_start_ms']:>10.1f}{metrics['peak_rss_kb']:>10}"
+              f"{metrics['allocations_per_frame']:>10.1f}{metrics['gc_collections']:>6}",
+              file=sys.stderr)
+
+
+@click.command()
+@click.option("--scene", "-s", "scenes", multiple=True, type=click.Choice(list(SCENES)),
+              help="Scene to benchmark. Can be given multiple times. Defaults to all scenes.")
+@click.option("--frames", default=20000, type=int, help="Number of measured frames per scene.")
+@click.option("--step", default=1 / 60, type=float, help="Simulated seconds per frame.")
+@click.option("--seed", default=0, type=int, help="Seed for the random module.")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="Write the results to this JSON file.")
+@click.option("--compare", "baseline_path", type=click.Path(exists=True, dir_okay=False),
+              help="Baseline JSON file to compare the results against.")
+@click.option("--tolerance", default=0.1, type=float, help="Accepted relative regression.")
+@click.option("--wall", default=None, type=str,
+              help="Render onto a tiled wall of COLUMNSxROWS panels, e.g. 4x2.")
+def main(scenes, frames, step, seed, output, baseline_path, tolerance, wall):
+    """Benchmark the scene controllers against an in-memory Sense Hat."""
+    wall_size = None
+    if wall:
+        try:
+            wall_size = tuple(int(value) for value in wall.lower().split("x"))
+        except ValueError:
+            wall_size = ()
+        if len(wall_size) != 2:
+            raise click.BadParameter(f"Expected COLUMNSxROWS, got {wall}", param_hint="--wall")
+    results = run_benchmarks(list(scenes) or list(SCENES), frames, step, seed, wall_size)
+    _print_summary(results)
+    if output:
+        with open(output, "w", encoding="utf-8") as jsonfile:
+            json.dump(results, jsonfile, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as jsonfile:
+            baseline = json.load(jsonfile)
+        regressions = compare(results, baseline, tolerance)
+        for scene, metric, base, current, change in regressions:
+            print(f"REGRESSION {scene} {metric}: {base:.3f} -> {current:.3f} ({change:+.1%})",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {tolerance:.0%}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+""" Scene setups and a simulated clock for the benchmarks.
+
+Every controller paces itself by comparing timestamps against `time.time()`.
+To measure the uncapped throughput, the benchmark swaps the `time` module
+inside the controller modules for `SimulatedTime`, which advances by a fixed
+step per frame instead of following the wall clock.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.stub_sense import StubSenseHat
+
+PACKAGE_NAME = "rpi_season_screen"
+
+
+class SimulatedTime:
+    """Drop-in replacement for the `time` module with a manually advanced clock.
+
+    # Arguments
+
+    * `start` - Initial value of the clock in seconds.
+    """
+    def __init__(self, start: float = 1_000_000.0):
+        self.now: float = start
+
+    def advance(self, seconds: float):
+        """Move the clock forward"""
+        self.now += seconds
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        """Sleeping only moves the simulated clock forward."""
+        if seconds > 0:
+            self.now += seconds
+
+    def __getattr__(self, name: str):
+        return getattr(time, name)
+
+
+def patch_clock(clock: SimulatedTime):
+    """Replace the `time` module in every loaded controller module with `clock`."""
+    for name, module in list(sys.modules.items()):
+        if not name.startswith(PACKAGE_NAME) or module is None:
+            continue
+        if getattr(module, "time", None) is time:
+            module.time = clock
+
+
+def create_display(wall: Optional[Tuple[int, int]] = None) -> Tuple[object, List[StubSenseHat]]:
+    """Create the display for a scene.
+
+    # Arguments
+
+    * `wall` - Number of (columns, rows) of a tiled wall of stub panels, or None for a single stub.
+
+    # Returns
+
+    `Tuple[object, List[StubSenseHat]]` - The display and the stubs that count the writes.
+    """
+    if wall is None:
+        sense = StubSenseHat()
+        return sense, [sense]
+
+    from rpi_season_screen.wall.panel import LocalPanel
+    from rpi_season_screen.wall.tiled_wall import TiledWall
+
+    columns, rows = wall
+    display = TiledWall(columns, rows)
+    stubs = []
+    for index in range(columns * rows):
+        stub = StubSenseHat()
+        display.add_panel(LocalPanel(stub), index % columns, index // columns)
+        stubs.append(stub)
+    return display, stubs
+
+
+def write_fill_asset(directory: str, frames: int = 300) -> str:
+    """Write a synthetic two-colour JSON animation in the Bad Apple format.
+
+    # Returns
+
+    `str` - Path to the written JSON file.
+    """
+    rng = random.Random(0)
+    content = {}
+    for index in range(frames):
+        content[f"{index}"] = [
+            [255, 255, 255] if rng.random() < 0.5 else [0, 0, 0] for _ in range(64)
+        ]
+    path = os.path.join(directory, "fill.json")
+    with open(path, "w", encoding="utf-8") as jsonfile:
+        json.dump(content, jsonfile)
+    return path
+
+
+def write_encoded_fill_asset(directory: str, frames: int = 300) -> str:
+    """Write the synthetic fill animation in the encoded format.
+
+    # Returns
+
+    `str` - Path to the written animation.
+    """
+    from rpi_season_screen.codec.animation import encode_animation, load_json_frames
+
+    path = os.path.join(directory, "fill.rssa")
+    with open(path, "wb") as output:
+        encode_animation(output, load_json_frames(write_fill_asset(directory, frames)), 27)
+    return path
+
+
+def write_video_asset(directory: str, frames: int = 120, fps: int = 30) -> str:
+    """Write a synthetic video with moving gradients.
+
+    # Returns
+
+    `str` - Path to the written video file.
+    """
+    import cv2
+    import numpy as np
+
+    path = os.path.join(directory, "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 48))
+    y_grid, x_grid = np.mgrid[0:48, 0:64]
+    for index in range(frames):
+        image = np.stack([
+            (x_grid * 4 + index * 3) % 256,
+            (y_grid * 5 + index * 2) % 256,
+            (x_grid + y_grid + index) % 256,
+        ], axis=-1).astype(np.uint8)
+        writer.write(image)
+    writer.release()
+    return path
+
+
+def _christmas(sense: StubSenseHat, asset: Optional[str]):
+    from rpi_season_screen.christmas.christmas_controller import ChristmasController
+    return ChristmasController(sense, low_light_mode=False)
+
+
+def _new_year(sense: StubSenseHat, asset: Optional[str]):
+    from rpi_season_screen.new_year.new_year_controller import NewYearController
+    return NewYearController(sense, low_light_mode=False)
+
+
+def _easter(sense: StubSenseHat, asset: Optional[str]):
+    from rpi_season_screen.easter.easter_controller import EasterController
+    return EasterController(sense, low_light_mode=False)
+
+
+def _fill(sense: StubSenseHat, asset: Optional[str]):
+    from rpi_season_screen.fill.fill_controller import FillController
+    return FillController(sense, low_light_mode=False, content_path=asset)
+
+
+def _shader(sense: StubSenseHat, asset: Optional[str]):
+    from rpi_season_screen.shader.shader_controller import ShaderController
+    return ShaderController(sense, low_light_mode=False)
+
+
+def _video(sense: StubSenseHat, asset: Optional[str]):
+    from rpi_season_screen.video.video_controller import VideoController
+    return VideoController(asset, sense, low_light_mode=False)
+
+
+# Scene name -> controller factory `(sense, asset_path) -> SenseController`
+SCENES: Dict[str, Callable] = {
+    "christmas": _christmas,
+    "new-year": _new_year,
+    "easter": _easter,
+    "fill": _fill,
+    "fill-encoded": _fill,
+    "shader": _shader,
+    "video": _video,
+}
+
+# Scene name -> asset writer `(directory) -> asset_path`, for scenes that need content on disk.
+# Assets are written before a scene is started, so they do not count towards its startup time.
+ASSETS: Dict[str, Callable] = {
+    "fill": write_fill_asset,
+    "fill-encoded": write_encoded_fill_asset,
+    "video": write_video_asset,
+}
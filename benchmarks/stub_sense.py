@@ -0,0 +1,86 @@
+""" In-memory stand-in for the RPI Sense Hat used by the benchmarks.
+
+The stub keeps an 8x8 frame buffer in memory and counts every write,
+so that a scene can be driven as fast as possible without any hardware attached.
+`install_stub_sense_hat` replaces the `sense_hat` package with it, so that the controllers can
+be imported off-device, where the real package fails to import its RTIMU dependency.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import sys
+import time
+import types
+
+from typing import List, Optional
+
+
+class StubSenseHat:
+    """Mimics the display part of `sense_hat.SenseHat` and counts device writes.
+
+    # Arguments
+
+    * `width` - Width of the display in pixels. Defaults to 8.
+    * `height` - Height of the display in pixels. Defaults to 8.
+    """
+    def __init__(self, width: int = 8, height: int = 8):
+        self.width: int = width
+        self.height: int = height
+        self.rotation: int = 0
+        self.low_light: bool = False
+        self.pixels: List[List[int]] = [[0, 0, 0] for _ in range(width * height)]
+        self.write_calls: int = 0
+        self.pixel_writes: int = 0
+        self.first_write_time: Optional[float] = None
+
+    def _count(self, pixels: int):
+        if self.first_write_time is None:
+            self.first_write_time = time.perf_counter()
+        self.write_calls += 1
+        self.pixel_writes += pixels
+
+    def set_pixel(self, x: int, y: int, *args):
+        """Same signature as `SenseHat.set_pixel`: either `r, g, b` or a single color list."""
+        color = args[0] if len(args) == 1 else args
+        if len(color) != 3:
+            raise ValueError("Pixel arguments must be given as (r, g, b) or r, g, b")
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError(f"Pixel position ({x}, {y}) is out of bounds")
+        self.pixels[x + self.width * y] = [int(c) for c in color]
+        self._count(1)
+
+    def set_pixels(self, pixel_list):
+        """Same signature as `SenseHat.set_pixels`."""
+        if len(pixel_list) != self.width * self.height:
+            raise ValueError(f"Pixel lists must have {self.width * self.height} elements")
+        self.pixels = [[int(c) for c in pixel] for pixel in pixel_list]
+        self._count(len(pixel_list))
+
+    def get_pixels(self) -> List[List[int]]:
+        """Same signature as `SenseHat.get_pixels`."""
+        return [pixel.copy() for pixel in self.pixels]
+
+    def clear(self, *args):
+        """Same signature as `SenseHat.clear`."""
+        color = [0, 0, 0]
+        if len(args) == 1:
+            color = list(args[0])
+        elif len(args) == 3:
+            color = list(args)
+        self.pixels = [color.copy() for _ in range(self.width * self.height)]
+        self._count(self.width * self.height)
+
+    def show_message(self, text_string: str, scroll_speed: float = 0.1, *args, **kwargs):
+        """Counts the scroll steps `SenseHat.show_message` would write, without sleeping."""
+        for _ in range(len(text_string) * 6 + 8):
+            self._count(self.width * self.height)
+
+
+def install_stub_sense_hat():
+    """Make `from sense_hat import SenseHat` return `StubSenseHat`.
+
+    Has to be called before the first controller is imported.
+    """
+    module = types.ModuleType("sense_hat")
+    module.SenseHat = StubSenseHat
+    sys.modules["sense_hat"] = module
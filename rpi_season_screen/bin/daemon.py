@@ -8,7 +8,11 @@ Display has a total of 8x8 pixels.
 Copyright (c) 2022 Maximilian Stephan <stephan.maxi@icloud.com>
 """
 
+import json
 import os
+import sys
+import tempfile
+import time
 from datetime import datetime
 from signal import signal, SIGTERM, SIGINT
 
@@ -19,60 +23,288 @@ from sense_hat import SenseHat
 from rpi_season_screen.christmas.christmas_controller import ChristmasController
 from rpi_season_screen.new_year.new_year_controller import NewYearController
 from rpi_season_screen.easter.easter_controller import EasterController
+from rpi_season_screen.sense.display_writer import DisplayWriter
 from rpi_season_screen.sense.sense_controller import SenseController
-from rpi_season_screen.fill.fill_controller import FillController
+from rpi_season_screen.sense.snapshot import StateFile, default_state_path
+from rpi_season_screen.sense.startup import SplashCache, StartupMetrics, default_splash_path
+from rpi_season_screen.codec.animation import encode_animation, load_json_frames
+from rpi_season_screen.fill.fill_controller import FillController, JSON_FRAMERATE
+from rpi_season_screen.input.joystick import (
+    EvdevJoystick, JoystickError, JoystickInput, RecordedJoystick
+)
+from rpi_season_screen.playback.timeline import FramePolicy
+from rpi_season_screen.sensors.sensor_service import SensorService
+from rpi_season_screen.shader.shader_controller import DEFAULT_PRESET, ShaderController
+from rpi_season_screen.shader.shaders import ShaderError, preset_names
+from rpi_season_screen.sensors.source import SenseHatSensorSource
+from rpi_season_screen.trace.analyzer import analyze, format_report
+from rpi_season_screen.trace.profiler import SamplingProfiler
+from rpi_season_screen.trace.recorder import DEFAULT_CAPACITY, TracingSense, read_trace
+from rpi_season_screen.transitions.transition import (
+    Transition, TransitionError, TransitionKind, TransitionTable
+)
 from rpi_season_screen.video.video_controller import VideoController
+from rpi_season_screen.video.video_index import VideoIndex, VideoIndexError
+from rpi_season_screen.wall.panel import DEFAULT_PORT, PanelReceiver
+from rpi_season_screen.wall.tiled_wall import TiledWall, WallError
 
 
-def start_scene(controller: SenseController):
-    """Starts the Scene"""
-    signal(SIGTERM, controller.handle_signal)
-    signal(SIGINT, controller.handle_signal)
-    controller.init_scene()
-    controller.start_scene()
+# Scenes the joystick switches between, in order
+SCENE_ORDER = ["christmas", "new-year", "easter", "fill", "shader", "video"]
+# Name of the splash in transition tables, for the transition into the first scene
+SPLASH_SCENE = "splash"
+
+
+def scene_name(controller: SenseController) -> str:
+    """Name of the command that runs a controller's scene"""
+    names = {
+        ChristmasController: "christmas",
+        NewYearController: "new-year",
+        EasterController: "easter",
+        FillController: "fill",
+        ShaderController: "shader",
+        VideoController: "video",
+    }
+    return names.get(type(controller), "fill")
+
+
+def create_controller(ctx, sense, scene: str) -> SenseController:
+    """Create the controller of a scene with its default settings"""
+    rotation = ctx.obj["rotation"]
+    low_light_mode = ctx.obj["low_light_mode"]
+    if scene == "christmas":
+        return ChristmasController(
+            sense, rotation=rotation, low_light_mode=low_light_mode, sensors=create_sensors(ctx)
+        )
+    if scene == "new-year":
+        return NewYearController(sense, rotation=rotation, low_light_mode=low_light_mode)
+    if scene == "easter":
+        return EasterController(sense, rotation=rotation, low_light_mode=low_light_mode)
+    if scene == "shader":
+        return ShaderController(sense, rotation=rotation, low_light_mode=low_light_mode)
+    if scene == "video":
+        return VideoController(
+            ctx.obj["video_path"], sense, rotation=rotation, low_light_mode=low_light_mode,
+            **ctx.obj["playback"]
+        )
+    return FillController(
+        sense, rotation=rotation, low_light_mode=low_light_mode, **ctx.obj["playback"]
+    )
+
+
+def start_scene(ctx, controller: SenseController):
+    """Starts the Scene. If the joystick switches scenes, the next one is started afterwards."""
+    joystick = create_joystick(ctx)
+    transitions: TransitionTable = ctx.obj["transitions"]
+    transition = None
+    if ctx.obj["splash_frame"] is not None:
+        # Keep the splash on the display until the first scene drew its first frame
+        spec = transitions.lookup(SPLASH_SCENE, scene_name(controller))
+        transition = Transition(ctx.obj["splash_frame"], *(spec or (TransitionKind.CUT, 0.0)))
+    controller.startup = ctx.obj["startup"]
+    state_file: StateFile = ctx.obj["state_file"]
+    if state_file is not None:
+        # Continue where the scene left off before a restart
+        state_file.scene = scene_name(controller)
+        state_file.restore(controller)
+    while True:
+        stop = stop_handler(ctx, controller)
+        signal(SIGTERM, stop)
+        signal(SIGINT, stop)
+        controller.joystick = joystick
+        controller.writer = ctx.obj["writer"]
+        name = scene_name(controller)
+        if isinstance(controller.sense, TracingSense):
+            controller.sense.set_scene(name)
+        if ctx.obj["profiler"] is not None:
+            ctx.obj["profiler"].scene = name
+            # Only the scenes are profiled, the other commands and the daemon's setup are not
+            ctx.obj["profiler"].start()
+        if state_file is not None:
+            state_file.scene = name
+            controller.state_file = state_file
+        controller.loop_transition = transitions.lookup(name, name)
+        controller.init_scene(transition=transition)
+        controller.start_scene()
+
+        # The scene loop only ends when the joystick switched scenes
+        scenes = [scene for scene in SCENE_ORDER if scene != "video" or ctx.obj["video_path"]]
+        index = scenes.index(name) + controller.switch_request
+        next_scene = scenes[index % len(scenes)]
+        print(f"Switching to {next_scene} ...")
+        spec = transitions.lookup(name, next_scene)
+        last_frame = controller.frame
+        controller.close()
+        controller = create_controller(ctx, controller.sense, next_scene)
+        transition = Transition(last_frame, spec.kind, spec.duration) if spec else None
+
+
+def stop_handler(ctx, controller: SenseController):
+    """Signal handler caching the scene's last frame as splash and saving a snapshot of the scene
+    before the controller cleans up"""
+    def stop(signum, frame):
+        if ctx.obj["splash"] is not None:
+            ctx.obj["splash"].save(controller.frame)
+        if ctx.obj["state_file"] is not None:
+            ctx.obj["state_file"].save(controller)
+        if ctx.obj["writer"] is not None:
+            # The controller clears the display itself
+            ctx.obj["writer"].stop()
+            controller.writer = None
+        controller.handle_signal(signum, frame)
+    return stop
+
+
+def local_sense_hat(ctx) -> SenseHat:
+    """The Sense Hat of this Raspberry Pi, created once and shared by the display and the sensors"""
+    if ctx.obj["sense_hat"] is None:
+        ctx.obj["sense_hat"] = SenseHat()
+    return ctx.obj["sense_hat"]
+
+
+def create_sense(ctx):
+    """Create the display, either the local Sense Hat or a wall of panels, optionally traced.
+
+    The cached splash is shown right away, before the scene loads its content.
+    """
+    startup = StartupMetrics()
+    wall_config = ctx.obj["wall"]
+    if wall_config:
+        sense = TiledWall.from_config(wall_config, lambda: local_sense_hat(ctx))
+        try:
+            # The wall turns the whole canvas, reject rotations it cannot show
+            sense.rotation = ctx.obj["rotation"]
+        except WallError as error:
+            raise click.BadParameter(str(error), param_hint="--rotation") from error
+    else:
+        sense = local_sense_hat(ctx)
+    if ctx.obj["trace"]:
+        sense = TracingSense(sense, ctx.obj["trace"], capacity=ctx.obj["trace_capacity"])
+    if ctx.obj["splash"] is not None:
+        ctx.obj["splash_frame"] = ctx.obj["splash"].show(sense)
+        startup.pixel_shown()
+    ctx.obj["startup"] = startup
+    if ctx.obj["display_thread"]:
+        ctx.obj["writer"] = DisplayWriter(sense).start()
+    return sense
+
+
+def create_sensors(ctx):
+    """Start sampling the Sense Hat sensors in the background, if enabled"""
+    if not ctx.obj["sensors"]:
+        return None
+    if ctx.obj["sensor_service"] is None:
+        ctx.obj["sensor_service"] = SensorService(SenseHatSensorSource(local_sense_hat(ctx))).start()
+    return ctx.obj["sensor_service"]
+
+
+def create_joystick(ctx):
+    """Open the joystick, or the recorded joystick events, if enabled"""
+    if ctx.obj["joystick_input"] is not None:
+        return ctx.obj["joystick_input"]
+    if ctx.obj["joystick_events"]:
+        try:
+            device = RecordedJoystick.load(ctx.obj["joystick_events"])
+        except JoystickError as error:
+            raise click.BadParameter(str(error), param_hint="--joystick-events") from error
+        ctx.obj["joystick_input"] = JoystickInput(device)
+    elif ctx.obj["joystick"]:
+        try:
+            device = EvdevJoystick()
+        except (JoystickError, OSError) as error:
+            raise click.ClickException(f"Could not open the joystick: {error}") from error
+        ctx.obj["joystick_input"] = JoystickInput(device)
+    return ctx.obj["joystick_input"]
 
 
 @click.group()
 @click.option("--rotation", default=0, type=int, help="Rotation of the Chrismas Tree in degrees.")
 @click.option("--low-light-mode", is_flag=True, help="Sets the Low Light Mode on the Sense Hat")
+@click.option("--frame-policy", default="drop", type=click.Choice(["drop", "hold"]),
+              help="Drop or hold frames of fill content and videos when playback falls behind.")
+@click.option("--sync-epoch", default=None, type=float,
+              help="Unix timestamp fill content and videos started at. "
+                   "Displays with the same epoch play in sync.")
+@click.option("--wall", default=None, type=click.Path(exists=True, dir_okay=False),
+              help="JSON file describing a wall of Sense Hats to render the scene across.")
+@click.option("--trace", default=None, type=click.Path(dir_okay=False),
+              help="Record every display write into this binary trace file.")
+@click.option("--trace-capacity", default=DEFAULT_CAPACITY, type=click.IntRange(1),
+              help="Number of pixel writes the trace keeps before overwriting the oldest.")
+@click.option("--sensors", is_flag=True,
+              help="Sample the Sense Hat sensors in the background, e.g. for temperature driven snow.")
+@click.option("--joystick", is_flag=True,
+              help="Use the joystick to switch scenes (left/right) and control them (middle).")
+@click.option("--joystick-events", default=None, type=click.Path(exists=True, dir_okay=False),
+              help="Replay recorded joystick events from a JSON file instead of reading the joystick.")
+@click.option("--transitions", default=None, type=click.Path(exists=True, dir_okay=False),
+              help="JSON file with the transitions between scenes and of looping content.")
+@click.option("--splash", default=None, type=click.Path(dir_okay=False),
+              help="Frame shown at startup while the scene loads, updated with the last frame on exit. "
+                   "Defaults to splash.npy in $CACHE_DIRECTORY or $XDG_CACHE_HOME/rpi-season-screen, "
+                   "off if neither is set.")
+@click.option("--no-splash", is_flag=True, help="Do not show or update the splash frame.")
+@click.option("--state-file", default=None, type=click.Path(dir_okay=False),
+              help="File the running scene is saved to regularly, to continue after a restart. "
+                   "Defaults to state.json in $STATE_DIRECTORY or $XDG_STATE_HOME/rpi-season-screen, "
+                   "off if neither is set.")
+@click.option("--no-state", is_flag=True, help="Neither save nor restore the running scene.")
+@click.option("--display-thread", is_flag=True,
+              help="Write frames to the display in a separate thread, dropping frames it cannot keep up with.")
+@click.option("--profile", default=None, type=click.FloatRange(0, min_open=True),
+              help="Sample where the scene loop spends its time for this many seconds.")
+@click.option("--profile-output", default=os.path.join(tempfile.gettempdir(), "rpi-season-screen.folded"),
+              type=click.Path(dir_okay=False),
+              help="File the folded stacks of --profile are written to, with a summary next to it.")
 @click.pass_context
-def main(ctx, rotation: int, low_light_mode: bool):
+def main(
+    ctx, rotation: int, low_light_mode: bool, frame_policy: str, sync_epoch: float, wall: str,
+    trace: str, trace_capacity: int, sensors: bool, joystick: bool, joystick_events: str,
+    transitions: str, splash: str, no_splash: bool, state_file: str, no_state: bool,
+    display_thread: bool, profile: float, profile_output: str
+):
+    try:
+        transition_table = TransitionTable.load(transitions) if transitions else TransitionTable()
+    except TransitionError as error:
+        raise click.BadParameter(str(error), param_hint="--transitions") from error
+    splash = splash or default_splash_path()
+    state_file = state_file or default_state_path()
     # Reserverd for generic implementations
     ctx.obj = {
         "rotation": rotation,
         "low_light_mode": low_light_mode,
+        "wall": wall,
+        "trace": trace,
+        "trace_capacity": trace_capacity,
+        "sense_hat": None,
+        "sensors": sensors,
+        "sensor_service": None,
+        "joystick": joystick,
+        "joystick_events": joystick_events,
+        "joystick_input": None,
+        "video_path": os.getenv("FILL_VIDEO_SOURCE"),
+        "transitions": transition_table,
+        "splash": None if no_splash or splash is None else SplashCache(splash),
+        "splash_frame": None,
+        "startup": None,
+        "state_file": None if no_state or state_file is None else StateFile(state_file),
+        "display_thread": display_thread,
+        "writer": None,
+        "profiler": SamplingProfiler(profile_output, profile) if profile else None,
+        "playback": {
+            "frame_policy": FramePolicy[frame_policy.upper()],
+            "sync_epoch": sync_epoch,
+        },
     }
 
 
 @main.command(name="auto")
 @click.pass_context
 def start_automatically(ctx):
-    rotation = ctx.obj["rotation"]
-    low_light_mode = ctx.obj["low_light_mode"]
-    sense = SenseHat()
-    controller = FillController(
-        sense, rotation=rotation, low_light_mode=low_light_mode
-    )
-    current_month = datetime.now().month
-    if current_month == 1:
-        controller = NewYearController(
-            sense, rotation=rotation, low_light_mode=low_light_mode
-        )
-    if current_month == 4:
-        controller = EasterController(
-            sense, rotation=rotation, low_light_mode=low_light_mode
-        )
-    elif current_month == 12:
-        controller = ChristmasController(
-            sense, rotation=rotation, low_light_mode=low_light_mode
-        )
-
-    fill_vid_source = os.getenv("FILL_VIDEO_SOURCE")
-    if isinstance(controller, FillController) and fill_vid_source:
-        controller = VideoController(
-            fill_vid_source, sense, rotation=rotation, low_light_mode=low_light_mode
-        )
-    start_scene(controller)
+    sense = create_sense(ctx)
+    scenes = {1: "new-year", 4: "easter", 12: "christmas"}
+    scene = scenes.get(datetime.now().month, "video" if ctx.obj["video_path"] else "fill")
+    start_scene(ctx, create_controller(ctx, sense, scene))
 
 
 @main.command(name="christmas")
@@ -81,11 +313,12 @@ def start_automatically(ctx):
 def start_christmas(ctx, snowflakes: int):
     rotation = ctx.obj["rotation"]
     low_light_mode = ctx.obj["low_light_mode"]
-    sense = SenseHat()
+    sense = create_sense(ctx)
     controller = ChristmasController(
-        sense, num_flakes=snowflakes, rotation=rotation, low_light_mode=low_light_mode
+        sense, num_flakes=snowflakes, rotation=rotation, low_light_mode=low_light_mode,
+        sensors=create_sensors(ctx)
     )
-    start_scene(controller)
+    start_scene(ctx, controller)
 
 
 @main.command(name="new-year")
@@ -93,11 +326,11 @@ def start_christmas(ctx, snowflakes: int):
 def start_new_year(ctx):
     rotation = ctx.obj["rotation"]
     low_light_mode = ctx.obj["low_light_mode"]
-    sense = SenseHat()
+    sense = create_sense(ctx)
     controller = NewYearController(
         sense, rotation=rotation, low_light_mode=low_light_mode
     )
-    start_scene(controller)
+    start_scene(ctx, controller)
 
 
 @main.command(name="easter")
@@ -105,36 +338,146 @@ def start_new_year(ctx):
 def start_easter(ctx):
     rotation = ctx.obj["rotation"]
     low_light_mode = ctx.obj["low_light_mode"]
-    sense = SenseHat()
+    sense = create_sense(ctx)
     controller = EasterController(
         sense, rotation=rotation, low_light_mode=low_light_mode
     )
-    start_scene(controller)
+    start_scene(ctx, controller)
 
 
 @main.command(name="fill")
+@click.option("--content-path", "-f", default=None, type=str,
+              help="Path to a JSON or encoded animation. Defaults to the installed animation.")
 @click.pass_context
-def start_fill(ctx):
+def start_fill(ctx, content_path: str):
     rotation = ctx.obj["rotation"]
     low_light_mode = ctx.obj["low_light_mode"]
-    sense = SenseHat()
+    sense = create_sense(ctx)
     controller = FillController(
-        sense, rotation=rotation, low_light_mode=low_light_mode
+        sense, rotation=rotation, low_light_mode=low_light_mode, content_path=content_path,
+        **ctx.obj["playback"]
     )
-    start_scene(controller)
+    start_scene(ctx, controller)
+
+
+@main.command(name="shader")
+@click.option("--preset", "-p", default=DEFAULT_PRESET, type=str, help="Name of the shader preset.")
+@click.option("--cycle", default=None, type=click.FloatRange(0, min_open=True),
+              help="Show the next preset after this many seconds.")
+@click.option("--list", "list_presets", is_flag=True, help="List the shader presets and exit.")
+@click.pass_context
+def start_shader(ctx, preset: str, cycle: float, list_presets: bool):
+    """Show procedural effects like plasma, fire, aurora or a starfield, without any assets."""
+    if list_presets:
+        print("\n".join(preset_names()))
+        return
+    rotation = ctx.obj["rotation"]
+    low_light_mode = ctx.obj["low_light_mode"]
+    sense = create_sense(ctx)
+    try:
+        controller = ShaderController(
+            sense, rotation=rotation, low_light_mode=low_light_mode, preset=preset, cycle=cycle
+        )
+    except ShaderError as error:
+        raise click.BadParameter(str(error), param_hint="--preset") from error
+    start_scene(ctx, controller)
 
 
 @main.command(name="video")
 @click.option("--video-path", "-f", type=str, help="Path to the video source.")
+@click.option("--start", default=0.0, type=click.FloatRange(0), help="Start the video at this second.")
 @click.pass_context
-def start_video(ctx, video_path):
+def start_video(ctx, video_path, start: float):
     rotation = ctx.obj["rotation"]
     low_light_mode = ctx.obj["low_light_mode"]
-    sense = SenseHat()
+    sense = create_sense(ctx)
+    ctx.obj["video_path"] = video_path
     controller = VideoController(
-        video_path, sense, rotation=rotation, low_light_mode=low_light_mode
+        video_path, sense, rotation=rotation, low_light_mode=low_light_mode, start=start,
+        **ctx.obj["playback"]
     )
-    start_scene(controller)
+    start_scene(ctx, controller)
+
+
+@main.command(name="encode")
+@click.argument("json_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output_path", type=click.Path(dir_okay=False))
+@click.option("--fps", default=JSON_FRAMERATE, type=float, help="Frames per second of the animation.")
+@click.option("--max-colors", default=256, type=click.IntRange(2, 256),
+              help="Maximum number of colors, animations with more colors are quantized.")
+@click.option("--keyframe-interval", default=250, type=click.IntRange(1),
+              help="Maximum number of pictures between two keyframes.")
+def encode(json_path: str, output_path: str, fps: float, max_colors: int, keyframe_interval: int):
+    """Encode a JSON animation for the fill scene into the compact animation format."""
+    frames = load_json_frames(json_path)
+    with open(output_path, "wb") as output:
+        stats = encode_animation(
+            output, frames, fps, max_colors=max_colors, keyframe_interval=keyframe_interval
+        )
+    json_size = os.path.getsize(json_path)
+    output_size = os.path.getsize(output_path)
+    print(f"Encoded {stats['frames']} frames as {stats['pictures']} pictures "
+          f"({stats['keyframes']} keyframes, {stats['colors']} colors, {stats['bpp']} bits per pixel)")
+    print(f"{json_size} -> {output_size} bytes ({json_size / output_size:.1f}x smaller)")
+
+
+@main.command(name="index")
+@click.argument("video_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chapter", "chapters", multiple=True, type=str,
+              help="Chapter as SECONDS:TITLE, e.g. '90:Second verse'. Can be given multiple times.")
+def index_video(video_path: str, chapters):
+    """Build the keyframe index of a video, optionally with chapters, for fast seeking."""
+    began = time.monotonic()
+    try:
+        index = VideoIndex.build(video_path)
+    except VideoIndexError as error:
+        raise click.ClickException(str(error)) from error
+    if chapters:
+        try:
+            index.chapters = sorted(
+                (float(start), title)
+                for start, title in (chapter.split(":", 1) for chapter in chapters)
+            )
+        except ValueError as error:
+            raise click.BadParameter(f"Expected SECONDS:TITLE ({error})", param_hint="--chapter")
+    else:
+        index.chapters = VideoIndex.saved_chapters(video_path)
+    index.save()
+    print(f"Indexed {index.frame_count} frames with {len(index.keyframes)} keyframes "
+          f"and {len(index.chapters)} chapters in {time.monotonic() - began:.2f} s")
+    print(f"Saved to {index.index_path}")
+
+
+@main.command(name="analyze")
+@click.argument("trace_paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--json", "as_json", is_flag=True, help="Print the reports as JSON.")
+def analyze_traces(trace_paths, as_json: bool):
+    """Report redundant writes, writes per frame, bursts and hot pixels of display traces."""
+    reports = {path: analyze(read_trace(path)) for path in trace_paths}
+    if as_json:
+        print(json.dumps(reports, indent=2))
+        return
+    for path, report in reports.items():
+        print(f"== {path}")
+        print(format_report(report))
+
+
+@main.command(name="panel")
+@click.option("--port", default=DEFAULT_PORT, type=int, help="UDP port to receive frames on.")
+@click.pass_context
+def start_panel(ctx, port: int):
+    """Show frames sent by another Raspberry Pi, as panel of its wall."""
+    sense = SenseHat()
+    sense.low_light = ctx.obj["low_light_mode"]
+    sense.clear()
+    receiver = PanelReceiver(sense, port=port)
+    signal(SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        receiver.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sense.clear()
 
 
 if __name__ == '__main__':
@@ -7,11 +7,27 @@ import random
 import sys
 
 from sense_hat import SenseHat
-from typing import List
+from typing import List, Optional
 
-from rpi_season_screen.christmas.christmastree import O, TREE, TREE_DPT
+from rpi_season_screen.christmas.christmastree import tree_background
 from rpi_season_screen.christmas.snowflake import SnowFlake
 from rpi_season_screen.sense.sense_controller import SenseController
+from rpi_season_screen.sense.snapshot import SnapshotError
+from rpi_season_screen.sensors.sensor_service import SensorService
+from rpi_season_screen.sensors.source import Channel
+from rpi_season_screen.text.scrolling_text import ScrollingText
+
+# Temperatures (degrees Celsius) with the fewest and the most snowflakes, if sensors are used
+WARM_TEMPERATURE = 10.0
+COLD_TEMPERATURE = -5.0
+# Share of the snowflakes still falling at warm temperatures
+MIN_SNOW_DENSITY = 0.25
+
+
+def snow_density(temperature: float) -> float:
+    """Share of the snowflakes falling at a temperature, from MIN_SNOW_DENSITY when warm to 1 when cold"""
+    share = (WARM_TEMPERATURE - temperature) / (WARM_TEMPERATURE - COLD_TEMPERATURE)
+    return MIN_SNOW_DENSITY + (1 - MIN_SNOW_DENSITY) * min(1.0, max(0.0, share))
 
 
 class ChristmasController(SenseController):
@@ -20,17 +36,30 @@ class ChristmasController(SenseController):
     # Arguments
 
     * `sense` - The RPI Sense Hat the Controller is based on
-    * `num_flakes` - Number of snowflakes, default and max being 8
+    * `num_flakes` - Number of snowflakes per 8 columns, default and max being 8
     * `rotation` - Rotation of the tree, value between 0 and 360.
     * `low_light_mode` - True if the Sense Hat should use the Low Light mode.
+    * `sensors` - Running `SensorService`. If given, the colder it is the more snowflakes fall.
     """
     def __init__(
-        self, sense: SenseHat, num_flakes: int = 8, rotation: int = 0, low_light_mode: bool = True
+        self,
+        sense: SenseHat,
+        num_flakes: int = 8,
+        rotation: int = 0,
+        low_light_mode: bool = True,
+        sensors: Optional[SensorService] = None,
     ):
-        super().__init__(sense, rotation, low_light_mode)
+        super().__init__(sense, rotation, low_light_mode, sensors)
         self.snowflakes: list[SnowFlake] = []
-        self.parallel_flakes: int = num_flakes
-        self.available_indices = [i for i in range(8)]
+        self.parallel_flakes: int = min(self.width, num_flakes * self.width // 8)
+        # Number of snowflakes that should be falling, adjusted to the temperature
+        self.target_flakes: int = self.parallel_flakes
+        self._retired_flakes: List[SnowFlake] = []
+        # Retired snowflakes, reused when more snowflakes have to fall again
+        self._flake_pool: List[SnowFlake] = []
+        self.available_indices = [i for i in range(self.width)]
+        self.background, self.depths = tree_background(self.width, self.height)
+        self.background_pixels: List[List[int]] = self.background.reshape(-1, 3).tolist()
         self.running = False
 
     def handle_signal(self, signum, frame):
@@ -51,16 +80,31 @@ class ChristmasController(SenseController):
 
     def _draw_tree(self):
         """Draw the initial Christmas Tree"""
-        self.sense.set_pixels(TREE)
+        self.set_pixels(self.background)
 
     def _init_scene(self):
         """Initialize the scene"""
         self._draw_tree()
-        self.__generate_snowflakes()
-
-    def merry_christmas(self):
-        """Display 'Merry Christmas!' message on SenseHat"""
-        self.sense.show_message("Merry Christmas!")
+        if not self.snowflakes:
+            self.__generate_snowflakes()
+
+    def _snapshot(self) -> dict:
+        """The falling snowflakes"""
+        return {"snowflakes": [flake.snapshot() for flake in self.snowflakes]}
+
+    def _restore(self, state: dict):
+        """Let the snowflakes of a snapshot continue to fall"""
+        snowflakes = [SnowFlake.restore(flake) for flake in state["snowflakes"]]
+        columns = [flake.x for flake in snowflakes]
+        if len(set(columns)) != len(columns) or not all(0 <= x < self.width for x in columns) \
+                or not all(0 <= flake.y < self.height for flake in snowflakes):
+            raise SnapshotError("Snowflakes out of the display")
+        self.snowflakes = snowflakes
+        self.available_indices = [i for i in range(self.width) if i not in columns]
+
+    def merry_christmas(self) -> ScrollingText:
+        """Scroll a 'Merry Christmas!' message over the tree and the snowflakes"""
+        return self.show_text("Merry Christmas!")
 
     def tree_depth_at(self, position: List[int]) -> int:
         """Return TREE_DPT if there is a value at TREE position and 11 (far back) if there is none.
@@ -71,11 +115,7 @@ class ChristmasController(SenseController):
                     with two elements, where the first one is x and the
                     second one is y.
         """
-        index = position[0] + 8 * position[1]
-        if O == TREE[index]:
-            return 11
-        else:
-            return TREE_DPT
+        return self.depths[position[1], position[0]]
 
     def clear_at(self, position: List[int]):
         """Clear a snowflake at certain position
@@ -86,20 +126,57 @@ class ChristmasController(SenseController):
                     with two elements, where the first one is x and the
                     second one is y.
         """
-        index = position[0] + 8 * position[1]
-        self.sense.set_pixel(
-            *position,
-            *TREE[index]
-        )
+        index = position[0] + self.width * position[1]
+        self.draw(position, self.background_pixels[index])
 
     def __generate_snowflakes(self):
         """Generate Snowflakes that can then be used to rain down"""
-        for _ in range(self.parallel_flakes):
-            index = random.choice(self.available_indices)
-            self.available_indices.remove(index)
-            self.snowflakes.append(SnowFlake(index, 0))
+        self._update_target_flakes()
+        for _ in range(self.target_flakes):
+            self.__spawn_snowflake()
+
+    def __spawn_snowflake(self):
+        """Let a new Snowflake fall from the top of a free column"""
+        index = random.choice(self.available_indices)
+        self.available_indices.remove(index)
+        if self._flake_pool:
+            flake = self._flake_pool.pop()
+            flake.reset(index, 0)
+        else:
+            flake = SnowFlake(index, 0)
+        self.snowflakes.append(flake)
+
+    def _update_target_flakes(self):
+        """Adjust the number of falling snowflakes to the averaged temperature"""
+        if self.sensors is None:
+            return
+        temperature = self.sensors.snapshot.average(Channel.TEMPERATURE)
+        if temperature is not None:
+            self.target_flakes = max(1, round(self.parallel_flakes * snow_density(temperature)))
+
+    def retire_snowflake(self, flake: SnowFlake) -> bool:
+        """Called by a snowflake that reached the ground.
+
+        # Returns
+
+        `bool` - True if the snowflake stops falling, because there are more than `target_flakes`.
+        """
+        if len(self.snowflakes) - len(self._retired_flakes) <= self.target_flakes:
+            return False
+        self._retired_flakes.append(flake)
+        return True
 
     def _next_frame(self):
         """Rain Snowflakes down from the top on the Sense Hat"""
         for flake in self.snowflakes:
             flake.move(self)
+        if self.sensors is None:
+            return
+        if self._retired_flakes:
+            for flake in self._retired_flakes:
+                self.snowflakes.remove(flake)
+            self._flake_pool.extend(self._retired_flakes)
+            self._retired_flakes.clear()
+        self._update_target_flakes()
+        while len(self.snowflakes) < self.target_flakes and self.available_indices:
+            self.__spawn_snowflake()
@@ -3,6 +3,10 @@
 Copyright (c) 2022 Maximilian Stephan <stephan.maxi@icloud.com>
 """
 
+from typing import Tuple
+
+import numpy as np
+
 R = [255, 0, 0]     # Red
 G = [0, 255, 0]     # Green
 B = [0, 0, 255]     # Blue
@@ -25,3 +29,34 @@ TREE = [
 
 
 TREE_DPT = 7
+# Depth of everything behind the tree
+BACKGROUND_DPT = 11
+
+TREE_WIDTH = 8
+TREE_HEIGHT = 8
+
+
+def tree_background(width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Fill a canvas with trees, standing side by side on its bottom row.
+
+    On a single 8x8 Sense Hat, this is exactly `TREE`.
+
+    # Arguments
+
+    * `width` - Width of the canvas
+    * `height` - Height of the canvas
+
+    # Returns
+
+    `Tuple[np.ndarray, np.ndarray]` - The colors of shape (height, width, 3) and the depth of
+    every pixel of shape (height, width).
+    """
+    tree = np.array(TREE, dtype=np.uint8).reshape(TREE_HEIGHT, TREE_WIDTH, 3)
+    repeats = -(-width // TREE_WIDTH)
+    row = np.tile(tree, (1, repeats, 1))[:, :width]
+
+    colors = np.zeros((height, width, 3), dtype=np.uint8)
+    rows = min(height, TREE_HEIGHT)
+    colors[height - rows:] = row[TREE_HEIGHT - rows:]
+    depths = np.where(colors.any(axis=-1), TREE_DPT, BACKGROUND_DPT)
+    return colors, depths
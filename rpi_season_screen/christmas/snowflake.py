@@ -11,6 +11,7 @@ Copyright (c) 2022 Maximilian Stephan <stephan.maxi@icloud.com>
 import random
 import time
 
+WHITE = (255, 255, 255)
 
 
 class SnowFlake:
@@ -19,15 +20,36 @@ class SnowFlake:
     # Arguments
 
     * `x` - x position of the Snowflake
-    * `y` - initial y position of the Snowflake, 0 being top and 7 being bottom
+    * `y` - initial y position of the Snowflake, 0 being top and the canvas height - 1 being bottom
     """
+    __slots__ = ("x", "y", "depth", "time", "last_time")
+
     def __init__(self, x: int, y: int):
+        self.reset(x, y)
+
+    def reset(self, x: int, y: int):
+        """Let the snowflake fall again from a new position, with a new depth"""
         self.x = x
         self.y = y
         self.depth = random.randint(1, 10)
         self.time = SnowFlake._time_by_depth(self.depth)
         self.last_time = time.time()
 
+    def snapshot(self) -> dict:
+        """Position, depth and the seconds since the last move of the snowflake"""
+        return {"x": self.x, "y": self.y, "depth": self.depth, "waited": time.time() - self.last_time}
+
+    @staticmethod
+    def restore(state: dict) -> "SnowFlake":
+        """Create a snowflake from its snapshot"""
+        flake = SnowFlake(int(state["x"]), int(state["y"]))
+        flake.depth = int(state["depth"])
+        if not 0 < flake.depth <= 10:
+            raise ValueError(f"Invalid depth {flake.depth}")
+        flake.time = SnowFlake._time_by_depth(flake.depth)
+        flake.last_time = time.time() - float(state["waited"])
+        return flake
+
     def move(self, controller):
         """Move this snowflake one field down if the timing is correct.
 
@@ -39,8 +61,10 @@ class SnowFlake:
             self.last_time = time.time()
             controller.clear_at([self.x, self.y])
             self.y += 1
-            if self.y > 7:
+            if self.y >= controller.height:
                 controller.available_indices.append(self.x)
+                if controller.retire_snowflake(self):
+                    return
                 self.depth = random.randint(1, 10)
                 self.time = SnowFlake._time_by_depth(self.depth)
                 self.y = 0
@@ -48,7 +72,7 @@ class SnowFlake:
                 controller.available_indices.remove(self.x)
 
             if controller.tree_depth_at([self.x, self.y]) > self.depth:
-                controller.draw((self.x, self.y), [255, 255, 255])
+                controller.draw((self.x, self.y), WHITE)
 
     @staticmethod
     def _time_by_depth(depth: int) -> float:
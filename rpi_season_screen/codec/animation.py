@@ -0,0 +1,345 @@
+""" Compact storage format for frame based animations.
+
+Animations like Bad Apple use only a handful of colors and contain long runs of identical
+or nearly identical frames. This format stores
+
+* a palette per clip, so that every pixel is an index of 1 to 8 bits,
+* every distinct picture only once, together with the number of frames it is held for,
+* pictures either as bit packed keyframe, run-length encoded keyframe or as run-length encoded
+  delta to the previous picture, whatever is the smallest.
+
+File layout (little endian):
+
+    header      "RSSA", version (u8), width (u16), height (u16), fps (f32),
+                frames (u32), palette size (u16), bits per pixel (u8)
+    palette     palette size * (r, g, b) bytes
+    records     type (u8), hold (u16), payload length (u32), payload
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import json
+import math
+import struct
+
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"RSSA"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHfIHB")
+RECORD = struct.Struct("<BHI")
+
+RECORD_KEY_PACKED = 1   # bit packed palette indices of all pixels
+RECORD_KEY_RLE = 2      # (run length - 1, index) pairs over all pixels
+RECORD_DELTA = 3        # (skip, run length, index) triples of changed pixels
+
+MAX_RUN = 255
+MAX_HOLD = 0xFFFF
+
+
+class AnimationError(Exception):
+    """Errors related to encoded animations"""
+
+
+def build_palette(frames: np.ndarray, max_colors: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the palette of a clip and map all pixels to it.
+
+    Clips with more colors than `max_colors` are quantized by dropping the least
+    significant bits of every channel until the colors fit. If even a single bit per channel
+    gives too many colors, the most frequent colors are kept and every other color is mapped to
+    the closest of them.
+
+    # Arguments
+
+    * `frames` - Array of shape (frames, height, width, 3)
+    * `max_colors` - Maximum number of palette entries, at most 256
+
+    # Returns
+
+    `Tuple[np.ndarray, np.ndarray]` - The palette of shape (colors, 3) and the palette index
+    of every pixel of shape (frames, height * width).
+    """
+    if not 2 <= max_colors <= 256:
+        raise AnimationError(f"Palettes need between 2 and 256 colors, not {max_colors}")
+    pixels = frames.reshape(-1, 3)
+    for dropped_bits in range(8):
+        reduced = pixels >> dropped_bits
+        palette, indices = np.unique(reduced, axis=0, return_inverse=True)
+        if len(palette) <= max_colors:
+            break
+    else:
+        palette, indices = np.unique(pixels, axis=0, return_inverse=True)
+        indices = indices.reshape(-1)
+        kept = np.argsort(np.bincount(indices), kind="stable")[::-1][:max_colors]
+        distances = ((palette[:, np.newaxis].astype(np.int32) - palette[kept]) ** 2).sum(axis=2)
+        indices = np.argmin(distances, axis=1)[indices]
+        palette = palette[kept]
+        dropped_bits = 0
+    if dropped_bits:
+        # Use the center of the quantized range as color
+        palette = (palette << dropped_bits) + (1 << (dropped_bits - 1))
+    return palette.astype(np.uint8), indices.reshape(frames.shape[0], -1).astype(np.uint8)
+
+
+def bits_per_pixel(colors: int) -> int:
+    """Number of bits needed for an index into a palette with `colors` entries"""
+    return max(1, math.ceil(math.log2(colors)))
+
+
+def pack_indices(indices: np.ndarray, bpp: int) -> bytes:
+    """Pack palette indices with `bpp` bits each"""
+    shifts = np.arange(bpp - 1, -1, -1, dtype=np.uint8)
+    bits = (indices[:, np.newaxis] >> shifts) & 1
+    return np.packbits(bits.astype(np.uint8)).tobytes()
+
+
+def unpack_indices(payload: bytes, bpp: int, count: int) -> np.ndarray:
+    """Inverse of `pack_indices`"""
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))[:count * bpp]
+    weights = (1 << np.arange(bpp - 1, -1, -1)).astype(np.uint8)
+    return (bits.reshape(count, bpp) * weights).sum(axis=1).astype(np.uint8)
+
+
+def _runs(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start positions and lengths of the runs of equal values"""
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    lengths = np.diff(np.append(starts, len(values)))
+    return starts, lengths
+
+
+def encode_rle(indices: np.ndarray) -> bytes:
+    """Run-length encode palette indices as (run length - 1, index) pairs"""
+    payload = bytearray()
+    starts, lengths = _runs(indices)
+    for start, length in zip(starts, lengths):
+        while length > 0:
+            run = min(length, MAX_RUN + 1)
+            payload += bytes((run - 1, indices[start]))
+            length -= run
+    return bytes(payload)
+
+
+def decode_rle(payload: bytes, count: int) -> np.ndarray:
+    """Inverse of `encode_rle`"""
+    pairs = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 2)
+    indices = np.repeat(pairs[:, 1], pairs[:, 0].astype(np.int64) + 1)
+    if len(indices) != count:
+        raise AnimationError(f"Corrupt keyframe: {len(indices)} instead of {count} pixels")
+    return indices
+
+
+def encode_delta(previous: np.ndarray, indices: np.ndarray) -> bytes:
+    """Encode the changed pixels as (skip, run length, index) triples.
+
+    `skip` is the number of unchanged pixels before the run. Gaps that do not fit into
+    a byte are bridged with empty runs.
+    """
+    payload = bytearray()
+    changed = np.flatnonzero(previous != indices)
+    position = 0
+    while len(changed):
+        start = changed[0]
+        value = indices[start]
+        # Extend the run over consecutive changed pixels with the same index
+        length = 1
+        while (length < len(changed) and length < MAX_RUN
+               and changed[length] == start + length and indices[start + length] == value):
+            length += 1
+        skip = start - position
+        while skip > MAX_RUN:
+            payload += bytes((MAX_RUN, 0, 0))
+            skip -= MAX_RUN
+        payload += bytes((skip, length, value))
+        position = start + length
+        changed = changed[length:]
+    return bytes(payload)
+
+
+def apply_delta(payload: bytes, indices: np.ndarray):
+    """Apply a delta encoded by `encode_delta` to `indices` in place"""
+    position = 0
+    for skip, length, value in np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3).tolist():
+        position += skip
+        indices[position:position + length] = value
+        position += length
+
+
+def encode_animation(
+    output: BinaryIO,
+    frames: np.ndarray,
+    fps: float,
+    max_colors: int = 256,
+    keyframe_interval: int = 250,
+) -> Dict[str, int]:
+    """Encode an animation.
+
+    # Arguments
+
+    * `output` - Binary file to write to
+    * `frames` - Array of shape (frames, height, width, 3)
+    * `fps` - Frames per second
+    * `max_colors` - Maximum size of the palette
+    * `keyframe_interval` - Maximum number of pictures between two keyframes,
+                            which limits how far a decoder has to go back when seeking.
+
+    # Returns
+
+    `Dict[str, int]` - Statistics about the encoded animation.
+    """
+    frame_count, height, width, _ = frames.shape
+    palette, all_indices = build_palette(frames, max_colors)
+    bpp = bits_per_pixel(len(palette))
+    output.write(HEADER.pack(MAGIC, VERSION, width, height, fps, frame_count, len(palette), bpp))
+    output.write(palette.tobytes())
+
+    stats = {"frames": frame_count, "pictures": 0, "keyframes": 0, "colors": len(palette), "bpp": bpp}
+    previous: Optional[np.ndarray] = None
+    since_keyframe = 0
+    index = 0
+    while index < frame_count:
+        indices = all_indices[index]
+        hold = 1
+        while (index + hold < frame_count and hold < MAX_HOLD
+               and np.array_equal(all_indices[index + hold], indices)):
+            hold += 1
+
+        candidates = [
+            (RECORD_KEY_PACKED, pack_indices(indices, bpp)),
+            (RECORD_KEY_RLE, encode_rle(indices)),
+        ]
+        if previous is not None and since_keyframe < keyframe_interval:
+            candidates.append((RECORD_DELTA, encode_delta(previous, indices)))
+        record_type, payload = min(candidates, key=lambda candidate: len(candidate[1]))
+        output.write(RECORD.pack(record_type, hold, len(payload)))
+        output.write(payload)
+
+        if record_type == RECORD_DELTA:
+            since_keyframe += 1
+        else:
+            since_keyframe = 0
+            stats["keyframes"] += 1
+        stats["pictures"] += 1
+        previous = indices
+        index += hold
+    return stats
+
+
+class AnimationDecoder:
+    """Incremental decoder for encoded animations.
+
+    Only the current picture is kept in memory. Records are read from the file when they
+    are needed, keyframe positions are remembered to seek backwards.
+
+    # Arguments
+
+    * `path` - Path to the encoded animation
+    """
+    def __init__(self, path: str):
+        self.file: BinaryIO = open(path, "rb")
+        header = self.file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise AnimationError(f"{path} is too short to be an animation")
+        magic, version, self.width, self.height, self.fps, self.frame_count, colors, self.bpp = \
+            HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise AnimationError(f"{path} is not an animation of version {VERSION}")
+        self.palette: np.ndarray = np.frombuffer(self.file.read(colors * 3), dtype=np.uint8).reshape(-1, 3)
+        self.pixel_count: int = self.width * self.height
+        self.data_offset: int = self.file.tell()
+
+        # Frame index -> file offset of keyframes seen so far
+        self.keyframes: Dict[int, int] = {}
+        self.indices: np.ndarray = np.zeros(self.pixel_count, dtype=np.uint8)
+        self.start: int = 0
+        self.hold: int = 0
+        self._next_offset: int = self.data_offset
+
+    def close(self):
+        self.file.close()
+
+    def rewind(self):
+        """Go back to the first picture"""
+        self.start = 0
+        self.hold = 0
+        self._next_offset = self.data_offset
+
+    def _read_record(self) -> bool:
+        """Decode the next picture. Returns False at the end of the animation."""
+        if self.start + self.hold >= self.frame_count:
+            return False
+        self.file.seek(self._next_offset)
+        header = self.file.read(RECORD.size)
+        if len(header) != RECORD.size:
+            raise AnimationError("Unexpected end of animation")
+        record_type, hold, length = RECORD.unpack(header)
+        payload = self.file.read(length)
+        if record_type == RECORD_KEY_PACKED:
+            self.indices = unpack_indices(payload, self.bpp, self.pixel_count)
+        elif record_type == RECORD_KEY_RLE:
+            self.indices = decode_rle(payload, self.pixel_count)
+        elif record_type == RECORD_DELTA:
+            apply_delta(payload, self.indices)
+        else:
+            raise AnimationError(f"Unknown record type {record_type}")
+
+        self.start += self.hold
+        if record_type != RECORD_DELTA:
+            self.keyframes[self.start] = self._next_offset
+        self.hold = hold
+        self._next_offset += RECORD.size + length
+        return True
+
+    def seek(self, frame: int):
+        """Decode the picture that is shown at a frame.
+
+        Seeking forward decodes all pictures in between, seeking backwards starts over
+        from the closest known keyframe.
+
+        # Arguments
+
+        * `frame` - Frame index between 0 and `frame_count - 1`
+        """
+        if not 0 <= frame < self.frame_count:
+            raise AnimationError(f"Frame {frame} is out of range (0 - {self.frame_count - 1})")
+        if frame < self.start:
+            known = [start for start in self.keyframes if start <= frame]
+            keyframe = max(known) if known else 0
+            if keyframe in self.keyframes:
+                self.start, self.hold = keyframe, 0
+                self._next_offset = self.keyframes[keyframe]
+            else:
+                self.rewind()
+        while frame >= self.start + self.hold:
+            if not self._read_record():
+                raise AnimationError("Unexpected end of animation")
+
+    def picture(self) -> np.ndarray:
+        """The current picture as array of shape (height, width, 3)"""
+        return self.palette[self.indices].reshape(self.height, self.width, 3)
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, int]]:
+        """Iterate over all pictures from the start, as (picture, hold) tuples"""
+        self.rewind()
+        while self._read_record():
+            yield self.picture(), self.hold
+
+
+def load_json_frames(path: str, width: int = 8, height: int = 8) -> np.ndarray:
+    """Load an animation in the JSON format of the fill content.
+
+    # Arguments
+
+    * `path` - Path to the JSON file
+    * `width` - Width of the frames
+    * `height` - Height of the frames
+
+    # Returns
+
+    `np.ndarray` - Array of shape (frames, height, width, 3).
+    """
+    with open(path, "r", encoding="utf-8") as jsonfile:
+        content = json.load(jsonfile)
+    frames = [content[f"{index}"] for index in range(len(content))]
+    return np.asarray(frames, dtype=np.uint8).reshape(len(frames), height, width, 3)
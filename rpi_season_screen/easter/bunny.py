@@ -11,6 +11,8 @@ import time
 from enum import Enum, auto
 from typing import List
 
+import numpy as np
+
 from rpi_season_screen.sense.sense_controller import SenseController
 
 MAX_RAD = 4
@@ -54,11 +56,22 @@ class BunnyDirection(Enum):
 
 class EasterBunny:
     """Representation of the easter bunny coming in from the left.
+
+    # Arguments
+
+    * `width` - Width of the canvas the bunny hops over
+    * `height` - Height of the canvas, the bunny sits on its bottom row
     """
-    def __init__(self):
+    __slots__ = ("state", "matrix", "_spare", "timedelta", "last_time", "motion_cycle", "current_motion")
+
+    def __init__(self, width: int = X_MAX + 1, height: int = Y_MAX + 1):
         self.state: BunnyState = BunnyState.ENTERING
-        self.matrix: List[List[int]] = BUNNY.copy()
-        self.prev_matrix: List[List[int]] = []
+        self.matrix: np.ndarray = np.zeros((height, width, 3), dtype=np.uint8)
+        bunny = np.array(BUNNY, dtype=np.uint8).reshape(Y_MAX + 1, X_MAX + 1, 3)
+        rows, columns = min(height, Y_MAX + 1), min(width, X_MAX + 1)
+        self.matrix[height - rows:, :columns] = bunny[Y_MAX + 1 - rows:, :columns]
+        # The next picture is drawn into this buffer, the two are swapped on every hop
+        self._spare: np.ndarray = np.zeros_like(self.matrix)
         self.timedelta: float = 0.1
         self.last_time: float = time.time()
         self.motion_cycle: List[BunnyDirection] = [
@@ -68,6 +81,23 @@ class EasterBunny:
         ]
         self.current_motion = 0
 
+    def snapshot(self) -> dict:
+        """Picture, motion and the seconds since the last hop of the bunny"""
+        return {
+            "matrix": self.matrix.tolist(),
+            "motion": self.current_motion,
+            "waited": time.time() - self.last_time,
+        }
+
+    def restore(self, state: dict):
+        """Continue hopping from a snapshot"""
+        matrix = np.asarray(state["matrix"], dtype=np.uint8)
+        if matrix.shape != self.matrix.shape:
+            raise ValueError(f"Bunny of shape {matrix.shape}")
+        self.matrix[:] = matrix
+        self.current_motion = int(state["motion"]) % len(self.motion_cycle)
+        self.last_time = time.time() - float(state["waited"])
+
     def move(self, controller: SenseController):
         """Move the bunny.
 
@@ -80,18 +110,8 @@ class EasterBunny:
             return
 
         self.last_time = time.time()
-        new_matrix: List[List[int]] = []
-        for y_pos in range(Y_MAX + 1):
-            for x_pos in range(X_MAX + 1):
-                new_color = self._get_new_color_at(x_pos=x_pos, y_pos=y_pos)
-                new_matrix.append(
-                    new_color
-                )
-                controller.draw(
-                    position=(x_pos, y_pos),
-                    color=new_color,
-                )
-        self.matrix = new_matrix
+        self.matrix, self._spare = self._next_matrix(), self.matrix
+        controller.set_pixels(self.matrix)
         self._change_motion()
 
     def _change_motion(self):
@@ -99,31 +119,28 @@ class EasterBunny:
         if self.current_motion >= len(self.motion_cycle):
             self.current_motion = 0
 
-    def _get_new_color_at(self, x_pos: int, y_pos: int) -> List[int]:
-        """Get the new color of a point for the next frame at a certain position
-
-        # Arguments
-
-        * `x_pos` - x position
+    def _next_matrix(self) -> np.ndarray:
+        """Shift the whole picture one step into the current direction.
 
-        * `y_pos` - y position
+        Moving up or down, the picture is filled with black from the bottom or top.
+        Moving right, the right column wraps around to the left.
+        The picture is drawn into the spare buffer, the current picture stays untouched.
 
         # Returns
 
-        `List[int]` - Color
+        `np.ndarray` - The new picture of shape (height, width, 3)
         """
-        # WARNING! this only works if the bunny does not leave the screen!
-        matrix_index: int = (Y_MAX + 1) * y_pos + x_pos
-
-        if self.motion_cycle[self.current_motion] == BunnyDirection.UP:
-            if y_pos >= Y_MAX:
-                return O
-            matrix_index = matrix_index + (Y_MAX + 1)
-        elif self.motion_cycle[self.current_motion] == BunnyDirection.DOWN:
-            if y_pos == 0:
-                return O
-            matrix_index = matrix_index - (Y_MAX + 1)
-        elif self.motion_cycle[self.current_motion] == BunnyDirection.RIGHT:
-            matrix_index = matrix_index - 1 if x_pos > 0 else X_MAX + (1 + Y_MAX) * y_pos
-
-        return self.matrix[matrix_index].copy()
+        direction = self.motion_cycle[self.current_motion]
+        matrix = self._spare
+        if direction == BunnyDirection.RIGHT:
+            matrix[:, 1:] = self.matrix[:, :-1]
+            matrix[:, :1] = self.matrix[:, -1:]
+        elif direction == BunnyDirection.UP:
+            matrix[:-1] = self.matrix[1:]
+            matrix[-1:] = 0
+        elif direction == BunnyDirection.DOWN:
+            matrix[1:] = self.matrix[:-1]
+            matrix[:1] = 0
+        else:
+            matrix[:] = self.matrix
+        return matrix
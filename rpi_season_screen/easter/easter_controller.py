@@ -25,7 +25,7 @@ class EasterController(SenseController):
         low_light_mode: bool = True,
     ):
         super().__init__(sense, rotation, low_light_mode)
-        self.bunny: EasterBunny = EasterBunny()
+        self.bunny: EasterBunny = EasterBunny(self.width, self.height)
 
     def _init_scene(self):
         """Initialize the Scene.
@@ -34,6 +34,14 @@ class EasterController(SenseController):
         """
         return
 
+    def _snapshot(self) -> dict:
+        """The hopping bunny"""
+        return {"bunny": self.bunny.snapshot()}
+
+    def _restore(self, state: dict):
+        """Let the bunny of a snapshot continue to hop"""
+        self.bunny.restore(state["bunny"])
+
     def _next_frame(self):
         """Start the scene loop here"""
         self.bunny.move(self)
@@ -3,11 +3,23 @@
 Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
 """
 import json
+import os
 import time
 
+from typing import List, Optional
+
+import numpy as np
 from sense_hat import SenseHat
-from rpi_season_screen.sense.sense_controller import SenseController
+from rpi_season_screen.codec.animation import AnimationDecoder
+from rpi_season_screen.playback.timeline import FramePolicy, PlaybackTimeline
+from rpi_season_screen.sense.sense_controller import LOADING_POLL, SenseController
 
+DEFAULT_ANIMATION_PATH = "/etc/rpi-season-screen/bad_apple.rssa"
+DEFAULT_JSON_PATH = "/etc/rpi-season-screen/bad_apple.json"
+JSON_FRAMERATE = 27 #fps
+# Size of the frames in the JSON animation
+CONTENT_WIDTH = 8
+CONTENT_HEIGHT = 8
 
 class FillController(SenseController):
     """Wrapper for the RPI Sense hat to display "fill" content between events.
@@ -17,27 +29,134 @@ class FillController(SenseController):
     * `sense` - The RPI Sense Hat the Controller is based on
     * `rotation` - Rotation of the tree, value between 0 and 306.
     * `low_light_mode` - True if the Sense Hat should use the Low Light mode.
+    * `content_path` - Path to a JSON or encoded (see `rpi-season-screen encode`) animation.
+                    Defaults to the installed Bad Apple animation, preferring the encoded one.
+    * `frame_policy` - Whether to drop or hold frames when the playback falls behind.
+    * `sync_epoch` - Unix timestamp the animation started at, to play in sync with other displays.
     """
     def __init__(
-        self, sense: SenseHat, rotation: int = 0, low_light_mode: bool = True
+        self,
+        sense: SenseHat,
+        rotation: int = 0,
+        low_light_mode: bool = True,
+        content_path: Optional[str] = None,
+        frame_policy: FramePolicy = FramePolicy.DROP,
+        sync_epoch: Optional[float] = None,
     ):
         super().__init__(sense, rotation, low_light_mode)
-        with open("/etc/rpi-season-screen/bad_apple.json", "r", encoding="utf-8") as jsonfile:
-            self.frames = json.load(jsonfile)
+        if content_path is None:
+            content_path = DEFAULT_ANIMATION_PATH
+            # An encoded animation that is older than the JSON animation is outdated
+            if not os.path.exists(content_path) or (
+                os.path.exists(DEFAULT_JSON_PATH)
+                and os.path.getmtime(DEFAULT_JSON_PATH) > os.path.getmtime(content_path)
+            ):
+                content_path = DEFAULT_JSON_PATH
+        if not os.path.exists(content_path):
+            raise FileNotFoundError(f"Path to content ({content_path}) does not exist.")
+        self.content_path: str = content_path
+        self.frames = None
+        self.animation: Optional[AnimationDecoder] = None
+        if content_path.endswith(".json"):
+            # JSON animations are parsed in the background by `_init_scene`
+            frame_count = 1
+            self.framerate = JSON_FRAMERATE
+            self.content_width, self.content_height = CONTENT_WIDTH, CONTENT_HEIGHT
+        else:
+            self.animation = AnimationDecoder(content_path)
+            frame_count = self.animation.frame_count
+            self.framerate = self.animation.fps
+            self.content_width, self.content_height = self.animation.width, self.animation.height
         self.current_frame = 0
-        self.framerate = 27 #fps
-        self.last_time = time.time()
+        # Frame the playback starts at, unless it is synchronized by a `sync_epoch`
+        self.start_frame: int = 0
+        # Start frame of the encoded picture currently on the display
+        self._shown_picture: Optional[int] = None
+        self.timeline = PlaybackTimeline(
+            frame_count, self.framerate, policy=frame_policy, sync_epoch=sync_epoch
+        )
+        # Rows and columns of the content to show on every row and column of larger canvases
+        self._scale_index = None
+        if (self.width, self.height) != (self.content_width, self.content_height):
+            self._scale_index = np.ix_(
+                np.arange(self.height) * self.content_height // self.height,
+                np.arange(self.width) * self.content_width // self.width,
+            )
 
     def _init_scene(self):
-        """Draw the scene's background. Here nothing happens."""
-        return
+        """Draw the scene's background. Here only the playback is started.
+
+        JSON animations are loaded in the background, their playback starts once they are loaded.
+        """
+        if self.animation is None and self.frames is None:
+            self.load_in_background(self._load_frames)
+            return
+        self._start_playback()
+
+    def _start_playback(self):
+        """Start the playback at the start frame"""
+        self.timeline.start()
+        if self.timeline.sync_epoch is None and 0 < self.start_frame < self.timeline.frame_count:
+            self.timeline.seek(self.start_frame)
+            self.current_frame = self.start_frame
+
+    def close(self):
+        """Close the encoded animation"""
+        super().close()
+        if self.animation is not None:
+            self.animation.close()
+
+    def _snapshot(self) -> dict:
+        """The animation and the frame it is at"""
+        return {"content_path": self.content_path, "frame": self.current_frame}
+
+    def _restore(self, state: dict):
+        """Continue the animation at the frame of the snapshot, if it is the same animation"""
+        if state["content_path"] == self.content_path:
+            self.start_frame = int(state["frame"])
+
+    def _load_frames(self):
+        """Parse the JSON animation"""
+        with open(self.content_path, "r", encoding="utf-8") as jsonfile:
+            frames = json.load(jsonfile)
+        self.timeline.set_frame_count(len(frames))
+        self.frames = frames
+        print(f"Loaded {len(frames)} frames from {self.content_path}")
 
     def _next_frame(self):
         """Start the scene loop here"""
-        if self.last_time + (1 / self.framerate) > time.time():
+        if self.loading:
+            self.wake_time = time.monotonic() + LOADING_POLL
+            return
+        if self.timeline.origin is None:
+            # The animation was loaded in the background
+            self._start_playback()
+        frame = self.timeline.poll()
+        if frame is None:
             return
-        self.last_time = time.time()
-        self.sense.set_pixels(self.frames[f"{self.current_frame}"])
-        self.current_frame += 1
-        if self.current_frame >= len(self.frames):
-            self.current_frame = 0
+        if frame < self.current_frame:
+            print(f"Restarting animation ({self.timeline.stats()})")
+            self.transition_loop()
+        self.current_frame = frame
+        if self.animation is None:
+            self.set_pixels(self._scale(self.frames[f"{self.current_frame}"]))
+            self.wake_time = self.timeline.next_frame_time()
+            return
+
+        self.animation.seek(frame)
+        if self._shown_picture != self.animation.start:
+            self._shown_picture = self.animation.start
+            self.set_pixels(self._scale(self.animation.picture()))
+        # Sleep through the frames the picture is held for
+        next_position = self.timeline.position + self.animation.start + self.animation.hold - frame
+        self.timeline.skip_until(next_position)
+        self.wake_time = self.timeline.time_of(next_position)
+
+    def _scale(self, pixels: List[List[int]]):
+        """Scale a frame of the animation to the size of the canvas (nearest neighbour)"""
+        if self._scale_index is None:
+            return pixels
+        content = np.asarray(pixels, dtype=np.uint8).reshape(
+            self.content_height, self.content_width, 3
+        )
+        return content[self._scale_index]
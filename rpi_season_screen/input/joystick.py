@@ -0,0 +1,229 @@
+""" Non-blocking input from the Sense Hat joystick.
+
+The joystick is an evdev device. `EvdevJoystick` reads it without blocking and `JoystickInput`
+registers it with a selector, so the scene loop can sleep until either its next frame is due
+or the joystick was used, whatever comes first. Events are then dispatched to the active
+controller within the same iteration of the scene loop.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import glob
+import json
+import os
+import selectors
+import struct
+import time
+
+from abc import abstractmethod
+from enum import Enum, auto
+from typing import List, NamedTuple, Optional, Tuple
+
+JOYSTICK_NAME = "Raspberry Pi Sense HAT Joystick"
+
+# struct input_event of linux/input.h: seconds, microseconds, type, code, value.
+# Native sizes and alignment on purpose: the timestamps are C longs, so the layout has to match the
+# running kernel's struct (16 bytes on 32 bit Raspberry Pi OS, 24 bytes on 64 bit).
+EVENT_FORMAT = struct.Struct("llHHi")
+EV_KEY = 0x01
+KEY_ENTER = 28
+KEY_UP = 103
+KEY_LEFT = 105
+KEY_RIGHT = 106
+KEY_DOWN = 108
+
+
+class Direction(Enum):
+    """Direction the joystick was moved in, MIDDLE being a push"""
+    UP = auto()
+    DOWN = auto()
+    LEFT = auto()
+    RIGHT = auto()
+    MIDDLE = auto()
+
+
+class Action(Enum):
+    """What happened to the joystick"""
+    PRESSED = auto()
+    RELEASED = auto()
+    HELD = auto()
+
+
+KEY_DIRECTIONS = {
+    KEY_UP: Direction.UP,
+    KEY_DOWN: Direction.DOWN,
+    KEY_LEFT: Direction.LEFT,
+    KEY_RIGHT: Direction.RIGHT,
+    KEY_ENTER: Direction.MIDDLE,
+}
+# Values of key events
+KEY_ACTIONS = {0: Action.RELEASED, 1: Action.PRESSED, 2: Action.HELD}
+
+
+class JoystickEvent(NamedTuple):
+    """A single joystick event"""
+    timestamp: float    # monotonic time the event happened at
+    direction: Direction
+    action: Action
+
+
+class JoystickError(Exception):
+    """Errors related to the joystick"""
+
+
+class JoystickDevice:
+    """Base class for joystick devices"""
+    def fileno(self) -> Optional[int]:
+        """File descriptor that becomes readable on new events, or None if it has to be polled"""
+        return None
+
+    @abstractmethod
+    def read_events(self) -> List[JoystickEvent]:
+        """Return all events that happened since the last call, without blocking"""
+        return []
+
+    def next_event_time(self) -> Optional[float]:
+        """Monotonic time of the next event, if known in advance"""
+        return None
+
+    def close(self):
+        return
+
+
+def find_joystick() -> str:
+    """Find the evdev device of the Sense Hat joystick.
+
+    # Returns
+
+    `str` - Path to the device, e.g. /dev/input/event0.
+    """
+    for event_dir in glob.glob("/sys/class/input/event*"):
+        try:
+            with open(os.path.join(event_dir, "device", "name"), "r", encoding="utf-8") as namefile:
+                if namefile.read().strip() == JOYSTICK_NAME:
+                    return os.path.join("/dev", "input", os.path.basename(event_dir))
+        except OSError:
+            continue
+    raise JoystickError(f"Could not find the {JOYSTICK_NAME}")
+
+
+class EvdevJoystick(JoystickDevice):
+    """The Sense Hat joystick, read from its evdev device in non-blocking mode.
+
+    # Arguments
+
+    * `path` - Path to the evdev device. Defaults to the device found by `find_joystick`.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path: str = path or find_joystick()
+        self.fd: int = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+
+    def fileno(self) -> Optional[int]:
+        return self.fd
+
+    def read_events(self) -> List[JoystickEvent]:
+        try:
+            data = os.read(self.fd, EVENT_FORMAT.size * 64)
+        except BlockingIOError:
+            return []
+        # Event times are wall clock times, scenes work with monotonic times
+        offset = time.monotonic() - time.time()
+        events = []
+        for seconds, microseconds, event_type, code, value in EVENT_FORMAT.iter_unpack(
+            data[:len(data) - len(data) % EVENT_FORMAT.size]
+        ):
+            if event_type != EV_KEY or code not in KEY_DIRECTIONS or value not in KEY_ACTIONS:
+                continue
+            events.append(JoystickEvent(
+                seconds + microseconds / 1e6 + offset, KEY_DIRECTIONS[code], KEY_ACTIONS[value]
+            ))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class RecordedJoystick(JoystickDevice):
+    """Stand-in device replaying recorded events, for tests and demos without a joystick.
+
+    # Arguments
+
+    * `events` - (seconds after the first read, direction, action) tuples
+    """
+    def __init__(self, events: List[Tuple[float, Direction, Action]]):
+        self.events: List[Tuple[float, Direction, Action]] = sorted(
+            events, key=lambda event: event[0]
+        )
+        self.start: Optional[float] = None
+        self.position: int = 0
+
+    @staticmethod
+    def load(path: str) -> "RecordedJoystick":
+        """Load events from a JSON file.
+
+        The file contains a list of events like `{"time": 1.5, "direction": "middle", "action": "pressed"}`.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as jsonfile:
+                content = json.load(jsonfile)
+            return RecordedJoystick([
+                (
+                    float(event["time"]),
+                    Direction[event["direction"].upper()],
+                    Action[event.get("action", "pressed").upper()],
+                )
+                for event in content
+            ])
+        except (OSError, KeyError, TypeError, ValueError, AttributeError) as error:
+            raise JoystickError(f"Invalid joystick events in {path}: {error}") from error
+
+    def read_events(self) -> List[JoystickEvent]:
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+        events = []
+        while self.position < len(self.events) and \
+                self.start + self.events[self.position][0] <= now:
+            offset, direction, action = self.events[self.position]
+            events.append(JoystickEvent(self.start + offset, direction, action))
+            self.position += 1
+        return events
+
+    def next_event_time(self) -> Optional[float]:
+        if self.start is None or self.position >= len(self.events):
+            return None
+        return self.start + self.events[self.position][0]
+
+
+class JoystickInput:
+    """Reads joystick events through a selector.
+
+    # Arguments
+
+    * `device` - The joystick device
+    """
+    def __init__(self, device: JoystickDevice):
+        self.device: JoystickDevice = device
+        self.selector: Optional[selectors.BaseSelector] = None
+        if device.fileno() is not None:
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(device.fileno(), selectors.EVENT_READ)
+
+    def poll(self) -> List[JoystickEvent]:
+        """All events that are available right now"""
+        return self.device.read_events()
+
+    def wait(self, timeout: float):
+        """Sleep for up to `timeout` seconds, but wake up as soon as the joystick is used"""
+        if self.selector is None:
+            next_event = self.device.next_event_time()
+            if next_event is not None:
+                timeout = min(timeout, max(0.0, next_event - time.monotonic()))
+            time.sleep(timeout)
+        else:
+            self.selector.select(timeout)
+
+    def close(self):
+        if self.selector is not None:
+            self.selector.close()
+        self.device.close()
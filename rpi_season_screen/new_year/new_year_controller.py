@@ -8,7 +8,10 @@ from typing import List
 
 import random
 
+from rpi_season_screen.input.joystick import Action, Direction, JoystickEvent
 from rpi_season_screen.sense.sense_controller import SenseController
+from rpi_season_screen.sense.snapshot import SnapshotError
+from rpi_season_screen.text.scrolling_text import ScrollingText
 from rpi_season_screen.new_year.rocket import Rocket
 
 
@@ -20,6 +23,7 @@ class NewYearController(SenseController):
     * `sense` - The RPI Sense Hat the Controller is based on
     * `rotation` - Rotation of the tree, value between 0 and 360.
     * `low_light_mode` - True if the Sense Hat should use the Low Light mode.
+    * `parallel_rockets` - Number of rockets per 8 columns
     """
     def __init__(
         self,
@@ -30,25 +34,53 @@ class NewYearController(SenseController):
     ):
         super().__init__(sense, rotation, low_light_mode)
         self.rockets: List[Rocket] = []
-        self.available_indices: List[int] = [i for i in range(8)]
-        self.parallel_rockets: int = parallel_rockets
+        self.available_indices: List[int] = [i for i in range(self.width)]
+        self.parallel_rockets: int = min(self.width, parallel_rockets * self.width // 8)
 
     def _init_scene(self):
         """Initialize the Scene.
         Here the background is just black/empty.
         """
-        self.__generate_rockets()
+        if not self.rockets:
+            self.__generate_rockets()
         return
 
+    def _snapshot(self) -> dict:
+        """The rockets with their explosions"""
+        return {"rockets": [rocket.snapshot() for rocket in self.rockets]}
+
+    def _restore(self, state: dict):
+        """Let the rockets of a snapshot continue to fly and explode"""
+        rockets = [
+            Rocket.restore(rocket, x_max=self.width - 1, y_max=self.height - 1)
+            for rocket in state["rockets"]
+        ]
+        columns = [rocket.x for rocket in rockets]
+        if len(set(columns)) != len(columns) or not all(0 <= x < self.width for x in columns):
+            raise SnapshotError("Rockets out of the display")
+        self.rockets = rockets
+        self.available_indices = [i for i in range(self.width) if i not in columns]
+
     def _next_frame(self):
         """Start the scene loop here"""
         for rocket in self.rockets:
             rocket.move(self)
         return
 
+    def handle_input(self, event: JoystickEvent) -> bool:
+        """Pushing the joystick lets all flying rockets explode at once"""
+        if event.direction == Direction.MIDDLE and event.action == Action.PRESSED:
+            bursts = [rocket.burst() for rocket in self.rockets]
+            return any(bursts)
+        return super().handle_input(event)
+
+    def happy_new_year(self) -> ScrollingText:
+        """Scroll a 'Happy New Year!' message over the firework"""
+        return self.show_text("Happy New Year!")
+
     def __generate_rockets(self):
         """Generate Rockets that can then be used to fly up"""
         for _ in range(self.parallel_rockets):
             index = random.choice(self.available_indices)
             self.available_indices.remove(index)
-            self.rockets.append(Rocket(x=index))
+            self.rockets.append(Rocket(x=index, x_max=self.width - 1, y_max=self.height - 1))
@@ -22,6 +22,11 @@ X_MAX = 7
 Y_MAX = 7
 X_MIN = 0
 Y_MIN = 0
+WHITE = (255, 255, 255)
+# Directions of the explosion particles, one per surrounding field
+NEIGHBOUR_OFFSETS: Tuple[Tuple[int, int], ...] = tuple(
+    (i, j) for i in (-1, 0, 1) for j in (-1, 0, 1) if i or j
+)
 
 
 class RocketState(Enum):
@@ -37,13 +42,52 @@ class RocketError(Exception):
 
 
 class ExplosionParticle:
-    """Explosion class of the Firework Rocket representing a single particle in the Explosion"""
-    def __init__(self, position: Tuple[int], direction: Tuple[int], lifetime: int):
-        self.position: Tuple[int] = position
+    """Explosion class of the Firework Rocket representing a single particle in the Explosion.
+
+    Particles are allocated once per rocket and reset for every explosion. Their position is kept
+    in `x` and `y` and updated in place.
+    """
+    __slots__ = ("x", "y", "direction", "lifetime", "x_max", "y_max", "waiting")
+
+    def __init__(
+        self,
+        x: int,
+        y: int,
+        direction: Tuple[int],
+        lifetime: int,
+        x_max: int = X_MAX,
+        y_max: int = Y_MAX,
+    ):
+        self.x: int = x
+        self.y: int = y
         self.direction: Tuple[int] = direction
         self.lifetime: int = lifetime
+        self.x_max: int = x_max
+        self.y_max: int = y_max
         self.waiting = False
 
+    def reset(self, x: int, y: int, direction: Tuple[int], lifetime: int):
+        """Start the particle at a new explosion"""
+        self.x = x
+        self.y = y
+        self.direction = direction
+        self.lifetime = lifetime
+        self.waiting = False
+
+    def snapshot(self) -> list:
+        """Position, direction, lifetime and waiting state of the particle"""
+        return [self.x, self.y, *self.direction, self.lifetime, self.waiting]
+
+    @staticmethod
+    def restore(state: list, x_max: int = X_MAX, y_max: int = Y_MAX) -> "ExplosionParticle":
+        """Create a particle from its snapshot"""
+        x, y, direction_x, direction_y, lifetime, waiting = state
+        particle = ExplosionParticle(
+            int(x), int(y), (int(direction_x), int(direction_y)), int(lifetime), x_max, y_max
+        )
+        particle.waiting = bool(waiting)
+        return particle
+
     def move(self):
         if math.fabs(self.direction[0]) + math.fabs(self.direction[1]) > 1:
             if self.waiting:
@@ -51,15 +95,13 @@ class ExplosionParticle:
             else:
                 self.waiting = True
                 return
-        self.position = (
-            self.position[0] + self.direction[0],
-            self.position[1] + self.direction[1]
-        )
+        self.x += self.direction[0]
+        self.y += self.direction[1]
         self.lifetime -= 1
 
     def check_out_of_bounds(self) -> bool:
-        return (self.position[0] < X_MIN or X_MAX < self.position[0] or
-                self.position[1] < Y_MIN or Y_MAX < self.position[1])
+        return (self.x < X_MIN or self.x_max < self.x or
+                self.y < Y_MIN or self.y_max < self.y)
 
 
 class Rocket:
@@ -68,17 +110,67 @@ class Rocket:
     # Arguments
 
     * `x` - x position of the Rocket
+    * `color` - Color of the explosion. Defaults to a random color for every explosion.
+    * `x_max` - Largest x position on the canvas
+    * `y_max` - Largest y position on the canvas, the rocket starts there
     """
-    def __init__(self, x: int, color: List[int] = None):
+    __slots__ = (
+        "x", "x_max", "y_max", "y", "color_is_custom", "color", "depth", "time", "last_time",
+        "state", "explosion_particles", "_particle_pool",
+    )
+
+    def __init__(self, x: int, color: List[int] = None, x_max: int = X_MAX, y_max: int = Y_MAX):
         self.x = x
-        self.y = Y_MAX
+        self.x_max = x_max
+        self.y_max = y_max
+        self.y = y_max
         self.color_is_custom: bool = color is not None
         self.color = color if color else [round(random.random() * 255) for _ in range(3)]
         self.depth = random.randint(1, 10)
         self.time = self._time_by_depth()
         self.last_time = time.time()
         self.state = RocketState.FLYING
+        # Particles of the running explosion, taken from the rocket's pool
         self.explosion_particles: List[ExplosionParticle] = []
+        self._particle_pool: List[ExplosionParticle] = [
+            ExplosionParticle(x, self.y, offset, 0, x_max, y_max) for offset in NEIGHBOUR_OFFSETS
+        ]
+
+    def snapshot(self) -> dict:
+        """State, position, timing and explosion particles of the rocket"""
+        return {
+            "x": self.x,
+            "y": self.y,
+            "color": self.color,
+            "color_is_custom": self.color_is_custom,
+            "depth": self.depth,
+            "time": self.time,
+            "waited": time.time() - self.last_time,
+            "state": self.state.name,
+            "particles": [particle.snapshot() for particle in self.explosion_particles],
+        }
+
+    @staticmethod
+    def restore(state: dict, x_max: int = X_MAX, y_max: int = Y_MAX) -> "Rocket":
+        """Create a rocket from its snapshot"""
+        rocket = Rocket(int(state["x"]), [int(value) for value in state["color"]], x_max, y_max)
+        rocket.color_is_custom = bool(state["color_is_custom"])
+        rocket.y = int(state["y"])
+        rocket.depth = int(state["depth"])
+        if not 0 < rocket.depth <= 10:
+            raise ValueError(f"Invalid depth {rocket.depth}")
+        rocket.time = float(state["time"])
+        rocket.last_time = time.time() - float(state["waited"])
+        rocket.state = RocketState[state["state"]]
+        particles = state["particles"]
+        if len(particles) > len(rocket._particle_pool):
+            raise ValueError(f"{len(particles)} explosion particles")
+        for pooled, particle in zip(rocket._particle_pool, particles):
+            restored = ExplosionParticle.restore(particle, x_max, y_max)
+            pooled.reset(restored.x, restored.y, restored.direction, restored.lifetime)
+            pooled.waiting = restored.waiting
+            rocket.explosion_particles.append(pooled)
+        return rocket
 
     def move(self, controller: SenseController):
         """Move this rocket's Particels the way they should
@@ -96,19 +188,33 @@ class Rocket:
         elif self.state == RocketState.DESTROYED:
             for particle in self.explosion_particles:
                 if particle.check_out_of_bounds(): continue
-                controller.clear_at(particle.position)
+                controller.clear_at((particle.x, particle.y))
             controller.available_indices.append(self.x)
             self.depth = random.randint(1, 10)
             self.time = self._time_by_depth()
-            self.y = Y_MAX
+            self.y = self.y_max
             self.x = random.choice(controller.available_indices)
             if not self.color_is_custom:
-                self.color = [round(random.random() * 255) for _ in range(3)]
+                for channel in range(3):
+                    self.color[channel] = round(random.random() * 255)
             controller.available_indices.remove(self.x)
-            self.explosion_particles: List[ExplosionParticle] = []
+            self.explosion_particles.clear()
             self.state = RocketState.FLYING
         else: raise RocketError(f"Unknown State: {self.state}")
 
+    def burst(self) -> bool:
+        """Let a flying rocket explode right away.
+
+        # Returns
+
+        `bool` - True if the rocket was flying.
+        """
+        if self.state != RocketState.FLYING:
+            return False
+        self.state = RocketState.WAITING
+        self.last_time = 0
+        return True
+
     def _fly(self, controller: SenseController):
         """Move this rocket one field up if the timing is correct.
 
@@ -125,7 +231,7 @@ class Rocket:
                 self.state = RocketState.WAITING
                 controller.clear_at((self.x, self.y))
 
-        controller.draw((self.x, self.y), [255, 255, 255])
+        controller.draw((self.x, self.y), WHITE)
 
     def _explode(self, controller: SenseController):
         """Animate the explosion of the Rocket if the timing is right.
@@ -134,20 +240,20 @@ class Rocket:
 
         * `controller` - NewYeaController Object the explosion shall be performed on
         """
-        if not self.explosion_particles or 0 == len(self.explosion_particles):
+        if not self.explosion_particles:
             self._generate_particles()
         if self.last_time + self.time <= time.time():
             self.last_time = time.time()
             self.time = self.time * 0.8
             for particle in self.explosion_particles:
                 if particle.check_out_of_bounds(): continue
-                controller.clear_at(particle.position)
+                controller.clear_at((particle.x, particle.y))
                 if 0 < particle.lifetime:
                     particle.move()
                     if particle.check_out_of_bounds(): continue
-                    controller.draw(particle.position, self.color)
+                    controller.draw((particle.x, particle.y), self.color)
                 else:
-                    controller.clear_at(particle.position)
+                    controller.clear_at((particle.x, particle.y))
                     self.state = RocketState.DESTROYED
 
     def _stop_waiting(self):
@@ -156,28 +262,12 @@ class Rocket:
             self.state = RocketState.EXPLODING
 
     def _generate_particles(self):
-        particles: List[ExplosionParticle] = []
-        fields: List[Tuple[int]] = self._get_surrounding_fields()
-        for field in fields:
-            direction: Tuple[int] = (field[0] - self.x, field[1] - self.y)
-            particles.append(ExplosionParticle(
-                position=(self.x, self.y),
-                direction=direction,
-                lifetime=self._lifetime_by_depth()
-            ))
-        self.explosion_particles = particles
-
-    def _get_surrounding_fields(self) -> List[Tuple[int]]:
-        fields = []
-        for i in (-1, 0, 1):
-            x = i + self.x
-            if x < X_MIN or x > X_MAX: continue
-            for j in (-1, 0, 1):
-                y = j + self.y
-                if y < Y_MIN or y > Y_MAX: continue
-                if x == self.x and y == self.y: continue
-                fields.append((x, y))
-        return fields
+        """Start a particle from the pool towards every surrounding field inside the canvas"""
+        lifetime = self._lifetime_by_depth()
+        for particle, (dx, dy) in zip(self._particle_pool, NEIGHBOUR_OFFSETS):
+            if X_MIN <= self.x + dx <= self.x_max and Y_MIN <= self.y + dy <= self.y_max:
+                particle.reset(self.x, self.y, (dx, dy), lifetime)
+                self.explosion_particles.append(particle)
 
     def _lifetime_by_depth(self) -> int:
         """Returns the lifetime (radius) of a fireworks explosion,
@@ -195,10 +285,10 @@ class Rocket:
         return self.depth / 10
 
     def _height_by_depth(self) -> int:
-        """Return a y value between 1 and 5 based off of the depth.
+        """Return a y value between 1 and 5 based off of the depth, scaled to the canvas height.
 
         A Depth of 10 is far away, so the time between updates is longer.
         This results in 10 being 1 second, 5 being 0.5 seconds and 1 being 0.1 seconds, and so on.
         """
         assert 0 < self.depth and self.depth <= 10
-        return self.depth // 2
+        return (self.depth // 2) * (self.y_max + 1) // (Y_MAX + 1)
@@ -0,0 +1,217 @@
+""" Clock driven playback timeline for frame based content.
+
+Instead of counting frames up whenever enough time has passed since the last one,
+the timeline derives the frame to show from the monotonic time elapsed since playback started.
+Late wakeups therefore do not add up to drift, and stalls either drop frames to catch up
+or hold the playback back, depending on the `FramePolicy`.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import math
+import time
+
+from enum import Enum, auto
+from typing import Dict, Optional
+
+
+class FramePolicy(Enum):
+    """What to do when playback fell behind by more than one frame"""
+    DROP = auto()
+    HOLD = auto()
+
+
+class TimelineError(Exception):
+    """Errors related to the playback timeline"""
+
+
+class PlaybackTimeline:
+    """Maps elapsed monotonic time to a frame index.
+
+    Playback runs from frame 0 to `loop_end` once and then loops between `loop_start` and `loop_end`.
+
+    # Arguments
+
+    * `frame_count` - Number of frames of the content
+    * `fps` - Frames per second
+    * `policy` - `FramePolicy.DROP` skips frames to stay in time, `FramePolicy.HOLD` shows every
+                 frame and moves the timeline back instead. Defaults to `FramePolicy.DROP`.
+    * `loop_start` - First frame of the loop. Defaults to 0.
+    * `loop_end` - Frame after the last frame of the loop. Defaults to `frame_count`.
+    * `sync_epoch` - Unix timestamp at which frame 0 was shown. All timelines with the same
+                     epoch show the same frame at the same (NTP synchronized) time.
+                     Defaults to None, which starts playback with the first `poll`.
+    """
+    def __init__(
+        self,
+        frame_count: int,
+        fps: float,
+        policy: FramePolicy = FramePolicy.DROP,
+        loop_start: int = 0,
+        loop_end: Optional[int] = None,
+        sync_epoch: Optional[float] = None,
+    ):
+        if fps <= 0:
+            raise TimelineError(f"Invalid frame rate: {fps}")
+        self.fps: float = fps
+        self.policy: FramePolicy = policy
+        self.sync_epoch: Optional[float] = sync_epoch
+        self.frame_count: int = 0
+        self.loop_start: int = 0
+        self.loop_end: int = 0
+        self.set_frame_count(frame_count, loop_start, loop_end)
+
+        self.origin: Optional[float] = None
+        self.paused_at: Optional[float] = None
+        self.position: Optional[int] = None
+        # Position up to which frames do not have to be shown one by one
+        self.skip_position: Optional[int] = None
+        self.dropped_frames: int = 0
+        self.drift: float = 0.0
+        self.loops: int = 0
+
+    def set_frame_count(self, frame_count: int, loop_start: int = 0, loop_end: Optional[int] = None):
+        """Change the length of the content and its loop points.
+
+        # Arguments
+
+        * `frame_count` - Number of frames of the content
+        * `loop_start` - First frame of the loop
+        * `loop_end` - Frame after the last frame of the loop. Defaults to `frame_count`.
+        """
+        loop_end = frame_count if loop_end is None else loop_end
+        if not 0 <= loop_start < loop_end <= frame_count:
+            raise TimelineError(f"Invalid loop [{loop_start}, {loop_end}) for {frame_count} frames")
+        self.frame_count = frame_count
+        self.loop_start = loop_start
+        self.loop_end = loop_end
+
+    def start(self, now: Optional[float] = None):
+        """Start the playback at frame 0, or at the frame given by the sync epoch.
+
+        # Arguments
+
+        * `now` - Current time as returned by `time.monotonic()`
+        """
+        now = time.monotonic() if now is None else now
+        if self.sync_epoch is not None:
+            self.origin = now - (time.time() - self.sync_epoch)
+        else:
+            self.origin = now
+        self.position = None
+        self.skip_position = None
+        self.paused_at = None
+
+    @property
+    def paused(self) -> bool:
+        return self.paused_at is not None
+
+    def pause(self, now: Optional[float] = None):
+        """Pause the playback. Polling returns None until the playback is resumed."""
+        if self.paused:
+            return
+        self.paused_at = time.monotonic() if now is None else now
+
+    def resume(self, now: Optional[float] = None):
+        """Resume a paused playback with the frame it was paused at."""
+        if not self.paused:
+            return
+        now = time.monotonic() if now is None else now
+        if self.origin is not None:
+            self.origin += now - self.paused_at
+        self.paused_at = None
+
+    def seek(self, frame: int, now: Optional[float] = None):
+        """Continue the playback at a frame. The frame is shown with the next `poll`.
+
+        # Arguments
+
+        * `frame` - The frame to continue at
+        * `now` - Current time as returned by `time.monotonic()`
+        """
+        if not 0 <= frame < self.frame_count:
+            raise TimelineError(f"Frame {frame} is out of range (0 - {self.frame_count - 1})")
+        now = time.monotonic() if now is None else now
+        reference = self.paused_at if self.paused else now
+        self.origin = reference - frame / self.fps
+        self.position = None
+        self.skip_position = None
+
+    def seek_time(self, seconds: float, now: Optional[float] = None):
+        """Continue the playback at a time offset in seconds."""
+        self.seek(min(self.frame_count - 1, max(0, int(seconds * self.fps))), now)
+
+    def frame_index(self, position: int) -> int:
+        """Map a position (frames since the start of the playback) to a frame index"""
+        if position < self.loop_end:
+            return position
+        return self.loop_start + (position - self.loop_end) % (self.loop_end - self.loop_start)
+
+    def skip_until(self, position: int):
+        """Mark the frames before a position as not needed, e.g. because they show the same picture.
+
+        They are neither held back nor counted as dropped frames.
+
+        # Arguments
+
+        * `position` - Position (frames since the start of the playback) of the next needed frame
+        """
+        self.skip_position = position
+
+    def time_of(self, position: int) -> Optional[float]:
+        """Monotonic time a position (frames since the start of the playback) is due at"""
+        if self.origin is None or self.paused:
+            return None
+        return self.origin + position / self.fps
+
+    def next_frame_time(self) -> Optional[float]:
+        """Monotonic time the next frame is due at or None if the playback is not running"""
+        return self.time_of(0 if self.position is None else self.position + 1)
+
+    def poll(self, now: Optional[float] = None) -> Optional[int]:
+        """Return the frame that has to be shown now.
+
+        # Arguments
+
+        * `now` - Current time as returned by `time.monotonic()`
+
+        # Returns
+
+        `Optional[int]` - The frame index, or None if the frame did not change since the last poll.
+        """
+        now = time.monotonic() if now is None else now
+        if self.origin is None:
+            self.start(now)
+        if self.paused:
+            return None
+
+        target = max(0, math.floor((now - self.origin) * self.fps))
+        if self.position is not None:
+            if target <= self.position:
+                return None
+            expected = self.position + 1
+            if self.skip_position is not None:
+                expected = max(expected, self.skip_position)
+            skipped = target - expected
+            if skipped > 0 and self.policy == FramePolicy.HOLD:
+                target = expected
+                # Move the timeline, so that the held back frame is due now
+                shift = now - (self.origin + target / self.fps)
+                self.origin += shift
+                self.drift += shift
+            elif skipped > 0:
+                self.dropped_frames += skipped
+            if self.frame_index(target) < self.frame_index(self.position):
+                self.loops += 1
+
+        self.position = target
+        return self.frame_index(target)
+
+    def stats(self) -> Dict[str, float]:
+        """Playback statistics"""
+        return {
+            "position": self.position,
+            "loops": self.loops,
+            "dropped_frames": self.dropped_frames,
+            "drift": self.drift,
+        }
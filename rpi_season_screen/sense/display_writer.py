@@ -0,0 +1,150 @@
+""" Display writes in a dedicated thread.
+
+The scene loop publishes every completed frame into a single-slot mailbox and continues right away.
+The writer thread commits the newest frame to the display. Frames that are superseded before the
+writer got to them are dropped and counted, so that a slow display (bus contention, sense_hat's
+pixel packing) never delays the scene's timing. A failing write (e.g. an I2C error) is logged and
+counted, and the writer continues with the next frame.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import threading
+import time
+
+from collections import deque
+from typing import Deque, Optional
+
+import numpy as np
+
+# Number of write durations that are kept
+WRITE_HISTORY = 100
+# Seconds without a new frame after which the display is flushed anyway, e.g. so that a wall
+# refreshes its remote panels while the scene shows a still picture
+IDLE_FLUSH = 1.0
+
+
+class DisplayWriter:
+    """Writes the newest published frame to a display in a background thread.
+
+    # Arguments
+
+    * `sense` - The display, a Sense Hat or anything with `set_pixels`
+    """
+    def __init__(self, sense):
+        self.sense = sense
+        self._set_frame = getattr(sense, "set_frame", None)
+        self._flush = getattr(sense, "flush", None)
+        self._mark_frame = getattr(sense, "mark_frame", None)
+        self._mailbox = threading.Condition()
+        self._frame: Optional[np.ndarray] = None
+        self._running: bool = False
+        self._busy: bool = False
+        self._thread: Optional[threading.Thread] = None
+        self.published: int = 0
+        self.written: int = 0
+        # Frames that were superseded by a newer frame before they were written
+        self.dropped: int = 0
+        # Writes and flushes that raised an exception
+        self.failed: int = 0
+        self._last_error: Optional[str] = None
+        # Seconds the display took for the last writes
+        self.write_times: Deque[float] = deque(maxlen=WRITE_HISTORY)
+
+    def start(self) -> "DisplayWriter":
+        """Start the writer thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="DisplayWriter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Write the last published frame and stop the writer thread"""
+        with self._mailbox:
+            self._running = False
+            self._mailbox.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        print(f"Display writer: {self.written} of {self.published} frames written, "
+              f"{self.dropped} dropped, {self.failed} failed")
+
+    def publish(self, frame: np.ndarray):
+        """Hand a completed frame to the writer, replacing a frame that was not written yet.
+
+        # Arguments
+
+        * `frame` - The frame as array of shape (height, width, 3). It is copied.
+        """
+        frame = frame.copy()
+        with self._mailbox:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self.published += 1
+            self._mailbox.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every published frame was written or dropped
+
+        # Returns
+
+        `bool` - False if the timeout expired first.
+        """
+        with self._mailbox:
+            return self._mailbox.wait_for(lambda: self._frame is None and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._mailbox:
+                self._mailbox.wait_for(
+                    lambda: self._frame is not None or not self._running, IDLE_FLUSH
+                )
+                frame, self._frame = self._frame, None
+                if frame is None and not self._running:
+                    return
+                self._busy = frame is not None
+            if frame is None:
+                if self._flush is not None:
+                    self._guarded(self._flush)
+                continue
+            began = time.monotonic()
+            success = self._guarded(self._write, frame)
+            self.write_times.append(time.monotonic() - began)
+            with self._mailbox:
+                if success:
+                    self.written += 1
+                self._busy = False
+                self._mailbox.notify_all()
+
+    def _guarded(self, function, *args) -> bool:
+        """Call a display function, logging instead of raising if it fails.
+
+        A failure is only logged if it differs from the previous one, so that a disconnected display
+        does not flood the log.
+
+        # Returns
+
+        `bool` - True if the call succeeded.
+        """
+        try:
+            function(*args)
+        except Exception as error:  # pylint: disable=broad-except
+            self.failed += 1
+            message = f"{type(error).__name__}: {error}"
+            if message != self._last_error:
+                print(f"WARNING: Writing to the display failed ({self.failed} failures): {message}")
+            self._last_error = message
+            return False
+        self._last_error = None
+        return True
+
+    def _write(self, frame: np.ndarray):
+        if self._set_frame is not None:
+            self._set_frame(frame)
+        else:
+            self.sense.set_pixels(frame.reshape(-1, 3).tolist())
+        if self._flush is not None:
+            self._flush()
+        if self._mark_frame is not None:
+            self._mark_frame()
@@ -0,0 +1,54 @@
+""" Layers that are composited on top of a scene's frame.
+
+While a layer is active, the controller only updates its in-memory frame and writes
+the composited result to the display with one bulk write whenever something changed.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+from abc import abstractmethod
+from typing import Optional
+
+import numpy as np
+
+
+class Layer:
+    """Base class for layers on top of a scene"""
+    def __init__(self):
+        self.finished: bool = False
+
+    @abstractmethod
+    def update(self, now: float) -> bool:
+        """Advance the layer to the given time.
+
+        # Arguments
+
+        * `now` - Current time as returned by `time.monotonic()`
+
+        # Returns
+
+        `bool` - True if the layer's output changed and the display has to be redrawn.
+        """
+        return False
+
+    def next_update(self) -> Optional[float]:
+        """Time as returned by `time.monotonic()` the layer's output changes next.
+
+        The scene loop sleeps until then. None if unknown, the scene loop then does not sleep.
+        """
+        return None
+
+    @abstractmethod
+    def compose(self, frame: np.ndarray) -> np.ndarray:
+        """Composite this layer on top of a frame.
+
+        # Arguments
+
+        * `frame` - The frame below this layer as array of shape (height, width, 3).
+                    It must not be modified.
+
+        # Returns
+
+        `np.ndarray` - The composited frame of the same shape.
+        """
+        return frame
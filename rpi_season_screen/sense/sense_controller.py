@@ -4,12 +4,39 @@ Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
 """
 
 import sys
+import threading
+import time
 
 from abc import abstractmethod
+from collections import deque
 from sense_hat import SenseHat
-from typing import final, Any, Tuple, List
+from typing import final, Any, Callable, Deque, Tuple, List, Optional
 import signal
 
+import numpy as np
+
+from rpi_season_screen.input.joystick import Action, Direction, JoystickEvent, JoystickInput
+from rpi_season_screen.sense.display_writer import DisplayWriter
+from rpi_season_screen.sense.layer import Layer
+from rpi_season_screen.sense.snapshot import SnapshotError, StateFile
+from rpi_season_screen.sense.startup import StartupMetrics
+from rpi_season_screen.sensors.sensor_service import SensorService
+from rpi_season_screen.text.scrolling_text import ScrollingText
+from rpi_season_screen.transitions.transition import Transition, TransitionSpec
+
+# Longest time the scene loop sleeps at once
+MAX_SLEEP = 1.0
+
+# Seconds between two frames while assets are loaded in the background
+LOADING_POLL = 0.01
+
+# Number of input-to-pixel latencies that are kept
+LATENCY_HISTORY = 100
+
+# Size of a single Sense Hat LED matrix
+PANEL_WIDTH = 8
+PANEL_HEIGHT = 8
+
 
 class SenseController:
     """The Sense Controller is an abstraction for the RPI SenseHat.
@@ -17,18 +44,77 @@ class SenseController:
 
     # Arguments
 
-    * `sense` - SenseHat object the actions shall be performed on.
+    * `sense` - SenseHat object the actions shall be performed on. This can also be a
+                `TiledWall`, in which case the scene is rendered onto the wall's whole canvas.
 
     * `rotation` - The screen rotation (between 0 and 360 degrees)
 
     * `low_light_mode` - boolean value on whether the screen shall be dimmed or used normally.
+
+    * `sensors` - Running `SensorService` the scene may read sensor values from. Defaults to None.
     """
-    def __init__(self, sense: SenseHat, rotation: int = 0, low_light_mode: bool = True,) -> None:
+    def __init__(
+        self,
+        sense: SenseHat,
+        rotation: int = 0,
+        low_light_mode: bool = True,
+        sensors: Optional[SensorService] = None,
+    ) -> None:
         self.sense: SenseHat = sense
+        self.sensors: Optional[SensorService] = sensors
         # Adjust Display Rotation
         self.sense.rotation = rotation
         self.sense.low_light = low_light_mode
         self.__running = False
+        # Canvas size, larger than a single panel for walls of Sense Hats
+        self.width: int = getattr(sense, "width", PANEL_WIDTH)
+        self.height: int = getattr(sense, "height", PANEL_HEIGHT)
+        # Displays that buffer pixel writes (like `TiledWall`) are flushed after every frame
+        self._flush = getattr(sense, "flush", None)
+        self._set_frame = getattr(sense, "set_frame", None)
+        # Traced displays (`TracingSense`) mark the end of every frame
+        self._mark_frame = getattr(sense, "mark_frame", None)
+        # In-memory copy of what the scene has drawn, without any layers on top
+        self._frame: np.ndarray = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        # Pixels of the last `set_pixels` call that are not copied into `_frame` yet
+        self._pending_pixels: Optional[List[List[int]]] = None
+        self.layers: List[Layer] = []
+        self._frame_changed: bool = False
+        # Layers are held (not animated) until the scene drew something or finished loading
+        self._hold_layers: bool = False
+        # Monotonic time the scene needs its next frame at. The scene loop sleeps until then.
+        # None runs the next frame right away.
+        self.wake_time: Optional[float] = None
+        # Joystick events are dispatched to `handle_input` at the start of every frame
+        self.joystick: Optional[JoystickInput] = None
+        # Seconds from joystick events to the end of the frame that handled them
+        self.input_latencies: Deque[float] = deque(maxlen=LATENCY_HISTORY)
+        # Set by `switch_scene`: -1 for the previous and 1 for the next scene
+        self.switch_request: int = 0
+        # Transition of scenes with looping content from their end to their start. None cuts.
+        self.loop_transition: Optional[TransitionSpec] = None
+        # Writes the frames in a background thread if set. Frames are then composed in `_frame`
+        # and published once per frame, like with layers.
+        self.writer: Optional[DisplayWriter] = None
+        # Saves snapshots of the scene to continue after a restart, if set
+        self.state_file: Optional[StateFile] = None
+        # Frame of a restored snapshot, drawn when the scene is initialized
+        self._restored_frame: Optional[np.ndarray] = None
+        # Logs the time to the first frame the scene writes, if set
+        self.startup: Optional[StartupMetrics] = None
+        # Set whenever something is written to the display
+        self._written: bool = False
+        # Thread loading the scene's assets, see `load_in_background`
+        self._loader: Optional[threading.Thread] = None
+        self._load_error: Optional[Exception] = None
+
+    @property
+    def frame(self) -> np.ndarray:
+        """The scene's current frame as array of shape (height, width, 3)"""
+        if self._pending_pixels is not None:
+            self._frame[:] = np.asarray(self._pending_pixels, dtype=np.uint8).reshape(self._frame.shape)
+            self._pending_pixels = None
+        return self._frame
 
     def handle_signal(self, signum: int, frame: Any):
         """Handle SIGTERM and SIGINT. Stop the Snowflakes and clear the Sense Hat Display
@@ -46,6 +132,39 @@ class SenseController:
         print("Finishing up.. Goodbye!")
         sys.exit(0)
 
+    def handle_input(self, event: JoystickEvent) -> bool:
+        """Handle a joystick event. Moving the joystick left or right switches scenes.
+
+        Scenes override this for their own controls and call it for events they do not handle.
+
+        # Arguments
+
+        * `event` - The joystick event
+
+        # Returns
+
+        `bool` - True if the event was handled.
+        """
+        if event.action != Action.PRESSED:
+            return False
+        if event.direction == Direction.LEFT:
+            self.switch_scene(-1)
+            return True
+        if event.direction == Direction.RIGHT:
+            self.switch_scene(1)
+            return True
+        return False
+
+    def switch_scene(self, step: int):
+        """Stop the scene loop, so that the daemon starts another scene.
+
+        # Arguments
+
+        * `step` - -1 for the previous and 1 for the next scene
+        """
+        self.switch_request = step
+        self.__running = False
+
     def draw(self, position: Tuple[int], color: List[int]):
         """Draw a color at a position on the RPI Sense Hat
 
@@ -59,7 +178,16 @@ class SenseController:
                     and third element being the blue factor of the color.
                     Color Values are Integers between 0 and 255.
         """
-        if 0 <= position[0] and position[0] < 8 and 0 <= position[1] and position[1] < 8:
+        if 0 <= position[0] < self.width and 0 <= position[1] < self.height:
+            pixel = self.frame[position[1], position[0]]
+            if self.layers or self.writer is not None:
+                # Only recomposite the layers if the pixel actually changed
+                if (pixel != color).any():
+                    pixel[:] = color
+                    self._frame_changed = True
+                return
+            pixel[:] = color
+            self._written = True
             self.sense.set_pixel(
                 *position,
                 *color
@@ -67,6 +195,158 @@ class SenseController:
         else:
             print(f"WARNING: Tried to draw out of display ({position})!")
 
+    def set_pixels(self, pixels: List[List[int]]):
+        """Replace the whole frame on the RPI Sense Hat
+
+        # Arguments
+
+        * `pixels` - List of `width * height` colors, row by row, as accepted by
+                    `SenseHat.set_pixels`, or an array of shape (height, width, 3).
+        """
+        self._pending_pixels = pixels
+        if self.layers or self.writer is not None:
+            self._frame_changed = True
+            return
+        if isinstance(pixels, np.ndarray):
+            self._write_frame(pixels)
+        else:
+            self._written = True
+            self.sense.set_pixels(pixels)
+
+    def _write_frame(self, frame: np.ndarray):
+        """Write a whole frame to the display with one bulk write"""
+        self._written = True
+        if self.writer is not None:
+            self.writer.publish(frame.reshape(self.height, self.width, 3))
+        elif self._set_frame is not None:
+            self._set_frame(frame.reshape(self.height, self.width, 3))
+        else:
+            self.sense.set_pixels(frame.reshape(-1, 3).tolist())
+
+    def show_text(
+        self,
+        text: str,
+        color: List[int] = (255, 255, 255),
+        back_color: Optional[List[int]] = None,
+        scroll_speed: float = 0.1,
+    ) -> ScrollingText:
+        """Scroll a message over the running scene without blocking the scene loop.
+
+        # Arguments
+
+        * `text` - The message
+        * `color` - Color of the text
+        * `back_color` - Background color of the text. Defaults to None, showing the scene behind it.
+        * `scroll_speed` - Seconds per scroll step
+
+        # Returns
+
+        `ScrollingText` - The layer showing the message.
+        """
+        layer = ScrollingText(
+            text,
+            time.monotonic(),
+            color=color,
+            back_color=back_color,
+            scroll_speed=scroll_speed,
+            width=self.width,
+            height=self.height,
+        )
+        self.layers.append(layer)
+        return layer
+
+    def start_transition(self, from_frame: np.ndarray, spec: TransitionSpec) -> Transition:
+        """Blend from a still frame into the running scene.
+
+        # Arguments
+
+        * `from_frame` - The frame to blend from as array of shape (height, width, 3)
+        * `spec` - Kind and duration of the transition
+
+        # Returns
+
+        `Transition` - The layer showing the transition.
+        """
+        transition = Transition(from_frame, spec.kind, spec.duration)
+        self.layers.append(transition)
+        self._frame_changed = True
+        return transition
+
+    def transition_loop(self):
+        """Blend from the current frame into the next one, when looping content starts over"""
+        if self.loop_transition is None:
+            return
+        # Content shorter than the transition would stack transitions
+        self.layers = [layer for layer in self.layers if not isinstance(layer, Transition)]
+        self.start_transition(self.frame, self.loop_transition)
+
+    def load_in_background(self, load: Callable[[], None]):
+        """Load heavy assets in a background thread, so that the scene loop keeps running.
+
+        Until `loading` is False, scenes should only show what is already loaded.
+
+        # Arguments
+
+        * `load` - Function loading the assets
+        """
+        def run():
+            try:
+                load()
+            except Exception as error:  # pylint: disable=broad-except
+                self._load_error = error
+
+        self._load_error = None
+        self._loader = threading.Thread(target=run, name=f"{type(self).__name__}Loader", daemon=True)
+        self._loader.start()
+
+    @property
+    def loading(self) -> bool:
+        """True while the assets are loaded in the background. Raises the error loading failed with."""
+        if self._loader is None:
+            return False
+        if self._loader.is_alive():
+            return True
+        self._loader = None
+        if self._load_error is not None:
+            raise self._load_error
+        return False
+
+    def close(self):
+        """Release the scene's resources, e.g. open files, before the next scene is started.
+
+        Waits for the background loader, which may still be using them.
+        """
+        if self._loader is not None:
+            self._loader.join()
+            self._loader = None
+
+    @final
+    def snapshot(self) -> dict:
+        """State the scene needs to continue where it is, see `StateFile`"""
+        return self._snapshot()
+
+    @final
+    def restore(self, frame: List[List[List[int]]], state: dict):
+        """Continue from a snapshot. Call before `init_scene`.
+
+        # Arguments
+
+        * `frame` - The scene's frame when the snapshot was taken, as nested (height, width, 3) list
+        * `state` - The scene's state as returned by `snapshot`
+        """
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.shape != self._frame.shape:
+            raise SnapshotError(f"Snapshot of a {frame.shape[1]}x{frame.shape[0]} display")
+        self._restore(state)
+        self._restored_frame = frame
+
+    def _snapshot(self) -> dict:
+        """The scene's state for `snapshot`. Here nothing is saved."""
+        return {}
+
+    def _restore(self, state: dict):
+        """Restore the scene's state saved by `_snapshot`. Here nothing is restored."""
+        return
 
     def clear_at(self, position: Tuple[int]):
         """Clear a snowflake at certain position
@@ -77,25 +357,41 @@ class SenseController:
                     with two elements, where the first one is x and the
                     second one is y.
         """
-        self.sense.set_pixel(
-            *position,
-            [0, 0, 0]
-        )
+        self.draw(position, [0, 0, 0])
 
     @final
-    def init_scene(self, clear: bool = True):
+    def init_scene(self, clear: bool = True, transition: Optional[Transition] = None):
         """Initialize the scene
 
         # Arguments
 
         * `clear` - Clear the screen before initializing. Defaults to True.
+        * `transition` - Transition from the previous scene (or the splash). The screen is not
+                        cleared, but the scene is blended in over the previous scene's last frame
+                        once it drew its first frame.
         """
-        if clear:
+        if transition is not None:
+            self._pending_pixels = None
+            self._frame[:] = 0
+            self.layers.append(transition)
+            self._frame_changed = False
+            self._hold_layers = True
+        elif clear:
             print("Clearing SenseHat Display ...")
-            self.sense.clear()
+            if self.writer is not None:
+                self._frame_changed = True
+            else:
+                self.sense.clear()
+            self._pending_pixels = None
+            self._frame[:] = 0
         self.__running: bool = True
         print("Initializing Scene ...")
         self._init_scene()
+        if self._restored_frame is not None:
+            self.set_pixels(self._restored_frame)
+            self._restored_frame = None
+        # Only frames written by the scene loop count as animated
+        self._written = False
 
     @abstractmethod
     def _init_scene(self):
@@ -107,7 +403,78 @@ class SenseController:
         """Start the scene loop here"""
         print("Starting Scene Loop ...")
         while self.__running:
-            self._next_frame()
+            self.tick()
+            self._sleep()
+
+    def _sleep(self):
+        """Sleep until the scene's wake time or the next step of an animated layer"""
+        if self.wake_time is None:
+            return
+        wake_time = self.wake_time
+        if self.layers and not self._hold_layers:
+            for layer in self.layers:
+                next_update = layer.next_update()
+                if next_update is None:
+                    return
+                wake_time = min(wake_time, next_update)
+        delay = min(wake_time - time.monotonic(), MAX_SLEEP)
+        if delay <= 0:
+            return
+        if self.joystick is not None:
+            self.joystick.wait(delay)
+        else:
+            time.sleep(delay)
+
+    @final
+    def tick(self):
+        """Run a single iteration of the scene loop.
+
+        This is what `start_scene` calls repeatedly. It is exposed so that tools like the
+        benchmarks can drive a scene frame by frame without entering the endless loop.
+        """
+        events = self.joystick.poll() if self.joystick is not None else None
+        if events:
+            events = [event for event in events if self.handle_input(event)]
+        self._next_frame()
+        if self._hold_layers and (self._frame_changed or not self.loading):
+            self._hold_layers = False
+        if not self._hold_layers and (self.layers or (self.writer is not None and self._frame_changed)):
+            self._update_layers()
+        if self.writer is None:
+            if self._flush is not None:
+                self._flush()
+            if self._mark_frame is not None:
+                self._mark_frame()
+        if self.startup is not None and self._written:
+            self.startup.frame_shown()
+            self.startup = None
+        if events:
+            self._record_input_latency(events)
+        if self.state_file is not None:
+            self.state_file.maybe_save(self)
+
+    def _record_input_latency(self, events: List[JoystickEvent]):
+        """Record how long it took until the handled events were on the display"""
+        now = time.monotonic()
+        for event in events:
+            latency = now - event.timestamp
+            self.input_latencies.append(latency)
+            print(f"Joystick {event.direction.name.lower()} handled after {latency * 1e3:.1f} ms")
+
+    def _update_layers(self):
+        """Advance all layers and write the composited frame if anything changed"""
+        now = time.monotonic()
+        changed = self._frame_changed
+        for layer in self.layers:
+            changed = layer.update(now) or changed
+        self.layers = [layer for layer in self.layers if not layer.finished]
+        if not changed:
+            return
+        self._frame_changed = False
+        frame = self.frame
+        for layer in self.layers:
+            frame = layer.compose(frame)
+        self._write_frame(frame)
 
     @abstractmethod
     def _next_frame(self):
@@ -0,0 +1,150 @@
+""" Snapshots of the running scene, to continue where it left off after a restart.
+
+The scene loop saves a small JSON snapshot to a state file every `SNAPSHOT_INTERVAL` seconds and
+when the daemon stops. It contains the scene's frame, the state of the random module and what the
+scene needs to continue, like the positions of snowflakes or the position in a video. When the same
+scene is started again shortly after, the snapshot is restored instead of starting from scratch.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import json
+import os
+import random
+import time
+
+from typing import Any, Dict, Optional
+
+SNAPSHOT_VERSION = 1
+STATE_FILE_NAME = "state.json"
+# Seconds between two snapshots. Snapshots are written to the SD card, so not too often.
+SNAPSHOT_INTERVAL = 30.0
+# Snapshots older than this many seconds are not restored, the scene starts from scratch
+MAX_SNAPSHOT_AGE = 600.0
+
+
+class SnapshotError(Exception):
+    """Errors related to scene snapshots"""
+
+
+def default_state_path() -> Optional[str]:
+    """The state file used without `--state-file`.
+
+    It is in the state directory systemd creates for the service (`$STATE_DIRECTORY`), otherwise
+    in `$XDG_STATE_HOME`. None if neither is set, the running scene is not saved then.
+    """
+    state_directory = os.getenv("STATE_DIRECTORY")
+    if state_directory:
+        # systemd separates multiple state directories by colons
+        return os.path.join(state_directory.split(":")[0], STATE_FILE_NAME)
+    xdg_state_home = os.getenv("XDG_STATE_HOME")
+    if xdg_state_home:
+        return os.path.join(xdg_state_home, "rpi-season-screen", STATE_FILE_NAME)
+    return None
+
+
+class StateFile:
+    """File the snapshots of the running scene are saved to.
+
+    # Arguments
+
+    * `path` - Path to the state file
+    * `interval` - Seconds between two snapshots
+    * `max_age` - Seconds after which a snapshot is no longer restored
+    """
+    def __init__(
+        self,
+        path: str,
+        interval: float = SNAPSHOT_INTERVAL,
+        max_age: float = MAX_SNAPSHOT_AGE,
+    ):
+        self.path: str = path
+        self.interval: float = interval
+        self.max_age: float = max_age
+        # Name of the running scene, set by the daemon
+        self.scene: Optional[str] = None
+        # Monotonic time of the next periodic snapshot
+        self.next_save: Optional[float] = None
+
+    def save(self, controller):
+        """Save a snapshot of the running scene.
+
+        # Arguments
+
+        * `controller` - The scene's `SenseController`
+        """
+        if self.scene is None:
+            return
+        try:
+            state = controller.snapshot()
+        except Exception as error:  # snapshots are optional, they must never stop the scene
+            print(f"WARNING: Could not take the scene snapshot: {type(error).__name__}: {error}")
+            return
+        version, internal_state, gauss_next = random.getstate()
+        content = {
+            "version": SNAPSHOT_VERSION,
+            "time": time.time(),
+            "scene": self.scene,
+            "random": [version, list(internal_state), gauss_next],
+            "frame": controller.frame.tolist(),
+            "state": state,
+        }
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as jsonfile:
+                json.dump(content, jsonfile)
+            os.replace(temp_path, self.path)
+        except (OSError, TypeError, ValueError) as error:
+            print(f"WARNING: Could not save the scene snapshot: {error}")
+
+    def maybe_save(self, controller):
+        """Save a snapshot if the last one is `interval` seconds old"""
+        now = time.monotonic()
+        if self.next_save is None:
+            self.next_save = now + self.interval
+        elif now >= self.next_save:
+            self.next_save = now + self.interval
+            self.save(controller)
+
+    def load(self, scene: str) -> Optional[Dict[str, Any]]:
+        """Load the snapshot of a scene.
+
+        # Returns
+
+        `Optional[Dict[str, Any]]` - The snapshot, or None if there is none for the scene or it is
+        too old.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as jsonfile:
+                content = json.load(jsonfile)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(content, dict) or content.get("version") != SNAPSHOT_VERSION \
+                or content.get("scene") != scene:
+            return None
+        if not 0 <= time.time() - content.get("time", 0) <= self.max_age:
+            return None
+        return content
+
+    def restore(self, controller) -> bool:
+        """Restore the snapshot of the running scene into its controller, if there is a recent one.
+
+        The controller has to be restored before its scene is initialized.
+
+        # Returns
+
+        `bool` - True if the snapshot was restored.
+        """
+        content = self.load(self.scene)
+        if content is None:
+            return False
+        try:
+            version, internal_state, gauss_next = content["random"]
+            controller.restore(content["frame"], content["state"])
+            random.setstate((version, tuple(internal_state), gauss_next))
+        except (KeyError, TypeError, ValueError, SnapshotError) as error:
+            print(f"WARNING: Could not restore the scene snapshot: {error}")
+            return False
+        print(f"Restored the {self.scene} scene from {time.time() - content['time']:.0f} s ago")
+        return True
@@ -0,0 +1,132 @@
+""" Fast startup: a splash frame shown before any scene is loaded, and startup metrics.
+
+The last frame shown before the daemon stopped is cached on disk. On the next start it is
+written to the display right after the display was opened, before scenes parse or decode
+their content, so that the display does not stay dark while the scene loads.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import os
+import time
+
+from typing import Optional
+
+import numpy as np
+
+SPLASH_FILE_NAME = "splash.npy"
+# Shown if there is no cached splash yet: a dim dot in the middle of the display
+SPLASH_COLOR = (40, 40, 40)
+
+
+def process_age() -> float:
+    """Seconds since this process was started, including the interpreter startup"""
+    try:
+        with open("/proc/self/stat", "r", encoding="utf-8") as statfile:
+            # The command name may contain spaces, the fields after it do not
+            start_ticks = int(statfile.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r", encoding="utf-8") as uptimefile:
+            uptime = float(uptimefile.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.process_time()
+
+
+def default_splash_path() -> Optional[str]:
+    """The splash cache used without `--splash`.
+
+    It is in the cache directory systemd creates for the service (`$CACHE_DIRECTORY`), otherwise
+    in `$XDG_CACHE_HOME`. None if neither is set, no splash is shown then.
+    """
+    cache_directory = os.getenv("CACHE_DIRECTORY")
+    if cache_directory:
+        # systemd separates multiple cache directories by colons
+        return os.path.join(cache_directory.split(":")[0], SPLASH_FILE_NAME)
+    xdg_cache_home = os.getenv("XDG_CACHE_HOME")
+    if xdg_cache_home:
+        return os.path.join(xdg_cache_home, "rpi-season-screen", SPLASH_FILE_NAME)
+    return None
+
+
+def default_splash(width: int, height: int) -> np.ndarray:
+    """The splash shown without a cached one"""
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[height // 2 - 1:height // 2 + 1, width // 2 - 1:width // 2 + 1] = SPLASH_COLOR
+    return frame
+
+
+class StartupMetrics:
+    """Logs the time from the process start to the first pixel and the first animated frame.
+
+    # Arguments
+
+    * `started` - Monotonic time the process was started at. Defaults to the actual process start.
+    """
+    def __init__(self, started: Optional[float] = None):
+        self.started: float = time.monotonic() - process_age() if started is None else started
+        self.first_pixel: Optional[float] = None
+        self.first_frame: Optional[float] = None
+
+    def pixel_shown(self):
+        """Called when the splash was written"""
+        if self.first_pixel is None:
+            self.first_pixel = time.monotonic() - self.started
+            print(f"Time to first pixel: {self.first_pixel * 1e3:.0f} ms")
+
+    def frame_shown(self):
+        """Called when the scene wrote its first frame"""
+        if self.first_frame is None:
+            self.first_frame = time.monotonic() - self.started
+            print(f"Time to first animated frame: {self.first_frame * 1e3:.0f} ms")
+
+
+class SplashCache:
+    """Frame cached on disk to show at startup.
+
+    # Arguments
+
+    * `path` - Path to the cached frame
+    """
+    def __init__(self, path: str):
+        self.path: str = path
+
+    def load(self, width: int, height: int) -> np.ndarray:
+        """The cached frame, or the default splash if there is none for the display size"""
+        try:
+            frame = np.load(self.path, allow_pickle=False)
+        except (OSError, ValueError):
+            return default_splash(width, height)
+        if frame.shape != (height, width, 3) or frame.dtype != np.uint8:
+            return default_splash(width, height)
+        return frame
+
+    def save(self, frame: np.ndarray):
+        """Cache a frame, usually the last one shown before stopping"""
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(temp_path, "wb") as splashfile:
+                np.save(splashfile, np.ascontiguousarray(frame, dtype=np.uint8), allow_pickle=False)
+            os.replace(temp_path, self.path)
+        except OSError as error:
+            print(f"WARNING: Could not cache the splash frame: {error}")
+
+    def show(self, sense) -> np.ndarray:
+        """Write the cached frame to a display
+
+        # Returns
+
+        `np.ndarray` - The frame shown
+        """
+        width = getattr(sense, "width", 8)
+        height = getattr(sense, "height", 8)
+        frame = self.load(width, height)
+        set_frame = getattr(sense, "set_frame", None)
+        if set_frame is not None:
+            set_frame(frame)
+        else:
+            sense.set_pixels(frame.reshape(-1, 3).tolist())
+        flush = getattr(sense, "flush", None)
+        if flush is not None:
+            flush()
+        return frame
@@ -0,0 +1,151 @@
+""" Background sampling of the Sense Hat sensors.
+
+Reading the sensors over I2C is slow, so scenes never read them directly.
+A `SensorService` samples every channel at its own rate in a background thread and publishes
+the results as an immutable `SensorSnapshot`. Replacing the snapshot is a single reference
+assignment, so scenes read it in their `_next_frame` without any lock or blocking.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import threading
+import time
+
+from collections import deque
+from types import MappingProxyType
+from typing import Deque, Dict, Mapping, NamedTuple, Optional
+
+from rpi_season_screen.sensors.source import Channel, Reading, SensorSource
+
+# Samples per second of every channel
+DEFAULT_RATES: Dict[Channel, float] = {
+    Channel.TEMPERATURE: 1.0,
+    Channel.HUMIDITY: 0.5,
+    Channel.PRESSURE: 0.5,
+    Channel.ORIENTATION: 20.0,
+    Channel.ACCELERATION: 20.0,
+}
+# Number of samples of the rolling averages
+DEFAULT_WINDOW = 10
+
+
+class SensorError(Exception):
+    """Errors related to the sensor service"""
+
+
+class SensorSnapshot(NamedTuple):
+    """Latest readings and rolling averages of all channels sampled so far"""
+    time: Optional[float]
+    values: Mapping[Channel, Reading]
+    averages: Mapping[Channel, Reading]
+    samples: int
+
+    def value(self, channel: Channel, default: Optional[Reading] = None) -> Optional[Reading]:
+        """The latest reading of a channel, or `default` if it was not sampled yet"""
+        return self.values.get(channel, default)
+
+    def average(self, channel: Channel, default: Optional[Reading] = None) -> Optional[Reading]:
+        """The rolling average of a channel, or `default` if it was not sampled yet"""
+        return self.averages.get(channel, default)
+
+
+EMPTY_SNAPSHOT = SensorSnapshot(None, MappingProxyType({}), MappingProxyType({}), 0)
+
+
+def _average(readings: Deque[Reading]) -> Reading:
+    if isinstance(readings[0], tuple):
+        return tuple(sum(values) / len(readings) for values in zip(*readings))
+    return sum(readings) / len(readings)
+
+
+class SensorService:
+    """Samples sensor channels in a background thread.
+
+    # Arguments
+
+    * `source` - Where the readings come from
+    * `rates` - Channel -> samples per second. Defaults to `DEFAULT_RATES`, channels that
+                are not given are not sampled.
+    * `window` - Number of samples of the rolling averages
+    """
+    def __init__(
+        self,
+        source: SensorSource,
+        rates: Optional[Dict[Channel, float]] = None,
+        window: int = DEFAULT_WINDOW,
+    ):
+        self.source: SensorSource = source
+        self.rates: Dict[Channel, float] = dict(DEFAULT_RATES if rates is None else rates)
+        if not self.rates or any(rate <= 0 for rate in self.rates.values()):
+            raise SensorError(f"Invalid sample rates: {self.rates}")
+        if window < 1:
+            raise SensorError(f"Invalid window size: {window}")
+        self.window: int = window
+        self.snapshot: SensorSnapshot = EMPTY_SNAPSHOT
+        self.errors: int = 0
+        self._history: Dict[Channel, Deque[Reading]] = {
+            channel: deque(maxlen=window) for channel in self.rates
+        }
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SensorService":
+        """Start sampling in a daemon thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sensor-service", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop sampling and wait for the thread to finish"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sample(self, channels=None):
+        """Read channels once and publish a new snapshot.
+
+        # Arguments
+
+        * `channels` - Channels to read. Defaults to all sampled channels.
+        """
+        values = dict(self.snapshot.values)
+        averages = dict(self.snapshot.averages)
+        for channel in self.rates if channels is None else channels:
+            # The history is only replaced if the reading could be averaged
+            history = deque(self._history[channel], maxlen=self.window)
+            try:
+                reading = self.source.read(channel)
+                history.append(reading)
+                average = _average(history)
+            except Exception as error:  # any driver error only costs this reading
+                self.errors += 1
+                print(f"WARNING: Reading {channel.name.lower()} failed: {type(error).__name__}: {error}")
+                continue
+            self._history[channel] = history
+            values[channel] = reading
+            averages[channel] = average
+        self.snapshot = SensorSnapshot(
+            time.monotonic(),
+            MappingProxyType(values),
+            MappingProxyType(averages),
+            self.snapshot.samples + 1,
+        )
+
+    def _run(self):
+        due = {channel: time.monotonic() for channel in self.rates}
+        while not self._stop.is_set():
+            now = time.monotonic()
+            channels = [channel for channel, due_time in due.items() if due_time <= now]
+            if channels:
+                try:
+                    self.sample(channels)
+                except Exception as error:  # a failing driver must not stop the sampling
+                    self.errors += 1
+                    print(f"WARNING: Sampling the sensors failed: {type(error).__name__}: {error}")
+                for channel in channels:
+                    # Skip samples that were missed instead of catching up on them
+                    due[channel] = max(due[channel] + 1 / self.rates[channel], now)
+            self._stop.wait(max(0.0, min(due.values()) - time.monotonic()))
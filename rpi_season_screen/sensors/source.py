@@ -0,0 +1,100 @@
+""" Sources of sensor readings for the `SensorService`.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import math
+import time
+
+from abc import abstractmethod
+from enum import Enum, auto
+from typing import Callable, Dict, Optional, Tuple, Union
+
+# A reading is a single value or a tuple of values, e.g. (pitch, roll, yaw)
+Reading = Union[float, Tuple[float, ...]]
+
+
+class Channel(Enum):
+    """Sensor channels of the Sense Hat"""
+    TEMPERATURE = auto()    # degrees Celsius
+    HUMIDITY = auto()       # percent relative humidity
+    PRESSURE = auto()       # millibars
+    ORIENTATION = auto()    # (pitch, roll, yaw) in degrees
+    ACCELERATION = auto()   # (x, y, z) in g
+
+
+class SensorSource:
+    """Base class for sensor sources"""
+    @abstractmethod
+    def read(self, channel: Channel) -> Reading:
+        """Read a channel. This may block, it is only called from the sampling thread.
+
+        # Arguments
+
+        * `channel` - The channel to read
+
+        # Returns
+
+        `Reading` - The current value of the channel.
+        """
+        return 0.0
+
+
+class SenseHatSensorSource(SensorSource):
+    """The sensors of the RPI Sense Hat.
+
+    # Arguments
+
+    * `sense` - The RPI Sense Hat
+    """
+    def __init__(self, sense):
+        self.sense = sense
+
+    def read(self, channel: Channel) -> Reading:
+        if channel == Channel.TEMPERATURE:
+            return self.sense.get_temperature()
+        if channel == Channel.HUMIDITY:
+            return self.sense.get_humidity()
+        if channel == Channel.PRESSURE:
+            return self.sense.get_pressure()
+        if channel == Channel.ORIENTATION:
+            orientation = self.sense.get_orientation_degrees()
+            return orientation["pitch"], orientation["roll"], orientation["yaw"]
+        acceleration = self.sense.get_accelerometer_raw()
+        return acceleration["x"], acceleration["y"], acceleration["z"]
+
+
+class SimulatedSensorSource(SensorSource):
+    """Sensor source with computed readings, for tests and benchmarks.
+
+    By default the temperature swings between -10 and 10 degrees once per minute and
+    the board lies flat.
+
+    # Arguments
+
+    * `functions` - Channel -> function of the seconds since the source was created,
+                    returning the reading. Overrides the default readings.
+    * `read_delay` - Seconds every read blocks, to simulate slow I2C reads
+    """
+    def __init__(
+        self,
+        functions: Optional[Dict[Channel, Callable[[float], Reading]]] = None,
+        read_delay: float = 0.0,
+    ):
+        self.functions: Dict[Channel, Callable[[float], Reading]] = {
+            Channel.TEMPERATURE: lambda elapsed: 10 * math.sin(elapsed * 2 * math.pi / 60),
+            Channel.HUMIDITY: lambda elapsed: 50.0,
+            Channel.PRESSURE: lambda elapsed: 1013.25,
+            Channel.ORIENTATION: lambda elapsed: (0.0, 0.0, 0.0),
+            Channel.ACCELERATION: lambda elapsed: (0.0, 0.0, 1.0),
+        }
+        self.functions.update(functions or {})
+        self.read_delay: float = read_delay
+        self.start: float = time.monotonic()
+        self.reads: int = 0
+
+    def read(self, channel: Channel) -> Reading:
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        self.reads += 1
+        return self.functions[channel](time.monotonic() - self.start)
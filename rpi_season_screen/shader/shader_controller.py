@@ -0,0 +1,106 @@
+""" Sense Controller Derivative to display procedural shaders, as fill content without any assets.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import time
+from typing import Optional
+
+import numpy as np
+from sense_hat import SenseHat
+
+from rpi_season_screen.input.joystick import Action, Direction, JoystickEvent
+from rpi_season_screen.sense.sense_controller import SenseController
+from rpi_season_screen.sense.snapshot import SnapshotError
+from rpi_season_screen.shader.shaders import (
+    Preset, ShaderError, get_preset, preset_names, shader_grid
+)
+
+SHADER_FPS = 30
+DEFAULT_PRESET = "plasma"
+
+
+class ShaderController(SenseController):
+    """Wrapper for the RPI Sense hat to display procedural shaders.
+
+    # Arguments
+
+    * `sense` - The RPI Sense Hat the Controller is based on
+    * `rotation` - Rotation of the tree, value between 0 and 360.
+    * `low_light_mode` - True if the Sense Hat should use the Low Light mode.
+    * `preset` - Name of the shader preset to show
+    * `cycle` - Seconds after which the next preset is shown. Defaults to None, showing only `preset`.
+    * `fps` - Frames per second
+    """
+    def __init__(
+        self,
+        sense: SenseHat,
+        rotation: int = 0,
+        low_light_mode: bool = True,
+        preset: str = DEFAULT_PRESET,
+        cycle: Optional[float] = None,
+        fps: float = SHADER_FPS,
+    ):
+        super().__init__(sense, rotation, low_light_mode)
+        self.preset: Preset = get_preset(preset)
+        self.cycle: Optional[float] = cycle
+        self.fps: float = fps
+        self.grid = shader_grid(self.width, self.height)
+        self.start_time: Optional[float] = None
+        self.preset_start: float = 0.0
+        self.frame_number: int = -1
+        # Shader time the scene starts at
+        self.start_offset: float = 0.0
+
+    def _init_scene(self):
+        """Initialize the Scene. Here only the clock is started."""
+        self.start_time = None
+        self.frame_number = -1
+
+    def _snapshot(self) -> dict:
+        """The preset and the shader time"""
+        t = time.monotonic() - self.start_time if self.start_time is not None else self.start_offset
+        return {"preset": self.preset.name, "time": t}
+
+    def _restore(self, state: dict):
+        """Continue the preset of the snapshot at its shader time, if it is the same preset or the
+        presets are cycled through"""
+        if state["preset"] != self.preset.name and not self.cycle:
+            return
+        try:
+            self.preset = get_preset(state["preset"])
+        except ShaderError as error:
+            raise SnapshotError(str(error)) from error
+        self.start_offset = float(state["time"])
+
+    def next_preset(self):
+        """Blend over to the next registered preset"""
+        names = preset_names()
+        self.preset = get_preset(names[(names.index(self.preset.name) + 1) % len(names)])
+        print(f"Showing {self.preset.name}")
+        self.transition_loop()
+
+    def handle_input(self, event: JoystickEvent) -> bool:
+        """Pushing the joystick shows the next preset"""
+        if event.direction == Direction.MIDDLE and event.action == Action.PRESSED:
+            self.next_preset()
+            return True
+        return super().handle_input(event)
+
+    def _next_frame(self):
+        """Start the scene loop here"""
+        now = time.monotonic()
+        if self.start_time is None:
+            self.start_time = now - self.start_offset
+            self.preset_start = now
+        if self.cycle and now - self.preset_start >= self.cycle:
+            self.preset_start = now
+            self.next_preset()
+        t = now - self.start_time
+        frame_number = int(t * self.fps)
+        self.wake_time = self.start_time + (frame_number + 1) / self.fps
+        if frame_number == self.frame_number:
+            return
+        self.frame_number = frame_number
+        colors = self.preset.shader.function(self.grid, t, **self.preset.params)
+        self.set_pixels((np.clip(colors, 0, 1) * 255).astype(np.uint8))
@@ -0,0 +1,197 @@
+""" Procedural shaders: per-pixel effects evaluated as vectorized functions of (x, y, t).
+
+A shader gets the precomputed coordinate grid of the display, the time in seconds and its
+parameters and returns the colors of all pixels at once as float array of shape
+(height, width, 3) with values between 0 and 1. Shaders are registered by name with
+`register_shader`, named parameter sets of registered shaders with `register_preset`.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple
+
+import numpy as np
+
+TAU = 2 * np.pi
+
+
+class ShaderError(Exception):
+    """Errors related to shaders"""
+
+
+class ShaderGrid:
+    """Coordinates of all pixels of a display, computed once per display size.
+
+    # Arguments
+
+    * `width` - Width of the display
+    * `height` - Height of the display
+    """
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        # Pixel coordinates
+        self.x: np.ndarray = x
+        self.y: np.ndarray = y
+        # Coordinates from 0 (left, top) to 1 (right, bottom)
+        self.nx: np.ndarray = x / max(1, width - 1)
+        self.ny: np.ndarray = y / max(1, height - 1)
+        # Coordinates from the center, -1 to 1 along the shorter side, so that circles stay round
+        scale = (min(width, height) - 1) / 2 or 1
+        self.u: np.ndarray = (x - (width - 1) / 2) / scale
+        self.v: np.ndarray = (y - (height - 1) / 2) / scale
+        self.radius: np.ndarray = np.hypot(self.u, self.v)
+        self.angle: np.ndarray = np.arctan2(self.v, self.u)
+        for array in (self.x, self.y, self.nx, self.ny, self.u, self.v, self.radius, self.angle):
+            array.setflags(write=False)
+
+
+@lru_cache(maxsize=8)
+def shader_grid(width: int, height: int) -> ShaderGrid:
+    """The coordinate grid of a display size. Grids are cached."""
+    return ShaderGrid(width, height)
+
+
+class Shader(NamedTuple):
+    """A registered shader with its default parameters"""
+    name: str
+    function: Callable[..., np.ndarray]
+    defaults: Dict[str, Any]
+
+
+class Preset(NamedTuple):
+    """A shader with a set of parameters"""
+    name: str
+    shader: Shader
+    params: Dict[str, Any]
+
+
+SHADERS: Dict[str, Shader] = {}
+PRESETS: Dict[str, Preset] = {}
+
+
+def register_shader(name: str, **defaults) -> Callable:
+    """Decorator registering a shader function `(grid, t, **params) -> colors`.
+
+    A preset with the shader's name and its default parameters is registered as well.
+
+    # Arguments
+
+    * `name` - Name of the shader
+    * `defaults` - Default values of the shader's parameters
+    """
+    def register(function: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        if name in SHADERS:
+            raise ShaderError(f"Shader {name} is already registered")
+        SHADERS[name] = Shader(name, function, defaults)
+        register_preset(name, name)
+        return function
+    return register
+
+
+def register_preset(name: str, shader: str, **params):
+    """Register a named set of parameters of a shader.
+
+    # Arguments
+
+    * `name` - Name of the preset
+    * `shader` - Name of the registered shader
+    * `params` - Parameters that differ from the shader's defaults
+    """
+    if shader not in SHADERS:
+        raise ShaderError(f"Unknown shader {shader}")
+    unknown = set(params) - set(SHADERS[shader].defaults)
+    if unknown:
+        raise ShaderError(f"Unknown parameters of {shader}: {', '.join(sorted(unknown))}")
+    PRESETS[name] = Preset(name, SHADERS[shader], {**SHADERS[shader].defaults, **params})
+
+
+def get_preset(name: str) -> Preset:
+    """The registered preset with a name"""
+    if name not in PRESETS:
+        raise ShaderError(f"Unknown preset {name} (known: {', '.join(preset_names())})")
+    return PRESETS[name]
+
+
+def preset_names() -> List[str]:
+    """Names of all registered presets, in the order they were registered"""
+    return list(PRESETS)
+
+
+def _hue_palette(hue: np.ndarray, saturation: float = 1.0) -> np.ndarray:
+    """Colors of hues (0 to 1, wrapping) as cosine palette"""
+    phases = np.array([0.0, 1 / 3, 2 / 3], dtype=np.float32)
+    return 0.5 + 0.5 * saturation * np.cos(TAU * (hue[..., np.newaxis] + phases))
+
+
+@register_shader("plasma", speed=1.0, scale=1.0, hue=0.0, saturation=1.0)
+def plasma(grid: ShaderGrid, t: float, speed: float, scale: float, hue: float, saturation: float):
+    """Overlapping sine waves, colored by a rotating palette"""
+    t = t * speed
+    value = np.sin(grid.u * 3 * scale + t) \
+        + np.sin(grid.v * 3 * scale + t * 0.7) \
+        + np.sin((grid.u + grid.v) * 2 * scale + t * 1.3) \
+        + np.sin(grid.radius * 4 * scale - t)
+    return _hue_palette(value / 8 + 0.5 + hue + t * 0.05, saturation)
+
+
+@register_shader("fire", speed=1.0, intensity=1.0)
+def fire(grid: ShaderGrid, t: float, speed: float, intensity: float):
+    """Flickering flames rising from the bottom"""
+    t = t * speed
+    flicker = 0.5 \
+        + 0.25 * np.sin(grid.x * 1.7 + t * 5 + np.sin(grid.y * 2.3 - t * 7)) \
+        + 0.25 * np.sin(grid.x * 3.1 - t * 4 + grid.y * 1.3)
+    heat = np.clip(grid.ny ** 1.5 * intensity * (0.6 + 0.6 * flicker), 0, 1)
+    # Black over red and yellow to white
+    return np.stack([
+        np.clip(heat * 3, 0, 1), np.clip(heat * 3 - 1, 0, 1), np.clip(heat * 3 - 2, 0, 1)
+    ], axis=-1)
+
+
+@register_shader("aurora", speed=0.3, height=0.4, width=0.15,
+                 color=(0.1, 1.0, 0.4), top_color=(0.5, 0.1, 0.8))
+def aurora(grid: ShaderGrid, t: float, speed: float, height: float, width: float,
+           color: tuple, top_color: tuple):
+    """Slowly waving curtain of light"""
+    t = t * speed
+    center = height + 0.15 * np.sin(grid.u * 2 + t) + 0.1 * np.sin(grid.u * 5 - t * 1.7)
+    curtain = np.exp(-((grid.ny - center) / width) ** 2)
+    shimmer = 0.6 + 0.4 * np.sin(grid.u * 7 + t * 4)
+    # The curtain fades into the top color above its center
+    mix = np.clip((center - grid.ny) / width, 0, 1)[..., np.newaxis]
+    colors = np.asarray(color, dtype=np.float32) * (1 - mix) \
+        + np.asarray(top_color, dtype=np.float32) * mix
+    return colors * (curtain * shimmer)[..., np.newaxis]
+
+
+@lru_cache(maxsize=8)
+def _star_table(stars: int, seed: int) -> np.ndarray:
+    """Direction, speed and phase of every star of a starfield"""
+    rng = np.random.default_rng(seed)
+    return np.stack([
+        rng.uniform(0, TAU, stars), rng.uniform(0.5, 1.5, stars), rng.uniform(0, 1, stars)
+    ])
+
+
+@register_shader("starfield", speed=0.4, stars=24, seed=0, color=(1.0, 1.0, 1.0))
+def starfield(grid: ShaderGrid, t: float, speed: float, stars: int, seed: int, color: tuple):
+    """Stars flying out of the center, getting brighter as they come closer"""
+    angle, star_speed, phase = _star_table(stars, seed)
+    progress = (t * speed * star_speed + phase) % 1
+    distance = progress ** 2 * np.hypot(grid.width, grid.height) / 2
+    x = np.rint((grid.width - 1) / 2 + distance * np.cos(angle)).astype(np.intp)
+    y = np.rint((grid.height - 1) / 2 + distance * np.sin(angle)).astype(np.intp)
+    visible = (x >= 0) & (x < grid.width) & (y >= 0) & (y < grid.height)
+    brightness = np.zeros((grid.height, grid.width), dtype=np.float32)
+    np.maximum.at(brightness, (y[visible], x[visible]), progress[visible])
+    return brightness[..., np.newaxis] * np.asarray(color, dtype=np.float32)
+
+
+register_preset("plasma-calm", "plasma", speed=0.3, scale=0.6, saturation=0.6)
+register_preset("plasma-ocean", "plasma", speed=0.5, hue=0.5, saturation=0.5)
+register_preset("embers", "fire", speed=0.4, intensity=0.7)
+register_preset("aurora-red", "aurora", color=(1.0, 0.2, 0.3), top_color=(0.4, 0.1, 0.6))
+register_preset("warp", "starfield", speed=1.2, stars=48)
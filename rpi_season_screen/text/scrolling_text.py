@@ -0,0 +1,143 @@
+""" Scrolling text on the RPI Sense Hat Display.
+
+A message is rendered once into a wide strip using the glyph atlas.
+All scroll positions of the strip are cut out as frames and cached by text and colors,
+so that showing a greeting again costs nothing but one bulk write per scroll step.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from rpi_season_screen.sense.layer import Layer
+from rpi_season_screen.text.font import GLYPH_HEIGHT, glyph
+
+Color = Tuple[int, int, int]
+
+
+def render_mask(text: str, width: int = 8, height: int = 8) -> np.ndarray:
+    """Render a message into a boolean strip.
+
+    The glyphs are separated by one empty column and the strip is padded with
+    one empty display width on both sides, so that the text scrolls in and out completely.
+
+    # Arguments
+
+    * `text` - The message
+    * `width` - Width of the display
+    * `height` - Height of the display. The glyphs are vertically centered.
+
+    # Returns
+
+    `np.ndarray` - Boolean array of shape (height, strip width).
+    """
+    top = max(0, (height - GLYPH_HEIGHT) // 2)
+    rows = min(height, GLYPH_HEIGHT)
+    parts = [np.zeros((GLYPH_HEIGHT, width), dtype=bool)]
+    for char in text:
+        parts.append(glyph(char))
+        parts.append(np.zeros((GLYPH_HEIGHT, 1), dtype=bool))
+    parts.append(np.zeros((GLYPH_HEIGHT, width), dtype=bool))
+    glyphs = np.concatenate(parts, axis=1)
+
+    mask = np.zeros((height, glyphs.shape[1]), dtype=bool)
+    mask[top:top + rows] = glyphs[:rows]
+    return mask
+
+
+@lru_cache(maxsize=16)
+def scroll_frames(
+    text: str, color: Color, back_color: Optional[Color], width: int = 8, height: int = 8
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return all scroll steps of a message. Results are cached.
+
+    # Arguments
+
+    * `text` - The message
+    * `color` - Text color as (r, g, b) tuple
+    * `back_color` - Background color as (r, g, b) tuple or None for a transparent background
+    * `width` - Width of the display
+    * `height` - Height of the display
+
+    # Returns
+
+    `Tuple[np.ndarray, np.ndarray]` - Read-only frames of shape (steps, height, width, 3)
+    and the masks of the opaque pixels of shape (steps, height, width).
+    """
+    mask = render_mask(text, width, height)
+    strip = np.zeros(mask.shape + (3,), dtype=np.uint8)
+    strip[mask] = color
+    if back_color is not None:
+        strip[~mask] = back_color
+        mask = np.ones_like(mask)
+
+    # (steps, height, width) windows, each step moving the strip one column to the left
+    frames = sliding_window_view(strip, (height, width), axis=(0, 1))[0]
+    frames = np.ascontiguousarray(frames.transpose(0, 2, 3, 1))
+    masks = np.ascontiguousarray(sliding_window_view(mask, (height, width))[0])
+    frames.setflags(write=False)
+    masks.setflags(write=False)
+    return frames, masks
+
+
+class ScrollingText(Layer):
+    """Non-blocking scrolling message that is shown on top of a scene.
+
+    # Arguments
+
+    * `text` - The message
+    * `start_time` - Time as returned by `time.monotonic()` the scrolling starts at
+    * `color` - Text color
+    * `back_color` - Background color, None (default) to show the scene behind the text.
+    * `scroll_speed` - Seconds per scroll step, as in `SenseHat.show_message`
+    * `repeat` - How often the message is scrolled through
+    * `width` - Width of the display
+    * `height` - Height of the display
+    """
+    def __init__(
+        self,
+        text: str,
+        start_time: float,
+        color: Color = (255, 255, 255),
+        back_color: Optional[Color] = None,
+        scroll_speed: float = 0.1,
+        repeat: int = 1,
+        width: int = 8,
+        height: int = 8,
+    ):
+        super().__init__()
+        self.frames, self.masks = scroll_frames(
+            text,
+            tuple(color),
+            tuple(back_color) if back_color is not None else None,
+            width,
+            height,
+        )
+        self.opaque: bool = back_color is not None
+        self.start_time: float = start_time
+        self.scroll_speed: float = scroll_speed
+        self.total_steps: int = len(self.frames) * repeat
+        self.step: int = -1
+
+    def update(self, now: float) -> bool:
+        step = int((now - self.start_time) / self.scroll_speed)
+        if step >= self.total_steps:
+            self.finished = True
+            return True
+        if step == self.step:
+            return False
+        self.step = max(step, 0)
+        return True
+
+    def next_update(self) -> Optional[float]:
+        return self.start_time + (self.step + 1) * self.scroll_speed
+
+    def compose(self, frame: np.ndarray) -> np.ndarray:
+        index = self.step % len(self.frames)
+        if self.opaque:
+            return self.frames[index]
+        return np.where(self.masks[index][..., np.newaxis], self.frames[index], frame)
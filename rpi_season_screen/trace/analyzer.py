@@ -0,0 +1,223 @@
+""" Offline analysis of display traces recorded by `TracingSense`.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from rpi_season_screen.trace.recorder import (
+    CALL_CLEAR, CALL_SET_FRAME, CALL_SET_PIXEL, CALL_SET_PIXELS, FRAME_MARKER
+)
+
+# Writes less than this many seconds apart belong to the same burst
+BURST_GAP = 0.001
+# Bursts with fewer writes are not reported
+MIN_BURST = 16
+HOT_PIXELS = 10
+# Call types that record one record per pixel of the display
+BULK_CALLS = (CALL_SET_PIXELS, CALL_SET_FRAME)
+
+
+def _expand_clears(records: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Replace every clear record with one record per pixel"""
+    clears = np.flatnonzero(records["type"] == CALL_CLEAR)
+    if not len(clears):
+        return records
+    pixels = width * height
+    repeats = np.ones(len(records), dtype=np.int64)
+    repeats[clears] = pixels
+    expanded = np.repeat(records, repeats)
+    starts = np.cumsum(repeats) - repeats
+    for start in starts[clears]:
+        expanded["x"][start:start + pixels] = np.tile(np.arange(width), height)
+        expanded["y"][start:start + pixels] = np.repeat(np.arange(height), width)
+    return expanded
+
+
+def _call_starts(records: np.ndarray) -> np.ndarray:
+    """Mask of the records that start a call to the display.
+
+    Bulk calls record every pixel, starting at (0, 0). Their first records are lost if the ring
+    wrapped in the middle of the call, the call is not counted then.
+    """
+    bulk = np.isin(records["type"], BULK_CALLS)
+    return np.isin(records["type"], (CALL_SET_PIXEL, CALL_CLEAR)) \
+        | (bulk & (records["x"] == 0) & (records["y"] == 0))
+
+
+def _distribution(values: np.ndarray) -> Dict[str, float]:
+    if not len(values):
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max()),
+    }
+
+
+def _run_bounds(positions: np.ndarray) -> np.ndarray:
+    """Start and end of every run of consecutive positions"""
+    if not len(positions):
+        return np.array([0])
+    breaks = np.flatnonzero(np.diff(positions) > 1) + 1
+    return np.concatenate(([0], breaks, [len(positions)]))
+
+
+def _redundant_writes(writes: np.ndarray, width: int) -> np.ndarray:
+    """Mask of the writes that set a pixel to the color the previous write to it already set"""
+    pixel = writes["y"].astype(np.int64) * width + writes["x"]
+    color = (writes["r"].astype(np.int64) << 16) | (writes["g"].astype(np.int64) << 8) | writes["b"]
+    order = np.lexsort((np.arange(len(writes)), pixel))
+    same_pixel = pixel[order][1:] == pixel[order][:-1]
+    same_color = color[order][1:] == color[order][:-1]
+    redundant = np.zeros(len(writes), dtype=bool)
+    redundant[order[1:]] = same_pixel & same_color
+    return redundant
+
+
+def _analyze_records(
+    records: np.ndarray,
+    writes: np.ndarray,
+    redundant: np.ndarray,
+    positions: np.ndarray,
+    width: int,
+    height: int,
+) -> Dict[str, Any]:
+    """Statistics of trace records.
+
+    # Arguments
+
+    * `records` - The records, in the order they were written
+    * `writes` - The pixel writes of the records, with clears expanded to every pixel
+    * `redundant` - Mask of the redundant writes, determined on the whole trace
+    * `positions` - Position of every record in the whole trace. Records of a scene are interrupted
+                    by the records of the scenes running in between, which are not part of its
+                    duration.
+    * `width` - Width of the traced display
+    * `height` - Height of the traced display
+    """
+    markers = records["type"] == FRAME_MARKER
+    frame_count = int(markers.sum())
+
+    # One device write per call, no matter how many pixels it sets
+    call_starts = _call_starts(records)
+    calls = {
+        name: int((call_starts & (records["type"] == call)).sum())
+        for name, call in (("set_pixel", CALL_SET_PIXEL), ("set_pixels", CALL_SET_PIXELS),
+                           ("set_frame", CALL_SET_FRAME), ("clear", CALL_CLEAR))
+    }
+
+    pixel = writes["y"].astype(np.int64) * width + writes["x"]
+
+    # Device writes between two frame markers
+    marker_positions = np.flatnonzero(markers)
+    call_index = np.cumsum(call_starts)
+    per_frame = np.diff(np.concatenate(([0], call_index[marker_positions]))) if frame_count \
+        else np.array([])
+
+    # Bursts of writes with hardly any time in between
+    times = writes["time"]
+    breaks = np.flatnonzero(np.diff(times) > BURST_GAP) + 1
+    bounds = np.concatenate(([0], breaks, [len(writes)])) if len(writes) else np.array([0])
+    sizes = np.diff(bounds)
+    durations = np.array([times[end - 1] - times[start] for start, end in
+                          zip(bounds[:-1], bounds[1:]) if end > start])
+    is_burst = sizes >= MIN_BURST
+
+    counts = np.bincount(pixel, minlength=width * height)
+    redundant_counts = np.bincount(pixel[redundant], minlength=width * height)
+    hot = np.argsort(counts)[::-1][:HOT_PIXELS]
+
+    # Traced time, without the time other scenes ran in between
+    record_times = records["time"]
+    runs = _run_bounds(positions)
+    duration = float(sum(record_times[end - 1] - record_times[start]
+                         for start, end in zip(runs[:-1], runs[1:]) if end > start))
+    return {
+        "records": int(len(records)),
+        "duration": duration,
+        "calls": calls,
+        "pixel_writes": int(len(writes)),
+        "pixel_writes_per_second": len(writes) / duration if duration else 0.0,
+        "redundant_writes": int(redundant.sum()),
+        "redundant_ratio": float(redundant.mean()) if len(writes) else 0.0,
+        "frames": frame_count,
+        "writes_per_frame": _distribution(per_frame),
+        "bursts": {
+            "count": int(is_burst.sum()),
+            "max_size": int(sizes.max()) if len(sizes) else 0,
+            "max_duration": float(durations[is_burst[:len(durations)]].max())
+            if is_burst.any() else 0.0,
+        },
+        "hot_pixels": [
+            {"x": int(index % width), "y": int(index // width),
+             "writes": int(counts[index]), "redundant": int(redundant_counts[index])}
+            for index in hot if counts[index]
+        ],
+    }
+
+
+def analyze(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyze a trace as returned by `read_trace`.
+
+    # Returns
+
+    `Dict[str, Any]` - Calls per type, pixel writes, redundant writes (pixels set to the color they
+    already had), device writes per frame, bursts and the most written pixels, of the whole trace
+    and per scene.
+    """
+    width, height = trace["width"], trace["height"]
+    records = trace["records"]
+    writes = _expand_clears(records[records["type"] != FRAME_MARKER], width, height)
+    # A write is redundant, if the previous write to the same pixel had the same color,
+    # no matter which scene wrote it
+    redundant = _redundant_writes(writes, width)
+    report = {
+        "size": [width, height],
+        "overwritten": trace["written"] > trace["capacity"],
+        **_analyze_records(records, writes, redundant, np.arange(len(records)), width, height),
+        "scenes": {},
+    }
+    for scene_id in np.unique(records["scene"]):
+        positions = np.flatnonzero(records["scene"] == scene_id)
+        scene_writes = writes["scene"] == scene_id
+        # Writes before the first scene, like the splash frame, have no scene
+        name = trace["scenes"].get(int(scene_id), "startup")
+        report["scenes"][name] = _analyze_records(
+            records[positions], writes[scene_writes], redundant[scene_writes], positions, width, height
+        )
+    return report
+
+
+def _format_statistics(statistics: Dict[str, Any], indent: str = "") -> List[str]:
+    return [
+        indent + "Calls: " + ", ".join(f"{name} {count}" for name, count in statistics["calls"].items()),
+        f"{indent}Pixel writes: {statistics['pixel_writes']} "
+        f"({statistics['pixel_writes_per_second']:.1f}/s), "
+        f"redundant: {statistics['redundant_writes']} ({statistics['redundant_ratio']:.1%})",
+        f"{indent}Frames with writes: {statistics['frames']}, device writes per frame: "
+        + ", ".join(f"{key} {value:.1f}" for key, value in statistics["writes_per_frame"].items()),
+        f"{indent}Bursts of {MIN_BURST}+ writes: {statistics['bursts']['count']}, "
+        f"largest {statistics['bursts']['max_size']} writes, "
+        f"longest {statistics['bursts']['max_duration'] * 1e3:.2f} ms",
+        indent + "Hot pixels: " + ", ".join(
+            f"({pixel['x']}, {pixel['y']}) {pixel['writes']} [{pixel['redundant']} redundant]"
+            for pixel in statistics["hot_pixels"]
+        ),
+    ]
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human readable version of a report returned by `analyze`"""
+    lines = [
+        f"Display {report['size'][0]}x{report['size'][1]}, {report['duration']:.1f} s traced"
+        + (" (ring wrapped)" if report["overwritten"] else ""),
+        *_format_statistics(report),
+    ]
+    for scene, statistics in report["scenes"].items():
+        lines += ["", f"Scene {scene}, {statistics['duration']:.1f} s traced",
+                  *_format_statistics(statistics, "  ")]
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+""" Sampling profiler for the scene loop.
+
+A background thread looks at the scene loop thread's stack at a fixed interval and counts how often
+every stack was seen. Nothing is hooked into the profiled code, so the scene loop runs at full speed
+and the overhead is the time the sampler needs per sample, a few microseconds.
+
+The stacks are written in the folded format (`root;caller;callee count`), which is understood by
+flamegraph tools like `flamegraph.pl` or speedscope. The root of every stack is the running scene.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Seconds between two samples
+SAMPLE_INTERVAL = 0.01
+# Functions listed in the summary
+SUMMARY_FUNCTIONS = 25
+
+
+class SamplingProfiler:
+    """Samples the stack of a thread, by default the main thread running the scene loop.
+
+    # Arguments
+
+    * `output_path` - Path the folded stacks are written to. The summary is written next to it,
+                    with the suffix `.summary.txt`.
+    * `duration` - Seconds to sample for
+    * `interval` - Seconds between two samples
+    * `thread_id` - Identifier of the sampled thread. Defaults to the main thread.
+    """
+    def __init__(
+        self,
+        output_path: str,
+        duration: float,
+        interval: float = SAMPLE_INTERVAL,
+        thread_id: Optional[int] = None,
+    ):
+        self.output_path: str = output_path
+        self.duration: float = duration
+        self.interval: float = interval
+        self.thread_id: int = threading.main_thread().ident if thread_id is None else thread_id
+        # Name of the running scene, the root of the sampled stacks
+        self.scene: str = "startup"
+        self.stacks: Counter = Counter()
+        self.samples: int = 0
+        # Seconds spent taking samples
+        self.overhead: float = 0.0
+        self.elapsed: float = 0.0
+        self._labels: Dict[Tuple[object, int], str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._written: bool = False
+
+    def start(self) -> "SamplingProfiler":
+        """Start sampling in a background thread, if not started yet.
+
+        The results are written when done or on exit.
+        """
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Stop sampling and write the results, if not done yet"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        if not self._written:
+            self._written = True
+            self.write()
+
+    def _run(self):
+        began = time.monotonic()
+        deadline = began + self.duration
+        next_sample = began
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            self.sample()
+            self.overhead += time.monotonic() - now
+            next_sample += self.interval
+            self._stop.wait(max(0.0, next_sample - time.monotonic()))
+        self.elapsed = time.monotonic() - began
+        if not self._stop.is_set():
+            self.stop()
+
+    def sample(self):
+        """Take a single sample of the thread's stack"""
+        frame = sys._current_frames().get(self.thread_id)  # pylint: disable=protected-access
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            stack.append((frame.f_code, frame.f_lineno))
+            frame = frame.f_back
+        self.stacks[(self.scene, tuple(stack))] += 1
+        self.samples += 1
+
+    def _label(self, code, line: int) -> str:
+        key = (code, line)
+        label = self._labels.get(key)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{line})"
+            self._labels[key] = label
+        return label
+
+    def folded(self) -> List[str]:
+        """The sampled stacks in the folded format, outermost frame first"""
+        lines = []
+        for (scene, stack), count in self.stacks.most_common():
+            frames = [self._label(code, line) for code, line in reversed(stack)]
+            lines.append(f"{';'.join([scene] + frames)} {count}")
+        return lines
+
+    def summary(self) -> str:
+        """Samples per function, by the time spent in the function itself and including its callees"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for (_, stack), count in self.stacks.items():
+            functions = [f"{code.co_name} ({os.path.basename(code.co_filename)})" for code, _ in stack]
+            if functions:
+                own[functions[0]] += count
+            for function in set(functions):
+                total[function] += count
+        samples = max(1, self.samples)
+        lines = [
+            f"{self.samples} samples in {self.elapsed:.1f} s, "
+            f"sampling overhead {self.overhead / max(self.elapsed, 1e-9) * 100:.2f}%",
+            "",
+            f"{'own %':>7} {'total %':>8}  function",
+        ]
+        for function, count in own.most_common(SUMMARY_FUNCTIONS):
+            lines.append(f"{count / samples * 100:7.1f} {total[function] / samples * 100:8.1f}  {function}")
+        lines += ["", f"{'total %':>8}  function (including callees)"]
+        for function, count in total.most_common(SUMMARY_FUNCTIONS):
+            lines.append(f"{count / samples * 100:8.1f}  {function}")
+        return "\n".join(lines)
+
+    @property
+    def summary_path(self) -> str:
+        return self.output_path + ".summary.txt"
+
+    def write(self):
+        """Write the folded stacks and the summary"""
+        if not self.elapsed:
+            self.elapsed = self.duration
+        try:
+            with open(self.output_path, "w", encoding="utf-8") as output:
+                output.write("\n".join(self.folded()) + "\n")
+            summary = self.summary()
+            with open(self.summary_path, "w", encoding="utf-8") as output:
+                output.write(summary + "\n")
+        except OSError as error:
+            print(f"WARNING: Could not write the profile: {error}")
+            return
+        print(f"Profile written to {self.output_path} and {self.summary_path}")
+        print(summary)
@@ -0,0 +1,265 @@
+""" Opt-in recorder for every write to the display.
+
+`TracingSense` wraps the display (a `SenseHat` or a `TiledWall`) and records every
+`set_pixel`, `set_pixels`, `set_frame` and `clear` call into a binary ring file.
+Each written pixel is one fixed size record, so the file never grows beyond its capacity
+and the oldest records are overwritten first. Every record carries the id of the scene that was
+running, the names of the scenes are stored in the header.
+
+File layout (little endian):
+
+    header      "RSST", version (u8), record size (u8), width (u16), height (u16),
+                capacity (u32), records written (u64), padded to 64 bytes
+    scenes      MAX_SCENES * scene name (32 bytes), id 0 being writes before the first scene
+    records     capacity * (timestamp (f64), type (u8), x (u16), y (u16), r, g, b (u8), scene (u8))
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import atexit
+import mmap
+import struct
+import time
+
+from typing import Dict
+
+import numpy as np
+
+MAGIC = b"RSST"
+# Version 2 recorded set_frame calls as set_pixels
+VERSION = 3
+HEADER = struct.Struct("<4sBBHHIQ")
+WRITTEN_OFFSET = struct.calcsize("<4sBBHHI")
+SCENE_NAME_SIZE = 32
+MAX_SCENES = 64
+SCENES_OFFSET = 64
+HEADER_SIZE = SCENES_OFFSET + MAX_SCENES * SCENE_NAME_SIZE
+
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("type", "u1"),
+    ("x", "<u2"),
+    ("y", "<u2"),
+    ("r", "u1"),
+    ("g", "u1"),
+    ("b", "u1"),
+    ("scene", "u1"),
+])
+
+CALL_SET_PIXEL = 1
+CALL_SET_PIXELS = 2
+CALL_CLEAR = 3
+FRAME_MARKER = 4
+CALL_SET_FRAME = 5
+
+DEFAULT_CAPACITY = 1 << 20
+
+
+class TraceError(Exception):
+    """Errors related to display traces"""
+
+
+class TraceWriter:
+    """Ring file of write records.
+
+    # Arguments
+
+    * `path` - Path of the trace file. An existing file is overwritten.
+    * `width` - Width of the traced display
+    * `height` - Height of the traced display
+    * `capacity` - Number of records the file holds before the oldest are overwritten
+    """
+    def __init__(self, path: str, width: int, height: int, capacity: int = DEFAULT_CAPACITY):
+        self.capacity: int = capacity
+        self.written: int = 0
+        # Scene name -> id, stored in every record
+        self.scenes: Dict[str, int] = {}
+        self.scene_id: int = 0
+        size = HEADER_SIZE + capacity * RECORD_DTYPE.itemsize
+        with open(path, "wb") as tracefile:
+            tracefile.write(HEADER.pack(
+                MAGIC, VERSION, RECORD_DTYPE.itemsize, width, height, capacity, 0
+            ).ljust(HEADER_SIZE, b"\0"))
+            tracefile.truncate(size)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self.records = np.ndarray(
+            (capacity,), dtype=RECORD_DTYPE, buffer=self._map, offset=HEADER_SIZE
+        )
+
+    def set_scene(self, scene: str):
+        """Attribute the following records to a scene. New scene names are stored in the header."""
+        scene_id = self.scenes.get(scene)
+        if scene_id is None:
+            scene_id = len(self.scenes) + 1
+            if scene_id >= MAX_SCENES:
+                print(f"WARNING: More than {MAX_SCENES - 1} scenes traced, {scene} is not named")
+                scene_id = 0
+            else:
+                self.scenes[scene] = scene_id
+                offset = SCENES_OFFSET + scene_id * SCENE_NAME_SIZE
+                self._map[offset:offset + SCENE_NAME_SIZE] = \
+                    scene.encode()[:SCENE_NAME_SIZE].ljust(SCENE_NAME_SIZE, b"\0")
+        self.scene_id = scene_id
+
+    def append(self, records: np.ndarray):
+        """Append records, overwriting the oldest ones if the file is full"""
+        records["scene"] = self.scene_id
+        count = len(records)
+        if count > self.capacity:
+            records = records[-self.capacity:]
+            self.written += count - self.capacity
+            count = self.capacity
+        start = self.written % self.capacity
+        first = min(count, self.capacity - start)
+        self.records[start:start + first] = records[:first]
+        if first < count:
+            self.records[:count - first] = records[first:]
+        self.written += count
+        struct.pack_into("<Q", self._map, WRITTEN_OFFSET, self.written)
+
+    def close(self):
+        if self._map.closed:
+            return
+        del self.records
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+
+class TracingSense:
+    """Display wrapper recording all writes. Everything else is passed to the wrapped display.
+
+    # Arguments
+
+    * `sense` - The display, a `SenseHat` or `TiledWall`
+    * `path` - Path of the trace file
+    * `capacity` - Number of records the trace file holds
+    """
+    def __init__(self, sense, path: str, capacity: int = DEFAULT_CAPACITY):
+        self.sense = sense
+        self.width: int = getattr(sense, "width", 8)
+        self.height: int = getattr(sense, "height", 8)
+        self.writer = TraceWriter(path, self.width, self.height, capacity)
+        self._writes_since_marker: int = 0
+        # Preallocated records of a whole frame, only time and color change between writes
+        self._frame_records = np.zeros(self.width * self.height, dtype=RECORD_DTYPE)
+        self._frame_records["x"] = np.tile(np.arange(self.width), self.height)
+        self._frame_records["y"] = np.repeat(np.arange(self.height), self.width)
+        self._single_record = np.zeros(1, dtype=RECORD_DTYPE)
+        atexit.register(self.writer.close)
+
+    def __getattr__(self, name: str):
+        return getattr(self.sense, name)
+
+    @property
+    def rotation(self) -> int:
+        return self.sense.rotation
+
+    @rotation.setter
+    def rotation(self, rotation: int):
+        self.sense.rotation = rotation
+
+    @property
+    def low_light(self) -> bool:
+        return self.sense.low_light
+
+    @low_light.setter
+    def low_light(self, low_light: bool):
+        self.sense.low_light = low_light
+
+    def set_scene(self, scene: str):
+        self.writer.set_scene(scene)
+
+    def _record(self, call: int, x: int, y: int, color):
+        record = self._single_record
+        record["time"] = time.monotonic()
+        record["type"] = call
+        record["x"] = x
+        record["y"] = y
+        record["r"], record["g"], record["b"] = color
+        self.writer.append(record)
+
+    def _record_frame(self, call: int, frame: np.ndarray):
+        records = self._frame_records
+        records["time"] = time.monotonic()
+        records["type"] = call
+        pixels = frame.reshape(-1, 3)
+        records["r"] = pixels[:, 0]
+        records["g"] = pixels[:, 1]
+        records["b"] = pixels[:, 2]
+        self.writer.append(records)
+
+    def set_pixel(self, x: int, y: int, *args):
+        color = args[0] if len(args) == 1 else args
+        self._record(CALL_SET_PIXEL, x, y, color)
+        self._writes_since_marker += 1
+        self.sense.set_pixel(x, y, *args)
+
+    def set_pixels(self, pixel_list):
+        self._record_frame(CALL_SET_PIXELS, np.asarray(pixel_list, dtype=np.uint8))
+        self._writes_since_marker += 1
+        self.sense.set_pixels(pixel_list)
+
+    def set_frame(self, frame: np.ndarray):
+        self._record_frame(CALL_SET_FRAME, frame)
+        self._writes_since_marker += 1
+        set_frame = getattr(self.sense, "set_frame", None)
+        if set_frame is not None:
+            set_frame(frame)
+        else:
+            self.sense.set_pixels(frame.reshape(-1, 3).tolist())
+
+    def clear(self, *args):
+        color = [0, 0, 0]
+        if len(args) == 1:
+            color = args[0]
+        elif len(args) == 3:
+            color = args
+        self._record(CALL_CLEAR, 0, 0, color)
+        self._writes_since_marker += 1
+        self.sense.clear(*args)
+
+    def mark_frame(self):
+        """Record the end of a scene loop iteration, if anything was written during it"""
+        if not self._writes_since_marker:
+            return
+        self._writes_since_marker = 0
+        self._record(FRAME_MARKER, 0, 0, (0, 0, 0))
+
+
+def read_trace(path: str) -> dict:
+    """Read a trace file.
+
+    # Returns
+
+    `dict` - The header fields (`width`, `height`, `capacity`, `written`), the `scenes` names by
+    id and the `records` in the order they were written.
+    """
+    with open(path, "rb") as tracefile:
+        data = tracefile.read()
+    if len(data) < HEADER_SIZE:
+        raise TraceError(f"{path} is too short to be a trace")
+    magic, version, record_size, width, height, capacity, written = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise TraceError(f"{path} is not a trace of version {VERSION}")
+    records = np.frombuffer(data, dtype=RECORD_DTYPE, count=capacity, offset=HEADER_SIZE)
+    if written > capacity:
+        start = written % capacity
+        records = np.concatenate((records[start:], records[:start]))
+    else:
+        records = records[:written]
+    scenes = {}
+    for scene_id in range(1, MAX_SCENES):
+        offset = SCENES_OFFSET + scene_id * SCENE_NAME_SIZE
+        name = data[offset:offset + SCENE_NAME_SIZE].rstrip(b"\0")
+        if name:
+            scenes[scene_id] = name.decode(errors="replace")
+    return {
+        "width": width,
+        "height": height,
+        "capacity": capacity,
+        "written": written,
+        "scenes": scenes,
+        "records": records,
+    }
@@ -0,0 +1,203 @@
+""" Transitions between scenes and between the end and the start of looping content.
+
+A transition is a layer that blends the last frame of the previous scene (or loop) over the
+frames of the next one. The blend weights of every step are precomputed and cached per kind,
+size and number of steps, so that a transition frame costs one vector blend and one bulk write.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import json
+
+from enum import Enum, auto
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from rpi_season_screen.sense.layer import Layer
+
+# Transition steps per second
+TRANSITION_FPS = 30
+# Blend weights are fixed point numbers with this value being 1.0
+WEIGHT_ONE = 256
+# Seed of the pixel order of dissolves, so that they look the same every time
+DISSOLVE_SEED = 2023
+# Scene name matching every scene in transition tables
+ANY_SCENE = "*"
+
+
+class TransitionKind(Enum):
+    """How the next scene replaces the previous one"""
+    CUT = auto()
+    CROSSFADE = auto()
+    WIPE = auto()
+    DISSOLVE = auto()
+
+
+class TransitionError(Exception):
+    """Errors related to transitions"""
+
+
+class TransitionSpec(NamedTuple):
+    """Kind and duration in seconds of a transition"""
+    kind: TransitionKind
+    duration: float
+
+
+@lru_cache(maxsize=32)
+def transition_weights(kind: TransitionKind, steps: int, width: int, height: int) -> np.ndarray:
+    """Precompute the weights of the next scene for all steps of a transition. Results are cached.
+
+    # Arguments
+
+    * `kind` - The kind of transition
+    * `steps` - Number of steps
+    * `width` - Width of the display
+    * `height` - Height of the display
+
+    # Returns
+
+    `np.ndarray` - Read-only array of shape (steps, height, width, 1), with weights from 0
+    (previous scene only) to `WEIGHT_ONE` (next scene only).
+    """
+    progress = (np.arange(1, steps + 1, dtype=np.float32) / steps)[:, np.newaxis, np.newaxis]
+    if kind == TransitionKind.CROSSFADE:
+        weights = np.broadcast_to(progress, (steps, height, width))
+    elif kind == TransitionKind.WIPE:
+        # Left to right with a soft edge of one column
+        columns = np.arange(width, dtype=np.float32)[np.newaxis, np.newaxis, :]
+        weights = np.broadcast_to(np.clip(progress * (width + 1) - columns, 0, 1), (steps, height, width))
+    elif kind == TransitionKind.DISSOLVE:
+        order = np.random.default_rng(DISSOLVE_SEED).permutation(width * height).reshape(height, width)
+        weights = (order[np.newaxis] < progress * width * height).astype(np.float32)
+    else:
+        weights = np.ones((steps, height, width), dtype=np.float32)
+    weights = np.round(weights * WEIGHT_ONE).astype(np.uint16)[..., np.newaxis]
+    weights.setflags(write=False)
+    return weights
+
+
+class Transition(Layer):
+    """Layer blending a still frame of the previous scene into the running scene.
+
+    The transition starts with its first update.
+
+    # Arguments
+
+    * `from_frame` - Last frame of the previous scene as array of shape (height, width, 3)
+    * `kind` - The kind of transition
+    * `duration` - Duration in seconds
+    """
+    def __init__(self, from_frame: np.ndarray, kind: TransitionKind, duration: float):
+        super().__init__()
+        height, width, _ = from_frame.shape
+        self.steps: int = max(1, round(duration * TRANSITION_FPS))
+        self.duration: float = duration
+        self.weights: np.ndarray = transition_weights(kind, self.steps, width, height)
+        self.from_frame: np.ndarray = from_frame.astype(np.uint16)
+        self.start_time: Optional[float] = None
+        self.step: int = -1
+
+    def update(self, now: float) -> bool:
+        if self.start_time is None:
+            self.start_time = now
+        step = int((now - self.start_time) / self.duration * self.steps) if self.duration > 0 \
+            else self.steps
+        if step >= self.steps:
+            self.finished = True
+            return True
+        if step == self.step:
+            return False
+        self.step = step
+        return True
+
+    def next_update(self) -> Optional[float]:
+        """The time of the next transition step, one frame period of `TRANSITION_FPS` apart"""
+        if self.start_time is None:
+            return None
+        return self.start_time + (self.step + 1) * self.duration / self.steps
+
+    def compose(self, frame: np.ndarray) -> np.ndarray:
+        weights = self.weights[self.step]
+        blended = self.from_frame * (WEIGHT_ONE - weights) + frame * weights
+        return (blended >> 8).astype(np.uint8)
+
+
+DEFAULT_SWITCH = TransitionSpec(TransitionKind.CROSSFADE, 1.0)
+DEFAULT_LOOP = TransitionSpec(TransitionKind.CROSSFADE, 0.5)
+
+
+class TransitionTable:
+    """Transitions per pair of scenes.
+
+    A pair of the same scene is used when its content loops. Scene names are the names of the
+    commands (`christmas`, `fill`, ...), `*` matches every scene.
+
+    # Arguments
+
+    * `pairs` - (previous scene, next scene) -> transition
+    * `default` - Transition between different scenes without a matching pair
+    * `loop` - Transition for looping content without a matching pair
+    """
+    def __init__(
+        self,
+        pairs: Optional[Dict[Tuple[str, str], TransitionSpec]] = None,
+        default: TransitionSpec = DEFAULT_SWITCH,
+        loop: TransitionSpec = DEFAULT_LOOP,
+    ):
+        self.pairs: Dict[Tuple[str, str], TransitionSpec] = pairs or {}
+        self.default: TransitionSpec = default
+        self.loop: TransitionSpec = loop
+
+    @staticmethod
+    def _spec(entry: dict, fallback: TransitionSpec) -> TransitionSpec:
+        kind = TransitionKind[entry.get("kind", fallback.kind.name).upper()]
+        duration = float(entry.get("duration", fallback.duration))
+        if duration < 0:
+            raise ValueError(f"negative duration {duration}")
+        return TransitionSpec(kind, duration)
+
+    @staticmethod
+    def load(path: str) -> "TransitionTable":
+        """Load transitions from a JSON file like
+
+            {
+                "default": {"kind": "crossfade", "duration": 1.0},
+                "loop": {"kind": "dissolve", "duration": 0.5},
+                "pairs": [{"from": "christmas", "to": "*", "kind": "wipe", "duration": 0.8}]
+            }
+
+        Kinds are `cut`, `crossfade`, `wipe` and `dissolve`. All keys are optional.
+        """
+        with open(path, "r", encoding="utf-8") as jsonfile:
+            content = json.load(jsonfile)
+        try:
+            default = TransitionTable._spec(content.get("default", {}), DEFAULT_SWITCH)
+            loop = TransitionTable._spec(content.get("loop", {}), DEFAULT_LOOP)
+            pairs = {
+                (entry.get("from", ANY_SCENE), entry.get("to", ANY_SCENE)):
+                    TransitionTable._spec(entry, default)
+                for entry in content.get("pairs", [])
+            }
+        except (KeyError, TypeError, ValueError, AttributeError) as error:
+            raise TransitionError(f"Invalid transitions in {path}: {error}") from error
+        return TransitionTable(pairs, default, loop)
+
+    def lookup(self, previous: str, following: str) -> Optional[TransitionSpec]:
+        """The transition from one scene to another, or None for a cut.
+
+        # Arguments
+
+        * `previous` - Name of the previous scene
+        * `following` - Name of the next scene, the same as `previous` for loops
+        """
+        for key in ((previous, following), (previous, ANY_SCENE), (ANY_SCENE, following)):
+            if key in self.pairs:
+                spec = self.pairs[key]
+                break
+        else:
+            spec = self.loop if previous == following else self.default
+        if spec.kind == TransitionKind.CUT or spec.duration <= 0:
+            return None
+        return spec
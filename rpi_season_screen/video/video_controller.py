@@ -4,14 +4,26 @@ Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
 """
 import json
 import time
+from collections import deque
 from pathlib import Path
+from typing import Deque, Optional
 
 import cv2
 from sense_hat import SenseHat
-from rpi_season_screen.sense.sense_controller import SenseController
+from rpi_season_screen.input.joystick import Action, Direction, JoystickEvent
+from rpi_season_screen.playback.timeline import FramePolicy, PlaybackTimeline
+from rpi_season_screen.sense.sense_controller import LOADING_POLL, SenseController
+from rpi_season_screen.video.video_index import VideoIndex, VideoIndexError
 
-X_MAX = 7
-Y_MAX = 7
+DEFAULT_FPS = 25
+# Images decoded in the background before the scene loop takes over decoding
+BUFFER_SIZE = 50
+# Images that have to be decoded before the playback starts
+START_BUFFER = 5
+# Seconds the joystick jumps up or down in videos without chapters
+SEEK_STEP = 10.0
+# Seek instead of decoding forward when playback is this many seconds ahead of the decoder
+SEEK_AHEAD = 1.0
 
 
 class VideoController(SenseController):
@@ -23,48 +35,230 @@ class VideoController(SenseController):
     * `sense` - The RPI Sense Hat the Controller is based on
     * `rotation` - Rotation of the tree, value between 0 and 306.
     * `low_light_mode` - True if the Sense Hat should use the Low Light mode.
+    * `frame_policy` - Whether to drop or hold frames when the playback falls behind.
+    * `sync_epoch` - Unix timestamp the video started at, to play in sync with other displays.
+    * `start` - Time offset in seconds to start the playback at. Ignored with a `sync_epoch`.
     """
     def __init__(
-        self, video_path: str, sense: SenseHat, rotation: int = 0, low_light_mode: bool = True
+        self,
+        video_path: str,
+        sense: SenseHat,
+        rotation: int = 0,
+        low_light_mode: bool = True,
+        frame_policy: FramePolicy = FramePolicy.DROP,
+        sync_epoch: Optional[float] = None,
+        start: float = 0.0,
     ):
         super().__init__(sense, rotation, low_light_mode)
         if not Path(video_path).exists():
             raise FileNotFoundError(f"Path to video ({video_path}) does not exist.")
+        self.video_path: str = video_path
         self.video = cv2.VideoCapture(video_path)
-        self.fps: int = self.video.get(cv2.CAP_PROP_FPS)
-        self.last_time: float = time.time()
+        # Loaded in the background by `_init_scene`
+        self.index: Optional[VideoIndex] = None
+        self.fps: float = self.video.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
         self.video_length = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.start: float = start if sync_epoch is None else 0.0
         self.current_frame: int = 0
+        # Decoded images, starting with frame `buffer_start`
+        self.buffer_start: int = 0
         self.images = []
+        self._playing: bool = False
+        self.timeline = PlaybackTimeline(
+            max(1, self.video_length), self.fps, policy=frame_policy, sync_epoch=sync_epoch
+        )
+        # Monotonic time of the last seek whose first frame was not shown yet
+        self._seek_started: Optional[float] = None
+        # Seconds from seeking to showing the first frame
+        self.seek_latencies: Deque[float] = deque(maxlen=100)
 
     def _init_scene(self):
-        """Draw the scene's background. Here nothing happens."""
-        buffer_size = 50 if self.video_length >= 50 else self.video_length
-        print(f"Buffering the first {buffer_size} images ...")
+        """Draw the scene's background. Here the video is indexed and buffered in the background."""
+        self.load_in_background(self._load)
+
+    def _load(self):
+        """Load the index, position the decoder at the start frame and buffer the first images.
+
+        The playback starts as soon as `START_BUFFER` images are buffered.
+        """
+        try:
+            index = VideoIndex.load_or_build(self.video_path)
+        except VideoIndexError as error:
+            print(f"WARNING: Seeking without index: {error}")
+            index = None
+        if index is not None and index.frame_count != self.video_length:
+            self.video_length = index.frame_count
+            self.timeline.set_frame_count(self.video_length)
+        self.index = index
+        start_frame = self._frame_at(self.start)
+        if start_frame:
+            self._position_decoder(start_frame)
+        buffer_size = min(BUFFER_SIZE, self.video_length - start_frame)
+        print(f"Buffering {buffer_size} images ...")
         for _ in range(buffer_size):
             self._fill_next_image()
         print("Done!")
 
+    def close(self):
+        """Release the video"""
+        super().close()
+        self.video.release()
+
+    def _snapshot(self) -> dict:
+        """The video and the time offset it is at"""
+        return {"video_path": self.video_path, "position": self.position}
+
+    def _restore(self, state: dict):
+        """Continue the video at the position of the snapshot, if it is the same video"""
+        if state["video_path"] == self.video_path and self.timeline.sync_epoch is None:
+            self.start = float(state["position"])
+
+    def _start_playback(self):
+        """Start the playback at the first buffered image"""
+        self._playing = True
+        self.wake_time = None
+        self.timeline.start()
+        if self.buffer_start:
+            self.timeline.seek(self.buffer_start)
+
+    def _frame_at(self, seconds: float) -> int:
+        """The frame shown at a time offset in seconds"""
+        if self.index is not None:
+            return self.index.frame_at(seconds)
+        return min(max(0, self.video_length - 1), max(0, int(seconds * self.fps)))
+
+    @property
+    def position(self) -> float:
+        """Time offset of the current frame in seconds"""
+        if self.index is not None and self.current_frame < self.index.frame_count:
+            return self.index.timestamps[self.current_frame]
+        return self.current_frame / self.fps
+
+    @property
+    def seeking(self) -> bool:
+        """True until the first frame after a seek was shown"""
+        return self._seek_started is not None
+
+    def seek(self, seconds: float):
+        """Continue the playback at a time offset. Only the frames from the keyframe before it are decoded.
+
+        # Arguments
+
+        * `seconds` - Time offset in seconds
+        """
+        if not self._playing or self.loading:
+            print("WARNING: Cannot seek while the video is loading")
+            return
+        frame = self._frame_at(seconds)
+        self._seek_started = time.monotonic()
+        self.timeline.seek(frame)
+        if not self.buffer_start <= frame < self.buffer_start + len(self.images):
+            self._position_decoder(frame)
+
+    def seek_chapter(self, step: int):
+        """Jump to the previous (-1) or next (1) chapter, or `SEEK_STEP` seconds without chapters"""
+        position = self.position
+        if self.index is None or not self.index.chapters:
+            self.seek(max(0.0, position + step * SEEK_STEP))
+            return
+        chapter = self.index.chapter_at(position)
+        if step < 0 and chapter >= 0 and position - self.index.chapters[chapter][0] > 1.0:
+            # Go back to the start of the current chapter first
+            step = 0
+        chapter = min(len(self.index.chapters) - 1, max(0, chapter + step))
+        start, title = self.index.chapters[chapter]
+        print(f"Chapter {chapter + 1}: {title}")
+        self.seek(start)
+
+    def _position_decoder(self, frame: int):
+        """Drop the buffered images and let the decoder continue at a frame"""
+        self.images = []
+        self.buffer_start = frame
+        if self.index is None:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, frame)
+            return
+        try:
+            self.index.seek(self.video, frame)
+        except VideoIndexError as error:
+            print(f"WARNING: Seeking without index: {error}")
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, frame)
+
+    def handle_input(self, event: JoystickEvent) -> bool:
+        """Pushing the joystick pauses and resumes the video, up and down jump between chapters"""
+        if event.action != Action.PRESSED:
+            return super().handle_input(event)
+        if event.direction == Direction.MIDDLE:
+            if self.timeline.paused:
+                self.timeline.resume()
+            else:
+                self.timeline.pause()
+            return True
+        if event.direction in (Direction.UP, Direction.DOWN):
+            self.seek_chapter(-1 if event.direction == Direction.UP else 1)
+            return True
+        return super().handle_input(event)
+
     def _next_frame(self):
         """Start the scene loop here"""
-        if len(self.images) < self.video_length:
+        loading = self.loading
+        if not self._playing:
+            if loading and len(self.images) < START_BUFFER:
+                self.wake_time = time.monotonic() + LOADING_POLL
+                return
+            self._start_playback()
+        if not loading and self.buffer_start + len(self.images) < self.video_length:
             self._fill_next_image()
-        if self.last_time + (1 / self.fps) > time.time():
+        frame = self.timeline.poll()
+        if frame is None:
+            return
+        looped = frame < self.current_frame and self._seek_started is None
+        buffer_end = self.buffer_start + len(self.images)
+        if loading:
+            # The decoder belongs to the loader, show the buffered images only
+            if frame < self.buffer_start:
+                return
+        elif frame < self.buffer_start or frame > buffer_end + SEEK_AHEAD * self.fps:
+            if self._seek_started is None:
+                self._seek_started = time.monotonic()
+            self._position_decoder(frame)
+        # Playback overtook the buffer, decode until the due frame is available
+        while not loading and frame >= self.buffer_start + len(self.images) and self._fill_next_image():
+            pass
+        if not self.images:
             return
-        self.last_time = time.time()
-        self.sense.set_pixels(self.images[self.current_frame])
-        self.current_frame += 1
-        if self.current_frame >= len(self.images):
-            self.current_frame = 0
+        frame = min(frame, self.buffer_start + len(self.images) - 1)
+        if looped:
+            print(f"Restarting video ({self.timeline.stats()})")
+            self.transition_loop()
+        self.current_frame = frame
+        self.set_pixels(self.images[frame - self.buffer_start])
+        if self._seek_started is not None:
+            latency = time.monotonic() - self._seek_started
+            self.seek_latencies.append(latency)
+            self._seek_started = None
+            print(f"First frame after seeking to {self.position:.1f} s shown after {latency * 1e3:.1f} ms")
+
+    def _fill_next_image(self) -> bool:
+        """Decode and buffer the next image of the video.
 
-    def _fill_next_image(self):
+        # Returns
+
+        `bool` - True if an image was buffered.
+        """
+        if self.buffer_start + len(self.images) >= self.video_length:
+            return False
         success, image = self.video.read()
         if not success:
             print("ERROR: Could not read video frame!")
-            return
-        resized_img = cv2.resize(image, (X_MAX + 1, Y_MAX + 1))
+            # The reported frame count was wrong, play only the frames that could be read
+            self.video_length = self.buffer_start + len(self.images)
+            if self.video_length:
+                self.timeline.set_frame_count(self.video_length)
+            return False
+        resized_img = cv2.resize(image, (self.width, self.height))
         img_arr = []
         for img in resized_img:
             for i in img:
                 img_arr.append(i)
         self.images.append(img_arr)
+        return True
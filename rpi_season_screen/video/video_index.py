@@ -0,0 +1,211 @@
+""" Keyframe and seek index for videos.
+
+The index is built once per video by reading the raw packets of the video without decoding them,
+which takes a fraction of the time of playing it. It stores the presentation timestamp of every
+frame, a table of the keyframes and optional chapters. It is saved next to the video as
+`<video>.index.json` and rebuilt whenever the video file changes.
+
+With the index, time offsets are mapped to the exact frame shown at them, also for videos with
+a variable frame rate. Seeks position the decoder at the keyframe before the wanted frame and
+decode forward from there, counting frames by the index instead of trusting the container.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import bisect
+import json
+import os
+
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+
+# Version 1 indices listed keyframes in decoding order, version 2 had none
+INDEX_VERSION = 3
+INDEX_SUFFIX = ".index.json"
+
+
+class VideoIndexError(Exception):
+    """Errors related to video indices"""
+
+
+class Keyframe(NamedTuple):
+    """A keyframe of a video"""
+    # Number of the frame in presentation order
+    frame: int
+    # Presentation time in seconds
+    timestamp: float
+    # Number of the packet in the stream, in decoding order
+    position: int
+
+
+class VideoIndex:
+    """Keyframes, frame timestamps and chapters of a video.
+
+    # Arguments
+
+    * `video_path` - Path to the video
+    * `fps` - Frames per second
+    * `timestamps` - Presentation time of every frame in seconds, sorted
+    * `keyframes` - Keyframes sorted by frame. Empty if the container does not tell which
+                    frames are keyframes, seeking is then left to the decoder.
+    * `chapters` - Sorted (start in seconds, title) tuples
+    """
+    def __init__(
+        self,
+        video_path: str,
+        fps: float,
+        timestamps: List[float],
+        keyframes: List[Keyframe],
+        chapters: Optional[List[Tuple[float, str]]] = None,
+    ):
+        self.video_path: str = video_path
+        self.fps: float = fps
+        self.timestamps: List[float] = timestamps
+        self.keyframes: List[Keyframe] = keyframes
+        self.chapters: List[Tuple[float, str]] = sorted(chapters or [])
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def index_path(self) -> str:
+        return self.video_path + INDEX_SUFFIX
+
+    @staticmethod
+    def build(video_path: str) -> "VideoIndex":
+        """Index a video by reading its packets without decoding them.
+
+        # Arguments
+
+        * `video_path` - Path to the video
+        """
+        video = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        if not video.isOpened():
+            raise VideoIndexError(f"Could not open {video_path}")
+        fps = video.get(cv2.CAP_PROP_FPS)
+        timestamps = []
+        # (timestamp, packet) of the keyframes
+        keyframe_packets = []
+        while video.grab():
+            timestamp = video.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if video.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframe_packets.append((timestamp, len(timestamps)))
+            timestamps.append(timestamp)
+        video.release()
+        # Packets are read in decoding order, which differs from presentation order with B-frames.
+        # Keyframes are numbered by their timestamp's place in presentation order.
+        timestamps.sort()
+        if not timestamps:
+            raise VideoIndexError(f"{video_path} does not contain any frames")
+        keyframes = sorted(
+            Keyframe(bisect.bisect_left(timestamps, timestamp), timestamp, position)
+            for timestamp, position in keyframe_packets
+        )
+        return VideoIndex(video_path, fps, timestamps, keyframes)
+
+    @staticmethod
+    def load(video_path: str) -> Optional["VideoIndex"]:
+        """Load the saved index of a video.
+
+        # Returns
+
+        `Optional[VideoIndex]` - The index, or None if there is none or the video changed since.
+        """
+        try:
+            with open(video_path + INDEX_SUFFIX, "r", encoding="utf-8") as jsonfile:
+                content = json.load(jsonfile)
+        except (OSError, ValueError):
+            return None
+        stat = os.stat(video_path)
+        if content.get("version") != INDEX_VERSION or content.get("size") != stat.st_size \
+                or content.get("mtime") != stat.st_mtime:
+            return None
+        return VideoIndex(
+            video_path,
+            content["fps"],
+            content["timestamps"],
+            [Keyframe(*keyframe) for keyframe in content["keyframes"]],
+            [(chapter["start"], chapter["title"]) for chapter in content.get("chapters", [])],
+        )
+
+    @staticmethod
+    def load_or_build(video_path: str) -> "VideoIndex":
+        """Load the saved index of a video, or build and save it if there is none.
+
+        Chapters of an outdated index are kept.
+        """
+        index = VideoIndex.load(video_path)
+        if index is not None:
+            return index
+        print(f"Indexing {video_path} ...")
+        index = VideoIndex.build(video_path)
+        index.chapters = VideoIndex.saved_chapters(video_path)
+        try:
+            index.save()
+        except OSError as error:
+            print(f"WARNING: Could not save the video index: {error}")
+        return index
+
+    @staticmethod
+    def saved_chapters(video_path: str) -> List[Tuple[float, str]]:
+        """Chapters of the saved index of a video, even if the index is outdated"""
+        try:
+            with open(video_path + INDEX_SUFFIX, "r", encoding="utf-8") as jsonfile:
+                chapters = json.load(jsonfile).get("chapters", [])
+            return [(chapter["start"], chapter["title"]) for chapter in chapters]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return []
+
+    def save(self):
+        """Save the index next to the video"""
+        stat = os.stat(self.video_path)
+        content = {
+            "version": INDEX_VERSION,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "fps": self.fps,
+            "timestamps": self.timestamps,
+            "keyframes": [list(keyframe) for keyframe in self.keyframes],
+            "chapters": [{"start": start, "title": title} for start, title in self.chapters],
+        }
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as jsonfile:
+            json.dump(content, jsonfile)
+        os.replace(temp_path, self.index_path)
+
+    def frame_at(self, seconds: float) -> int:
+        """The frame shown at a time offset in seconds"""
+        return min(self.frame_count - 1, max(0, bisect.bisect_right(self.timestamps, seconds) - 1))
+
+    def chapter_at(self, seconds: float) -> int:
+        """Index of the chapter playing at a time offset, -1 before the first chapter"""
+        return bisect.bisect_right([start for start, _ in self.chapters], seconds) - 1
+
+    def keyframe_before(self, frame: int) -> Optional[Keyframe]:
+        """The last keyframe at or before a frame, None if no keyframe before it is known"""
+        index = bisect.bisect_right([keyframe.frame for keyframe in self.keyframes], frame) - 1
+        return self.keyframes[index] if index >= 0 else None
+
+    def seek(self, video: cv2.VideoCapture, frame: int):
+        """Position a video capture so that the next read returns a frame.
+
+        The capture jumps to the timestamp of the keyframe before the frame and decodes the frames
+        in between without converting them.
+
+        # Arguments
+
+        * `video` - Capture of the indexed video
+        * `frame` - The frame the next read shall return
+        """
+        if not 0 <= frame < self.frame_count:
+            raise VideoIndexError(f"Frame {frame} is out of range (0 - {self.frame_count - 1})")
+        keyframe = self.keyframe_before(frame)
+        if keyframe is None:
+            video.set(cv2.CAP_PROP_POS_FRAMES, frame)
+            return
+        video.set(cv2.CAP_PROP_POS_MSEC, keyframe.timestamp * 1000)
+        for _ in range(frame - keyframe.frame):
+            if not video.grab():
+                raise VideoIndexError(f"Could not decode up to frame {frame}")
@@ -0,0 +1,134 @@
+""" Single 8x8 panels of a tiled wall of Sense Hats.
+
+A panel is either the Sense Hat attached to this Raspberry Pi (`LocalPanel`) or the Sense Hat
+of another Raspberry Pi on the network (`RemotePanel`), which runs a `PanelReceiver`.
+Frames are sent to remote panels as UDP datagrams with a one byte command header.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import socket
+
+from abc import abstractmethod
+
+import numpy as np
+
+PANEL_WIDTH = 8
+PANEL_HEIGHT = 8
+DEFAULT_PORT = 9999
+
+# Datagram commands, followed by the payload
+CMD_FRAME = 1       # 8x8 RGB pixels, row by row (192 bytes)
+CMD_CLEAR = 2       # no payload
+CMD_LOW_LIGHT = 3   # one byte, 0 or 1
+
+
+class Panel:
+    """Base class for a single 8x8 panel of the wall"""
+    @abstractmethod
+    def write(self, tile: np.ndarray):
+        """Show a tile on the panel.
+
+        # Arguments
+
+        * `tile` - Array of shape (8, 8, 3), already rotated to the panel's orientation.
+        """
+        return
+
+    @abstractmethod
+    def clear(self):
+        """Turn all pixels of the panel off"""
+        return
+
+    @abstractmethod
+    def set_low_light(self, low_light: bool):
+        """Dim the panel"""
+        return
+
+
+class LocalPanel(Panel):
+    """The Sense Hat attached to this Raspberry Pi.
+
+    # Arguments
+
+    * `sense` - The RPI Sense Hat. Its own rotation is reset, the wall rotates the tiles itself.
+    """
+    def __init__(self, sense):
+        self.sense = sense
+        self.sense.rotation = 0
+
+    def write(self, tile: np.ndarray):
+        self.sense.set_pixels(tile.reshape(-1, 3).tolist())
+
+    def clear(self):
+        self.sense.clear()
+
+    def set_low_light(self, low_light: bool):
+        self.sense.low_light = low_light
+
+
+class RemotePanel(Panel):
+    """Sense Hat of another Raspberry Pi, that runs `rpi-season-screen panel`.
+
+    # Arguments
+
+    * `host` - Host name or IP address of the other Raspberry Pi
+    * `port` - UDP port the `PanelReceiver` listens on
+    """
+    def __init__(self, host: str, port: int = DEFAULT_PORT):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def _send(self, data: bytes):
+        try:
+            self.socket.sendto(data, self.address)
+        except (BlockingIOError, OSError) as error:
+            # A missing panel must never stall the whole wall
+            print(f"WARNING: Could not send to panel at {self.address}: {error}")
+
+    def write(self, tile: np.ndarray):
+        self._send(bytes((CMD_FRAME,)) + np.ascontiguousarray(tile, dtype=np.uint8).tobytes())
+
+    def clear(self):
+        self._send(bytes((CMD_CLEAR,)))
+
+    def set_low_light(self, low_light: bool):
+        self._send(bytes((CMD_LOW_LIGHT, int(low_light))))
+
+
+class PanelReceiver:
+    """Receives frames from a wall and shows them on the local Sense Hat.
+
+    # Arguments
+
+    * `sense` - The RPI Sense Hat of this Raspberry Pi
+    * `port` - UDP port to listen on
+    """
+    def __init__(self, sense, port: int = DEFAULT_PORT):
+        self.sense = sense
+        self.sense.rotation = 0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("", port))
+
+    def handle(self, data: bytes):
+        """Execute a single datagram"""
+        if not data:
+            return
+        command, payload = data[0], data[1:]
+        if command == CMD_FRAME and len(payload) == PANEL_WIDTH * PANEL_HEIGHT * 3:
+            pixels = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3)
+            self.sense.set_pixels(pixels.tolist())
+        elif command == CMD_CLEAR:
+            self.sense.clear()
+        elif command == CMD_LOW_LIGHT and payload:
+            self.sense.low_light = bool(payload[0])
+        else:
+            print(f"WARNING: Dropping invalid datagram (command {command}, {len(payload)} bytes)")
+
+    def serve_forever(self):
+        """Receive and show frames until the process is stopped"""
+        print(f"Waiting for frames on port {self.socket.getsockname()[1]} ...")
+        while True:
+            data, _ = self.socket.recvfrom(1 + PANEL_WIDTH * PANEL_HEIGHT * 3)
+            self.handle(data)
@@ -0,0 +1,242 @@
+""" A wall of 8x8 panels, that behaves like one large Sense Hat.
+
+Controllers render into a single virtual canvas. The wall slices the canvas into
+one 8x8 NumPy view per panel (no copies), rotates the views to each panel's orientation
+and pushes only the tiles that changed since they were last written.
+The wall's own `rotation` turns the whole canvas before it is sliced. Square walls can be turned
+in steps of 90 degrees, all others only by 180 degrees.
+
+Remote panels are sent their tiles over UDP, where datagrams can get lost. Their tiles are
+therefore sent again every `REFRESH_INTERVAL` seconds, even if they did not change.
+
+A wall is described by a JSON file:
+
+    {
+        "columns": 4,
+        "rows": 2,
+        "panels": [
+            {"column": 0, "row": 0},
+            {"column": 1, "row": 0, "host": "192.168.0.12", "port": 9999, "rotation": 180},
+            ...
+        ]
+    }
+
+Panels without a host are the local Sense Hat. Positions without a panel are left out.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import json
+import time
+
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from rpi_season_screen.wall.panel import (
+    DEFAULT_PORT, PANEL_HEIGHT, PANEL_WIDTH, LocalPanel, Panel, RemotePanel
+)
+
+# Seconds after which the tiles of remote panels are sent again
+REFRESH_INTERVAL = 5.0
+
+
+class WallError(Exception):
+    """Errors related to the tiled wall"""
+
+
+class TiledWall:
+    """Virtual display made up of a grid of panels.
+
+    It offers the display functions of `SenseHat` (`set_pixel`, `set_pixels`, `clear`,
+    `low_light`, `rotation`) for a canvas of `width` x `height` pixels, so it can be used by
+    every controller in place of a single Sense Hat.
+
+    # Arguments
+
+    * `columns` - Number of panels in a row
+    * `rows` - Number of panels in a column
+    * `refresh_interval` - Seconds after which the tiles of remote panels are sent again.
+                           None only sends tiles that changed.
+    """
+    def __init__(self, columns: int, rows: int, refresh_interval: Optional[float] = REFRESH_INTERVAL):
+        if columns < 1 or rows < 1:
+            raise WallError(f"Invalid wall size {columns}x{rows}")
+        self.columns: int = columns
+        self.rows: int = rows
+        self.width: int = columns * PANEL_WIDTH
+        self.height: int = rows * PANEL_HEIGHT
+        self.canvas: np.ndarray = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        # (panel, view into the canvas, number of counter clockwise quarter turns)
+        self.tiles: List[Tuple[Panel, np.ndarray, int]] = []
+        self._grid: List[List[Optional[int]]] = [[None] * columns for _ in range(rows)]
+        self._written: List[Optional[np.ndarray]] = []
+        self._dirty: List[bool] = []
+        self._low_light: bool = False
+        self._rotation: int = 0
+        # Number of counter clockwise quarter turns of the whole canvas
+        self._turns: int = 0
+        # The turned canvas the tiles are taken from, if the wall is rotated
+        self._rotated: np.ndarray = np.zeros_like(self.canvas)
+        # Position of every tile in the canvas
+        self._slices: List[Tuple[slice, slice]] = []
+        self.refresh_interval: Optional[float] = refresh_interval
+        self._next_refresh: float = time.monotonic()
+
+    def add_panel(self, panel: Panel, column: int, row: int, rotation: int = 0):
+        """Place a panel on the wall.
+
+        # Arguments
+
+        * `panel` - The panel
+        * `column` - Column of the panel, 0 being the left
+        * `row` - Row of the panel, 0 being the top
+        * `rotation` - Clockwise rotation of the panel in degrees, as in `SenseHat.rotation`.
+        """
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            raise WallError(f"Panel position ({column}, {row}) is outside of the wall")
+        if self._grid[row][column] is not None:
+            raise WallError(f"There already is a panel at ({column}, {row})")
+        if rotation % 90 != 0:
+            raise WallError(f"Rotation must be a multiple of 90 degrees, not {rotation}")
+        position = (
+            slice(row * PANEL_HEIGHT, (row + 1) * PANEL_HEIGHT),
+            slice(column * PANEL_WIDTH, (column + 1) * PANEL_WIDTH),
+        )
+        self._grid[row][column] = len(self.tiles)
+        self._slices.append(position)
+        self.tiles.append((panel, self.canvas[position], (-rotation // 90) % 4))
+        self._written.append(None)
+        self._dirty.append(True)
+
+    @property
+    def rotation(self) -> int:
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, rotation: int):
+        """Clockwise rotation of the whole wall in degrees, as in `SenseHat.rotation`"""
+        if rotation % 90 != 0:
+            raise WallError(f"Rotation must be a multiple of 90 degrees, not {rotation}")
+        turns = (-rotation // 90) % 4
+        if turns % 2 and self.width != self.height:
+            raise WallError(
+                f"A {self.width}x{self.height} wall can only be rotated by 0 or 180 degrees, "
+                f"not {rotation}"
+            )
+        self._rotation = rotation
+        self._turns = turns
+        self._dirty = [True] * len(self.tiles)
+
+    def _tile_index(self, x: int, y: int) -> Optional[int]:
+        """Index of the tile showing a pixel of the canvas, None if there is no panel"""
+        if self._turns == 1:
+            x, y = y, self.width - 1 - x
+        elif self._turns == 2:
+            x, y = self.width - 1 - x, self.height - 1 - y
+        elif self._turns == 3:
+            x, y = self.height - 1 - y, x
+        return self._grid[y // PANEL_HEIGHT][x // PANEL_WIDTH]
+
+    @property
+    def low_light(self) -> bool:
+        return self._low_light
+
+    @low_light.setter
+    def low_light(self, low_light: bool):
+        self._low_light = low_light
+        for panel, _, _ in self.tiles:
+            panel.set_low_light(low_light)
+
+    def set_pixel(self, x: int, y: int, *args):
+        """Same signature as `SenseHat.set_pixel`. The pixel is shown with the next `flush`."""
+        color = args[0] if len(args) == 1 else args
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError(f"Pixel position ({x}, {y}) is out of bounds")
+        self.canvas[y, x] = color
+        index = self._tile_index(x, y)
+        if index is not None:
+            self._dirty[index] = True
+
+    def set_pixels(self, pixel_list):
+        """Same signature as `SenseHat.set_pixels`, with `width * height` pixels."""
+        self.set_frame(np.asarray(pixel_list, dtype=np.uint8).reshape(self.canvas.shape))
+
+    def set_frame(self, frame: np.ndarray):
+        """Show a whole canvas at once.
+
+        # Arguments
+
+        * `frame` - Array of shape (height, width, 3)
+        """
+        self.canvas[:] = frame
+        self._dirty = [True] * len(self.tiles)
+        self.flush()
+
+    def get_pixels(self) -> List[List[int]]:
+        """Same signature as `SenseHat.get_pixels`"""
+        return self.canvas.reshape(-1, 3).tolist()
+
+    def clear(self, *args):
+        """Same signature as `SenseHat.clear`"""
+        color = [0, 0, 0]
+        if len(args) == 1:
+            color = args[0]
+        elif len(args) == 3:
+            color = args
+        self.canvas[:] = color
+        self._dirty = [True] * len(self.tiles)
+        self.flush()
+
+    def flush(self):
+        """Write all tiles that changed since they were last written to their panels.
+
+        Every `refresh_interval` seconds, the tiles of remote panels are written in any case.
+        """
+        refresh = False
+        if self.refresh_interval is not None and time.monotonic() >= self._next_refresh:
+            self._next_refresh = time.monotonic() + self.refresh_interval
+            refresh = True
+        if self._turns and any(self._dirty):
+            self._rotated[:] = np.rot90(self.canvas, self._turns)
+        for index, (panel, view, turns) in enumerate(self.tiles):
+            resend = refresh and isinstance(panel, RemotePanel)
+            if not self._dirty[index] and not resend:
+                continue
+            self._dirty[index] = False
+            if self._turns:
+                view = self._rotated[self._slices[index]]
+            written = self._written[index]
+            if written is not None and np.array_equal(written, view) and not resend:
+                continue
+            self._written[index] = view.copy()
+            panel.write(np.rot90(view, turns) if turns else view)
+
+    @classmethod
+    def from_config(cls, path: str, sense_factory: Callable) -> "TiledWall":
+        """Create a wall from a JSON file.
+
+        # Arguments
+
+        * `path` - Path to the JSON file
+        * `sense_factory` - Callable returning the local Sense Hat, only called if it is used.
+        """
+        with open(path, "r", encoding="utf-8") as jsonfile:
+            config = json.load(jsonfile)
+        try:
+            wall = cls(int(config["columns"]), int(config["rows"]))
+            has_local_panel = False
+            for entry in config["panels"]:
+                if entry.get("host"):
+                    panel = RemotePanel(entry["host"], int(entry.get("port", DEFAULT_PORT)))
+                elif has_local_panel:
+                    raise WallError("Only one panel can be the local Sense Hat")
+                else:
+                    panel = LocalPanel(sense_factory())
+                    has_local_panel = True
+                wall.add_panel(
+                    panel, int(entry["column"]), int(entry["row"]), int(entry.get("rotation", 0))
+                )
+        except KeyError as error:
+            raise WallError(f"Missing key {error} in wall configuration {path}") from error
+        return wall
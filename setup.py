@@ -34,6 +34,6 @@ setup(
     version=_version,
     description="RPI Sense Hat Display",
     install_requires=install_requires,
-    packages=find_packages(exclude=["test", "test.*"]),
+    packages=find_packages(exclude=["test", "test.*", "benchmarks", "benchmarks.*"]),
     entry_points={"console_scripts": ["rpi-season-screen = rpi_season_screen.bin.daemon:main"]},
 )
@@ -0,0 +1,39 @@
+""" Smoke test of the benchmark scenes.
+
+Runs every scene of the benchmark suite for a few frames against the stub Sense Hat, so that the
+hooks the benchmarks rely on (`SenseController.tick`, content paths of the fill scene, the
+simulated clock) keep working off-device.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import importlib.util
+import unittest
+
+from benchmarks.run import run_benchmarks
+from benchmarks.scenes import SCENES
+
+FRAMES = 20
+
+
+class BenchmarkScenesTest(unittest.TestCase):
+    """Every benchmark scene runs and writes to the display"""
+    def _run(self, wall=None):
+        scenes = [name for name in SCENES if name != "video" or importlib.util.find_spec("cv2")]
+        results = run_benchmarks(scenes, FRAMES, 1 / 60, 0, wall)
+        for name in scenes:
+            with self.subTest(scene=name):
+                metrics = results["scenes"][name]
+                self.assertNotIn("error", metrics)
+                self.assertEqual(metrics["frames"], FRAMES)
+                self.assertGreater(metrics["cold_start_ms"], 0)
+
+    def test_scenes(self):
+        self._run()
+
+    def test_scenes_on_wall(self):
+        self._run((2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+""" Seek test of the video index.
+
+Writes a synthetic video with keyframes every few frames and checks that seeking through the index
+returns the same images as decoding the video from the start.
+
+Copyright (c) 2023 Maximilian Stephan <stephan.maxi@icloud.com>
+"""
+
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+FRAMES = 60
+FPS = 30
+WIDTH = 32
+HEIGHT = 24
+
+
+def write_video(path: str):
+    """Write a video whose frames all differ, MPEG-4 inserts a keyframe every 12 frames"""
+    import cv2
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for frame in range(FRAMES):
+        image = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+        image[:, :] = (frame * 4 % 256, frame * 7 % 256, 255 - frame)
+        cv2.putText(image, str(frame), (0, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        writer.write(image)
+    writer.release()
+
+
+@unittest.skipUnless(importlib.util.find_spec("cv2"), "OpenCV is not installed")
+class VideoIndexSeekTest(unittest.TestCase):
+    """Seeking through the index lands on the wanted frame"""
+    def setUp(self):
+        import cv2
+        self.directory = tempfile.TemporaryDirectory()
+        self.video_path = os.path.join(self.directory.name, "video.mp4")
+        write_video(self.video_path)
+        video = cv2.VideoCapture(self.video_path)
+        self.images = []
+        while True:
+            success, image = video.read()
+            if not success:
+                break
+            self.images.append(image)
+        video.release()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_keyframes(self):
+        from rpi_season_screen.video.video_index import VideoIndex
+        index = VideoIndex.build(self.video_path)
+        self.assertEqual(index.frame_count, len(self.images))
+        self.assertEqual(index.timestamps, sorted(index.timestamps))
+        self.assertEqual(index.keyframes[0].frame, 0)
+        self.assertTrue(1 < len(index.keyframes) < index.frame_count)
+        for keyframe in index.keyframes:
+            self.assertEqual(index.timestamps[keyframe.frame], keyframe.timestamp)
+
+    def test_seek(self):
+        import cv2
+        from rpi_season_screen.video.video_index import VideoIndex
+        index = VideoIndex.build(self.video_path)
+        index.save()
+        index = VideoIndex.load(self.video_path)
+        self.assertIsNotNone(index)
+        video = cv2.VideoCapture(self.video_path)
+        for frame in [FRAMES - 1, 0, 13, 12, 11, 30, 29, 5, 47]:
+            with self.subTest(frame=frame):
+                index.seek(video, frame)
+                success, image = video.read()
+                self.assertTrue(success)
+                self.assertTrue(np.array_equal(image, self.images[frame]))
+        video.release()
+
+
+if __name__ == "__main__":
+    unittest.main()